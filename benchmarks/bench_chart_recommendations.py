@@ -0,0 +1,81 @@
+"""
+Benchmark chart recommendation across result shapes and row counts.
+
+The recommender only reads the metadata attached by the query executor, so its
+time per call should stay flat as the number of rows grows.
+
+Usage:
+    python benchmarks/bench_chart_recommendations.py [--rows 1000,100000,1000000] [--repeat 200]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+from core.db.query_executor import compute_result_metadata
+from core.viz.chart_recommendations import recommend_chart_type
+
+def make_result(shape, rows, rng):
+    """
+    Build a synthetic query result of the given shape.
+
+    Args:
+        shape: The name of the result shape
+        rows: The number of rows
+        rng: The numpy random generator
+
+    Returns:
+        pandas.DataFrame: The synthetic result
+    """
+    regions = np.array(["North", "South", "East", "West"])
+    categories = np.array(["Electronics", "Furniture", "Stationery"])
+    if shape == "category_measure":
+        return pd.DataFrame({"Region": rng.choice(regions, rows), "Sales": rng.random(rows) * 1000})
+    if shape == "time_series":
+        return pd.DataFrame({
+            "Date": pd.date_range("2023-01-01", periods=rows, freq="min"),
+            "Sales": rng.random(rows) * 1000,
+            "Quantity": rng.integers(1, 100, rows)
+        })
+    if shape == "two_categories":
+        return pd.DataFrame({
+            "Region": rng.choice(regions, rows),
+            "Category": rng.choice(categories, rows),
+            "Sales": rng.random(rows) * 1000
+        })
+    if shape == "wide":
+        data = {f"measure_{i}": rng.random(rows) for i in range(15)}
+        data.update({f"dimension_{i}": rng.choice(regions, rows) for i in range(5)})
+        return pd.DataFrame(data)
+    raise ValueError(f"Unknown shape: {shape}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", default="1000,100000,1000000", help="Comma-separated row counts")
+    parser.add_argument("--repeat", type=int, default=200, help="Recommendation calls timed per case")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    query = "What is the total sales by region?"
+    print(f"{'shape':<18}{'rows':>10}{'metadata ms':>14}{'recommend us':>14}  chart")
+    for shape in ["category_measure", "time_series", "two_categories", "wide"]:
+        for rows in [int(r) for r in args.rows.split(",")]:
+            df = make_result(shape, rows, rng)
+
+            start = time.perf_counter()
+            df.attrs["result_metadata"] = compute_result_metadata(df)
+            metadata_ms = (time.perf_counter() - start) * 1000
+
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                chart = recommend_chart_type(df, query)
+            recommend_us = (time.perf_counter() - start) / args.repeat * 1e6
+
+            print(f"{shape:<18}{rows:>10}{metadata_ms:>14.2f}{recommend_us:>14.1f}  {chart}")
+
+if __name__ == "__main__":
+    main()
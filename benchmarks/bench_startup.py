@@ -0,0 +1,211 @@
+"""
+Benchmark the app's cold start and first render.
+
+Cold start imports every module src/app.py imports, in a fresh interpreter run
+with `python -X importtime`, and reports the total import time and the
+slowest packages. Heavy modules that should load only when their feature is
+first used (Plotly, the OpenAI client, the Excel readers) must not show up.
+
+First render runs src/app.py once in a fresh process with Streamlit's AppTest,
+the time from an empty session to the upload page being rendered.
+
+Usage:
+    python benchmarks/bench_startup.py [--repeat 5]
+    python benchmarks/bench_startup.py --update-baseline     # store the current numbers
+"""
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BENCHMARK_DIR = Path(__file__).resolve().parent
+SRC_DIR = BENCHMARK_DIR.parent / "src"
+APP_PATH = SRC_DIR / "app.py"
+
+DEFAULT_BASELINE = BENCHMARK_DIR / "startup_baseline.json"
+
+# Imported on first use only; loading one at start-up is a regression
+LAZY_MODULES = ("plotly", "openai", "openpyxl", "xlrd")
+
+# A measurement regresses when it is slower than baseline by both this ratio and this many seconds
+TIME_TOLERANCE = 0.25
+TIME_FLOOR_SECONDS = 0.05
+
+def app_imports(app_path=APP_PATH):
+    """
+    List the modules the app script imports at its top level.
+
+    Args:
+        app_path: The path of the Streamlit script
+
+    Returns:
+        list: The module names, in import order
+    """
+    modules = []
+    for node in ast.parse(app_path.read_text()).body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            modules.append(node.module)
+    return modules
+
+def parse_importtime(stderr):
+    """
+    Parse the output of `python -X importtime`.
+
+    Args:
+        stderr: The interpreter's stderr
+
+    Returns:
+        list: (module, self seconds, cumulative seconds, nesting depth) tuples
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((name.strip(), int(self_us) / 1e6, int(cumulative_us) / 1e6, depth))
+    return entries
+
+def measure_cold_start(modules):
+    """
+    Import the app's modules in a fresh interpreter with -X importtime.
+
+    Args:
+        modules: The modules to import
+
+    Returns:
+        dict: {"seconds": total import time, "packages": {top-level package: seconds},
+               "lazy_loaded": lazy modules that were imported anyway}
+    """
+    code = f"import sys; sys.path.insert(0, {str(SRC_DIR)!r}); " + "; ".join(f"import {module}" for module in modules)
+    env = {**os.environ, "METRICS_PORT": "0"}
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, env=env, cwd=SRC_DIR
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing the app's modules failed:\n{completed.stderr[-2000:]}")
+
+    entries = parse_importtime(completed.stderr)
+    packages = {}
+    for name, _, _, _ in entries:
+        packages.setdefault(name.split(".")[0], 0.0)
+    for name, self_seconds, _, _ in entries:
+        packages[name.split(".")[0]] += self_seconds
+    return {
+        "seconds": sum(self_seconds for _, self_seconds, _, _ in entries),
+        "packages": packages,
+        "lazy_loaded": sorted({name.split(".")[0] for name, _, _, _ in entries} & set(LAZY_MODULES))
+    }
+
+def measure_first_render():
+    """
+    Render the app once in a fresh process with Streamlit's AppTest.
+
+    Returns:
+        dict: {"seconds": time to run the script from an empty session, "exceptions": count}
+    """
+    code = (
+        "import json, time\n"
+        "from streamlit.testing.v1 import AppTest\n"
+        f"app = AppTest.from_file({str(APP_PATH)!r}, default_timeout=120)\n"
+        "start = time.perf_counter()\n"
+        "app.run()\n"
+        "print(json.dumps({'seconds': time.perf_counter() - start, 'exceptions': len(app.exception)}))\n"
+    )
+    env = {**os.environ, "METRICS_PORT": "0"}
+    completed = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env, cwd=SRC_DIR)
+    if completed.returncode != 0:
+        raise RuntimeError(f"Rendering the app failed:\n{completed.stderr[-2000:]}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def compare_with_baseline(results, baseline):
+    """
+    Find measurements that got slower than the baseline.
+
+    Args:
+        results: The current results
+        baseline: The baseline results
+
+    Returns:
+        list: Human-readable regression descriptions
+    """
+    regressions = []
+    for measurement in ("cold_start_seconds", "first_render_seconds"):
+        before, seconds = baseline.get(measurement), results.get(measurement)
+        if before is None or seconds is None:
+            continue
+        if seconds > before * (1 + TIME_TOLERANCE) and seconds - before > TIME_FLOOR_SECONDS:
+            regressions.append(f"{measurement}: {before * 1000:.0f}ms -> {seconds * 1000:.0f}ms")
+    return regressions
+
+def print_report(results, top=10):
+    """
+    Print the start-up timings and the slowest packages to import.
+
+    Args:
+        results: The results
+        top: The number of packages to list
+    """
+    print(f"Cold start (imports): {results['cold_start_seconds'] * 1000:.0f}ms")
+    if results.get("first_render_seconds") is not None:
+        print(f"First render:         {results['first_render_seconds'] * 1000:.0f}ms")
+    print("\nSlowest packages to import:")
+    for package, seconds in sorted(results["packages"].items(), key=lambda item: item[1], reverse=True)[:top]:
+        print(f"  {package:<30}{seconds * 1000:>8.1f}ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold start and first render benchmark of the Streamlit app.")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement; the median is reported")
+    parser.add_argument("--skip-render", action="store_true", help="Only measure imports (no Streamlit AppTest)")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="Baseline JSON file")
+    parser.add_argument("--update-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    modules = app_imports()
+    cold_starts = [measure_cold_start(modules) for _ in range(args.repeat)]
+    median_run = sorted(cold_starts, key=lambda run: run["seconds"])[len(cold_starts) // 2]
+    results = {
+        "cold_start_seconds": median_run["seconds"],
+        "packages": median_run["packages"],
+        "lazy_loaded": median_run["lazy_loaded"],
+        "first_render_seconds": None
+    }
+    if not args.skip_render:
+        results["first_render_seconds"] = statistics.median(
+            measure_first_render()["seconds"] for _ in range(args.repeat)
+        )
+
+    print_report(results)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+    failures = []
+    if results["lazy_loaded"]:
+        failures.append(f"imported at start-up instead of on first use: {', '.join(results['lazy_loaded'])}")
+
+    baseline_path = Path(args.baseline)
+    if args.update_baseline:
+        baseline_path.write_text(json.dumps(results, indent=2))
+        print(f"Baseline updated: {baseline_path}")
+    elif baseline_path.exists():
+        failures.extend(compare_with_baseline(results, json.loads(baseline_path.read_text())))
+    else:
+        print(f"No baseline at {baseline_path}; run with --update-baseline to create one.")
+
+    if failures:
+        print("\nStart-up regressions:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("\nNo start-up regressions.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""
+Deterministic local stand-in for the OpenAI API, for benchmarks.
+
+It reads the table name and schema from the system prompt and answers every
+question with the same kind of SQL an analyst question like "total sales by
+region" would produce, so the rest of the pipeline runs on realistic queries.
+"""
+import re
+
+SCHEMA_LINE = re.compile(r"^\s*- (.+?) \((\w+)\)", re.MULTILINE)
+TABLE_NAME = re.compile(r"The table name is: `([^`]+)`")
+
+def stub_completion(messages, **params):
+    """
+    Answer a chat completion request without calling a model.
+
+    Args:
+        messages: The chat messages; the system message holds the table and schema
+        **params: Ignored completion parameters
+
+    Returns:
+        str: A SQL query for the table in the prompt
+    """
+    system_message = messages[0]["content"]
+    question = messages[-1]["content"].lower()
+    table_name = TABLE_NAME.search(system_message).group(1)
+    schema = SCHEMA_LINE.findall(system_message)
+
+    dimensions = [name for name, col_type in schema if col_type == "CATEGORICAL"]
+    measures = [name for name, col_type in schema if col_type in ("FLOAT", "INTEGER")]
+
+    # Prefer columns named in the question
+    dimensions.sort(key=lambda name: name.lower() not in question)
+    measures.sort(key=lambda name: name.lower() not in question)
+
+    if not dimensions or not measures:
+        return f'SELECT * FROM {table_name} LIMIT 1000'
+
+    return (
+        f'SELECT "{dimensions[0]}", SUM("{measures[0]}") AS total_{measures[0].lower()} '
+        f'FROM {table_name} GROUP BY "{dimensions[0]}" ORDER BY 2 DESC LIMIT 1000'
+    )
@@ -0,0 +1,202 @@
+"""
+End-to-end pipeline benchmark on synthetic sales datasets.
+
+Each dataset size runs in a fresh process, timing every stage of the pipeline
+(the chunked upload ingestion that parses, infers, coerces and loads the file,
+profiling, SQL generation through a
+deterministic local LLM stub, query execution, chart recommendation, chart
+generation and statistics) and recording peak RSS. Results are compared with
+a stored baseline so regressions show up offline.
+
+Usage:
+    python benchmarks/run_benchmarks.py                       # 10k rows x 10 columns
+    python benchmarks/run_benchmarks.py --rows 10k,1m,10m --cols 10,100,500
+    python benchmarks/run_benchmarks.py --update-baseline     # store the current numbers
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BENCHMARK_DIR = Path(__file__).resolve().parent
+sys.path.append(str(BENCHMARK_DIR.parent / "src"))
+
+DEFAULT_BASELINE = BENCHMARK_DIR / "baseline.json"
+QUESTION = "What is the total sales by region?"
+
+# A stage regresses when it is slower than baseline by both this ratio and this many seconds
+TIME_TOLERANCE = 0.25
+TIME_FLOOR_SECONDS = 0.005
+RSS_TOLERANCE = 0.20
+
+def parse_count(text):
+    """
+    Parse a row or column count such as "10k" or "1m".
+
+    Args:
+        text: The count, optionally suffixed with k or m
+
+    Returns:
+        int: The count
+    """
+    text = text.strip().lower()
+    multiplier = {"k": 1_000, "m": 1_000_000}.get(text[-1], 1)
+    return int(float(text.rstrip("km")) * multiplier)
+
+def run_case(rows, cols, seed):
+    """
+    Benchmark the pipeline on one dataset size. Runs in its own process.
+
+    Args:
+        rows: The number of rows
+        cols: The number of columns
+        seed: The random seed for the dataset
+
+    Returns:
+        dict: {"stages": {stage: seconds}, "peak_rss_mb": float, "result_rows": int}
+    """
+    from synthetic_data import write_sales_csv
+    from llm_stub import stub_completion
+    from core.db.duckdb_manager import close_connection
+    from core.db.ingestion import start_ingestion
+    from core.db.query_executor import execute_query
+    from core.db.stats_engine import summarize_result, top_values
+    from core.nlp.nl_to_sql import generate_sql_from_nl_query, set_completion_backend
+    from core.viz.chart_recommendations import recommend_chart_type
+    from core.viz.chart_generator import generate_chart
+
+    set_completion_backend(stub_completion)
+    stages = {}
+
+    def timed(stage, func, *args):
+        start = time.perf_counter()
+        value = func(*args)
+        stages[stage] = time.perf_counter() - start
+        return value
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_path = os.path.join(tmp_dir, "sales.csv")
+        write_sales_csv(csv_path, rows, cols, seed)
+        baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        # The upload path as the app runs it, on the spooled copy the job removes when done
+        spooled_path = os.path.join(tmp_dir, "upload.csv")
+        shutil.copyfile(csv_path, spooled_path)
+        connection, table_name, schema, profile_job = timed(
+            "ingest", lambda: start_ingestion(spooled_path, "sales.csv", delimiter=",").result()
+        )
+
+    # Profiling starts in the background once the table is loaded; this times the wait for it
+    profile = timed("profile_table", profile_job.result)
+    sql = timed("generate_sql", generate_sql_from_nl_query, QUESTION, table_name, schema, profile)
+    results = timed("execute_query", execute_query, connection, sql, table_name)
+    chart_type = timed("recommend_chart_type", recommend_chart_type, results, QUESTION, profile)
+    timed("generate_chart", generate_chart, results, chart_type, QUESTION)
+    timed("statistics", lambda: (summarize_result(results), top_values(results, results.columns[0])))
+    close_connection(connection)
+
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    unit = 1024 * 1024 if sys.platform == "darwin" else 1024
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        "stages": stages,
+        "peak_rss_mb": peak_rss / unit,
+        "dataset_rss_mb": (peak_rss - baseline_rss) / unit,
+        "result_rows": len(results)
+    }
+
+def compare_with_baseline(results, baseline):
+    """
+    Find stages that got slower, or cases that used more memory, than the baseline.
+
+    Args:
+        results: The current results, keyed by case name
+        baseline: The baseline results, keyed by case name
+
+    Returns:
+        list: Human-readable regression descriptions
+    """
+    regressions = []
+    for case, current in results.items():
+        if case not in baseline:
+            continue
+        previous = baseline[case]
+        for stage, seconds in current["stages"].items():
+            before = previous["stages"].get(stage)
+            if before is None:
+                continue
+            if seconds > before * (1 + TIME_TOLERANCE) and seconds - before > TIME_FLOOR_SECONDS:
+                regressions.append(f"{case} {stage}: {before * 1000:.1f}ms -> {seconds * 1000:.1f}ms")
+        if current["peak_rss_mb"] > previous["peak_rss_mb"] * (1 + RSS_TOLERANCE):
+            regressions.append(
+                f"{case} peak RSS: {previous['peak_rss_mb']:.0f}MB -> {current['peak_rss_mb']:.0f}MB"
+            )
+    return regressions
+
+def print_report(results):
+    """
+    Print the stage timings and memory of every case as a table.
+
+    Args:
+        results: The results, keyed by case name
+    """
+    stages = list(next(iter(results.values()))["stages"])
+    print(f"{'case':<14}" + "".join(f"{stage:>22}" for stage in stages) + f"{'peak RSS MB':>14}")
+    for case, result in results.items():
+        print(f"{case:<14}"
+              + "".join(f"{result['stages'][stage] * 1000:>20.1f}ms" for stage in stages)
+              + f"{result['peak_rss_mb']:>14.0f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end pipeline benchmark on synthetic sales data.")
+    parser.add_argument("--rows", default="10k", help="Comma-separated row counts, e.g. 10k,1m,10m")
+    parser.add_argument("--cols", default="10", help="Comma-separated column counts, e.g. 10,100,500")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the synthetic datasets")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="Baseline JSON file")
+    parser.add_argument("--update-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    # A fresh process per case keeps peak RSS attributable to that dataset
+    context = multiprocessing.get_context("spawn")
+    results = {}
+    for rows in [parse_count(r) for r in args.rows.split(",")]:
+        for cols in [parse_count(c) for c in args.cols.split(",")]:
+            case = f"{rows}x{cols}"
+            print(f"Running {case}...", flush=True)
+            with context.Pool(1) as pool:
+                results[case] = pool.apply(run_case, (rows, cols, args.seed))
+
+    print_report(results)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+    baseline_path = Path(args.baseline)
+    if args.update_baseline:
+        baseline = json.loads(baseline_path.read_text()) if baseline_path.exists() else {}
+        baseline.update(results)
+        baseline_path.write_text(json.dumps(baseline, indent=2))
+        print(f"Baseline updated: {baseline_path}")
+        return
+
+    if not baseline_path.exists():
+        print(f"No baseline at {baseline_path}; run with --update-baseline to create one.")
+        return
+
+    regressions = compare_with_baseline(results, json.loads(baseline_path.read_text()))
+    if regressions:
+        print("\nRegressions against baseline:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print("\nNo regressions against baseline.")
+
+if __name__ == "__main__":
+    main()
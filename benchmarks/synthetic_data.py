@@ -0,0 +1,68 @@
+"""
+Synthetic datasets shaped like data/sample_sales.csv, for benchmarks.
+"""
+import numpy as np
+import pandas as pd
+
+REGIONS = ["North", "South", "East", "West"]
+PRODUCTS = {
+    "Electronics": ["Laptop", "Smartphone", "Tablet", "Headphones", "Monitor", "Keyboard"],
+    "Furniture": ["Desk", "Chair", "Bookshelf", "Filing Cabinet", "Lamp"],
+    "Stationery": ["Notebook", "Pen Set", "Binder", "Stapler", "Paper"]
+}
+BASE_COLUMNS = ["Date", "Region", "Product", "Category", "Sales", "Quantity", "Discount"]
+
+def make_sales_chunk(rows, cols, seed, start_row=0):
+    """
+    Generate rows of a sales dataset.
+
+    The first seven columns match data/sample_sales.csv; additional columns
+    alternate between numeric metrics and low-cardinality attributes.
+
+    Args:
+        rows: The number of rows to generate
+        cols: The total number of columns (at least 1)
+        seed: The random seed
+        start_row: The position of the first row, so chunks line up into one dataset
+
+    Returns:
+        pandas.DataFrame: The generated rows
+    """
+    rng = np.random.default_rng(seed + start_row)
+    products = [product for items in PRODUCTS.values() for product in items]
+    product_category = {product: category for category, items in PRODUCTS.items() for product in items}
+
+    product = rng.choice(products, rows)
+    data = {
+        "Date": (pd.Timestamp("2023-01-01") + pd.to_timedelta((start_row + np.arange(rows)) // 1000, unit="D")).strftime("%Y-%m-%d"),
+        "Region": rng.choice(REGIONS, rows),
+        "Product": product,
+        "Category": pd.Series(product).map(product_category).to_numpy(),
+        "Sales": np.round(rng.gamma(2.0, 200.0, rows), 2),
+        "Quantity": rng.integers(1, 100, rows),
+        "Discount": rng.choice([0.0, 0.05, 0.1, 0.15, 0.2], rows)
+    }
+    data = {name: data[name] for name in BASE_COLUMNS[:cols]}
+
+    for i in range(len(data), cols):
+        if i % 2:
+            data[f"Attribute_{i}"] = rng.choice([f"value_{j}" for j in range(12)], rows)
+        else:
+            data[f"Metric_{i}"] = np.round(rng.random(rows) * 1000, 3)
+
+    return pd.DataFrame(data)
+
+def write_sales_csv(path, rows, cols, seed=0, chunk_rows=500_000):
+    """
+    Write a synthetic sales dataset to CSV in chunks, so large datasets never sit in memory.
+
+    Args:
+        path: The CSV path to write
+        rows: The number of rows
+        cols: The number of columns
+        seed: The random seed
+        chunk_rows: The number of rows generated per chunk
+    """
+    for start_row in range(0, rows, chunk_rows):
+        chunk = make_sales_chunk(min(chunk_rows, rows - start_row), cols, seed, start_row)
+        chunk.to_csv(path, mode="w" if start_row == 0 else "a", header=start_row == 0, index=False)
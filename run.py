@@ -2,6 +2,8 @@ import os
 import subprocess
 import sys
 
+from dotenv import load_dotenv
+
 def main():
     """
     Run the Streamlit application.
@@ -19,14 +21,16 @@ def main():
             with open(".env", "w") as f:
                 f.write(f"OPENAI_API_KEY={api_key}\n")
                 f.write("OPENAI_MODEL=gpt-4o\n")
-                f.write("MAX_FILE_SIZE_MB=100\n")
+                f.write("MAX_FILE_SIZE_MB=2000\n")
             
             print("Created .env file with your API key.")
         else:
             print("\nNote: You will need to provide your OpenAI API key in the application.")
     
-    # Run the Streamlit app
-    streamlit_cmd = [sys.executable, "-m", "streamlit", "run", "src/app.py"]
+    # Run the Streamlit app, letting it accept uploads up to the configured size
+    load_dotenv()
+    max_upload_mb = os.getenv("MAX_FILE_SIZE_MB", "2000")
+    streamlit_cmd = [sys.executable, "-m", "streamlit", "run", "src/app.py", f"--server.maxUploadSize={max_upload_mb}"]
     
     try:
         subprocess.run(streamlit_cmd)
@@ -8,11 +8,12 @@ setup(
     packages=find_packages(),
     include_package_data=True,
     install_requires=[
-        "streamlit>=1.28.0",
+        "streamlit>=1.37.0",
         "pandas>=1.5.3",
-        "duckdb>=0.9.0",
+        "duckdb>=1.0.0",
         "openai>=1.3.0",
         "plotly>=5.15.0",
+        "pyarrow>=14.0.0",
         "openpyxl>=3.1.2",
         "xlrd>=2.0.1",
         "python-dotenv>=1.0.0",
@@ -1,18 +1,31 @@
 import os
+import uuid
+import logging
 import streamlit as st
-from dotenv import load_dotenv
 import pandas as pd
 
 # Import custom modules first
 import sys
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-from components.file_upload import file_upload_component
+from components.file_upload import file_upload_component, append_upload_component
 from components.query_interface import query_interface_component
 from components.results_display import results_display_component
 from core.db.query_executor import execute_query
+from core.db.profiler import get_profile, get_profile_error
+from core.db.rollups import RollupManager
+from core.db.approximate import SampleManager
+from core.db.result_cache import ResultCache
+from core.db.suggestions import start_suggestions
+from core.db.duckdb_manager import get_memory_usage, get_total_memory_usage
+from components.trace_display import trace_waterfall_component
+from components.memory_display import session_memory_component
+from utils.config import LOG_LEVEL, ADMIN_VIEW  # Loads the .env file, once per process
+from utils.result_store import result_store
+from utils.telemetry import get_current_trace, finish_trace, start_metrics_server
 
-# Load environment variables
-load_dotenv()
+# Log to the console and expose pipeline metrics for scraping
+logging.basicConfig(level=LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+start_metrics_server()
 
 # Set page configuration
 st.set_page_config(
@@ -30,12 +43,16 @@ st.markdown("""
 """)
 
 # Session state initialization
+if 'session_id' not in st.session_state:
+    # Identifies this session's results in the shared result store
+    st.session_state.session_id = uuid.uuid4().hex
 if 'uploaded_file_info' not in st.session_state:
     st.session_state.uploaded_file_info = {
         "file_object": None,
         "db_connection": None,
         "table_name": None,
         "schema": None,
+        "profile_job": None,
         "initial_data": None
     }
 if 'query_history' not in st.session_state:
@@ -44,17 +61,103 @@ if 'last_query_results' not in st.session_state:
     st.session_state.last_query_results = None
 if 'last_query' not in st.session_state:
     st.session_state.last_query = None
+if 'last_query_trace' not in st.session_state:
+    st.session_state.last_query_trace = None
+if 'rollup_manager' not in st.session_state:
+    st.session_state.rollup_manager = None
+if 'sample_manager' not in st.session_state:
+    st.session_state.sample_manager = None
+if 'result_cache' not in st.session_state:
+    st.session_state.result_cache = None
+if 'approximate_query' not in st.session_state:
+    st.session_state.approximate_query = None
+if 'streaming_query' not in st.session_state:
+    st.session_state.streaming_query = None
+if 'ingestion_job' not in st.session_state:
+    st.session_state.ingestion_job = None
+if 'suggestion_job' not in st.session_state:
+    st.session_state.suggestion_job = None
+if 'append_job' not in st.session_state:
+    st.session_state.append_job = None
 
 # --- File Upload Section --- (Always shown)
 st.sidebar.header("1. Upload Data")
+previous_connection = st.session_state.uploaded_file_info["db_connection"]
 (st.session_state.uploaded_file_info["file_object"], 
  st.session_state.uploaded_file_info["db_connection"], 
  st.session_state.uploaded_file_info["table_name"], 
- st.session_state.uploaded_file_info["schema"]) = file_upload_component(
+ st.session_state.uploaded_file_info["schema"],
+ st.session_state.uploaded_file_info["profile_job"]) = file_upload_component(
     st.session_state.uploaded_file_info["file_object"], 
     st.session_state.uploaded_file_info["db_connection"],
-    st.sidebar # Pass sidebar as the container
+    st.sidebar, # Pass sidebar as the container
+    st.session_state.uploaded_file_info["table_name"],
+    st.session_state.uploaded_file_info["schema"],
+    st.session_state.uploaded_file_info["profile_job"]
 )
+if st.session_state.uploaded_file_info["db_connection"] is not previous_connection:
+    # A different dataset was loaded (or removed); drop views of the old one
+    st.session_state.uploaded_file_info["initial_data"] = None
+    st.session_state.last_query_results = None
+    st.session_state.last_query = None
+    st.session_state.last_query_trace = None
+    st.session_state.approximate_query = None
+
+# Rollups, samples and cached results are derived from the loaded table, so they belong to its connection
+db_connection = st.session_state.uploaded_file_info["db_connection"]
+if st.session_state.rollup_manager is not None and st.session_state.rollup_manager.connection is not db_connection:
+    st.session_state.rollup_manager.invalidate()
+    st.session_state.sample_manager.invalidate()
+    st.session_state.result_cache.invalidate()
+    st.session_state.rollup_manager = None
+    st.session_state.sample_manager = None
+    st.session_state.result_cache = None
+if st.session_state.suggestion_job is not None and (
+    st.session_state.suggestion_job.connection is not db_connection
+    or st.session_state.suggestion_job.table_name != st.session_state.uploaded_file_info["table_name"]
+):
+    st.session_state.suggestion_job.cancel()
+    st.session_state.suggestion_job = None
+if st.session_state.rollup_manager is None and db_connection is not None:
+    st.session_state.rollup_manager = RollupManager(db_connection)
+    st.session_state.sample_manager = SampleManager(db_connection)
+    st.session_state.result_cache = ResultCache(db_connection)
+    if st.session_state.uploaded_file_info["table_name"] is not None:
+        st.session_state.sample_manager.start(st.session_state.uploaded_file_info["table_name"])
+
+# Newer extracts of the loaded table are appended to it rather than replacing it
+if db_connection is not None and st.session_state.uploaded_file_info["table_name"] is not None:
+    previous_profile_job = st.session_state.uploaded_file_info["profile_job"]
+    (st.session_state.uploaded_file_info["schema"],
+     st.session_state.uploaded_file_info["profile_job"]) = append_upload_component(
+        st.sidebar,
+        db_connection,
+        st.session_state.uploaded_file_info["table_name"],
+        st.session_state.uploaded_file_info["schema"],
+        st.session_state.uploaded_file_info["profile_job"],
+        [st.session_state.rollup_manager, st.session_state.sample_manager, st.session_state.result_cache]
+    )
+    if st.session_state.uploaded_file_info["profile_job"] is not previous_profile_job:
+        # Rows were appended; rollups, samples and cached results were updated in place
+        st.session_state.uploaded_file_info["initial_data"] = None
+        if st.session_state.suggestion_job is not None:
+            st.session_state.suggestion_job.cancel()
+            st.session_state.suggestion_job = None
+
+# Whole-table profile, available once the background profiling job has finished
+table_profile = get_profile(st.session_state.uploaded_file_info["profile_job"])
+profile_error = get_profile_error(st.session_state.uploaded_file_info["profile_job"])
+if profile_error is not None:
+    st.sidebar.warning(f"Table profiling failed ({profile_error}); questions are answered without column statistics.")
+
+# Suggested questions are precomputed speculatively once the table is profiled
+if st.session_state.suggestion_job is None and table_profile is not None and db_connection is not None:
+    st.session_state.suggestion_job = start_suggestions(
+        db_connection,
+        st.session_state.uploaded_file_info["table_name"],
+        st.session_state.uploaded_file_info["schema"],
+        table_profile
+    )
 
 # --- Main Area --- #
 
@@ -64,27 +167,37 @@ data_loaded = (st.session_state.uploaded_file_info["db_connection"] is not None
 
 if data_loaded:
     # Fetch initial data if not already done
-    if st.session_state.uploaded_file_info["initial_data"] is None:
+    # Results are kept in the shared result store, which may spill them to disk; the session holds handles
+    initial_data = st.session_state.uploaded_file_info["initial_data"]
+    if initial_data is None or not initial_data.available():
         try:
             with st.spinner("Loading initial data view..."):
                 table = st.session_state.uploaded_file_info["table_name"]
                 # Fetch first 1000 rows as initial preview
                 initial_sql = f'SELECT * FROM "{table}" LIMIT 1000;' 
-                st.session_state.uploaded_file_info["initial_data"] = execute_query(
+                initial_data = execute_query(
                     st.session_state.uploaded_file_info["db_connection"], 
                     initial_sql, 
                     table # Pass table name for validation
                 )
         except Exception as e:
             st.error(f"Error loading initial data: {e}")
-            st.session_state.uploaded_file_info["initial_data"] = pd.DataFrame() # Set empty df on error
+            initial_data = pd.DataFrame() # Set empty df on error
+        st.session_state.uploaded_file_info["initial_data"] = result_store.put(
+            st.session_state.session_id, "initial_data", initial_data
+        )
 
     # --- Query Interface Section --- #
     st.header("2. Ask Questions")
     query, sql, query_results = query_interface_component(
         st.session_state.uploaded_file_info["db_connection"],
         st.session_state.uploaded_file_info["table_name"],
-        st.session_state.uploaded_file_info["schema"]
+        st.session_state.uploaded_file_info["schema"],
+        table_profile,
+        st.session_state.rollup_manager,
+        st.session_state.sample_manager,
+        st.session_state.result_cache,
+        st.session_state.suggestion_job
     )
     
     # Update history and last results if a new query ran successfully
@@ -92,37 +205,74 @@ if data_loaded:
         st.session_state.query_history.append({
             "query": query,
             "sql": sql,
-            "timestamp": pd.Timestamp.now()
+            "timestamp": pd.Timestamp.now(),
+            "trace": get_current_trace(),
+            "profile": query_results.attrs.get("query_profile")
         })
-        st.session_state.last_query_results = query_results
+        st.session_state.last_query_results = result_store.put(
+            st.session_state.session_id, "last_query_results", query_results
+        )
         st.session_state.last_query = query
     elif query and query_results is None:
         # If query ran but failed, potentially clear old results
         # st.session_state.last_query_results = None # Optional: Decide if failed queries clear results
         pass
 
+    # Rollups built from frequent query patterns
+    if st.session_state.rollup_manager is not None:
+        rollups = st.session_state.rollup_manager.list_rollups()
+        if rollups:
+            with st.sidebar.expander(f"Precomputed rollups ({len(rollups)})"):
+                st.dataframe(pd.DataFrame(rollups), use_container_width=True, hide_index=True)
+
+    # Memory of this session's database, including what was spilled to disk
+    memory_usage = get_memory_usage(st.session_state.uploaded_file_info["db_connection"])
+    st.sidebar.caption(
+        f"Database memory: {memory_usage['memory_bytes'] / (1024 * 1024):.0f} MB "
+        f"of {memory_usage['memory_limit']}, "
+        f"{memory_usage['spilled_bytes'] / (1024 * 1024):.0f} MB spilled to disk"
+    )
+    if ADMIN_VIEW:
+        with st.sidebar.expander("Server memory (admin)"):
+            session_memory_component(result_store.usage(), get_total_memory_usage(), st.session_state.session_id)
+
     # --- Results Display Section --- #
     st.divider()
     st.header("3. Analysis Results")
     
     # Decide what data to display
-    if st.session_state.last_query_results is not None:
+    last_query_results = st.session_state.last_query_results
+    last_query_results = last_query_results.get() if last_query_results is not None else None
+    if last_query_results is not None:
         # If a query has been run successfully, show its results
         st.markdown("**Showing results for your last query:**")
         results_display_component(
-            st.session_state.last_query_results,
-            st.session_state.last_query # Pass the query for context
+            last_query_results,
+            st.session_state.last_query, # Pass the query for context
+            table_profile,
+            result_key=st.session_state.last_query_results.key
         )
-    elif st.session_state.uploaded_file_info["initial_data"] is not None:
+    elif st.session_state.uploaded_file_info["initial_data"].available():
         # Otherwise, show the initial data analysis if available
         st.markdown("**Initial Data Overview (first 1000 rows):**")
         results_display_component(
-            st.session_state.uploaded_file_info["initial_data"],
-            query=None # No specific query for initial view
+            st.session_state.uploaded_file_info["initial_data"].get(),
+            query=None, # No specific query for initial view
+            profile=table_profile,
+            show_table_profile=True, # Statistics describe the whole table, not the preview
+            result_key=st.session_state.uploaded_file_info["initial_data"].key
         )
     else:
         # If initial data failed loading
         st.warning("Could not load initial data preview.")
+    
+    # Finish the trace of a query run in this rerun, now that its results are rendered
+    query_trace = get_current_trace()
+    if query_trace is not None:
+        finish_trace(query_trace)
+        st.session_state.last_query_trace = query_trace
+    if last_query_results is not None:
+        trace_waterfall_component(st.session_state.last_query_trace)
 
 else:
     # Shown when no file is loaded
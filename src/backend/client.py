@@ -0,0 +1,307 @@
+import json
+import os
+import time
+from urllib.error import HTTPError
+from urllib.parse import urlencode, quote
+from urllib.request import Request, urlopen
+
+import pandas as pd
+import pyarrow.ipc as ipc
+
+# Import custom modules
+from utils.config import BACKEND_URL, BACKEND_MAX_WAIT_SECONDS, BACKEND_CLIENT_TIMEOUT_SECONDS
+
+# Job states after which a job changes no more
+FINISHED_STATES = ("done", "failed", "cancelled")
+
+class BackendError(Exception):
+    """
+    Raised when the backend answers a request with an error.
+    """
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+class BackendClient:
+    """
+    Client of the backend service (see backend/server.py).
+
+    Frontends using it hold dataset and job ids only: the DuckDB connections,
+    LLM calls, charts and statistics stay in the backend. Results arrive as
+    Arrow IPC streams and are rebuilt as DataFrames with their attributes.
+    """
+
+    def __init__(self, base_url=BACKEND_URL, timeout=BACKEND_CLIENT_TIMEOUT_SECONDS):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def _request(self, method, path, params=None, body=None, headers=None):
+        """
+        Send a request to the backend.
+
+        Args:
+            method: The HTTP method
+            path: The path, e.g. "/datasets"
+            params: Optional query parameters
+            body: Optional request body (bytes or a binary file)
+            headers: Optional request headers
+
+        Returns:
+            http.client.HTTPResponse: The open response
+
+        Raises:
+            BackendError: If the backend answers with an error status
+        """
+        url = f"{self.base_url}{path}"
+        if params:
+            url = f"{url}?{urlencode(params)}"
+        request = Request(url, data=body, method=method, headers=headers or {})
+        try:
+            return urlopen(request, timeout=self.timeout)
+        except HTTPError as e:
+            try:
+                message = json.loads(e.read())["error"]
+            except (ValueError, KeyError):
+                message = e.reason
+            raise BackendError(e.code, message) from None
+
+    def _json(self, method, path, params=None, payload=None):
+        """
+        Send a request with an optional JSON body and read the JSON answer.
+
+        Args:
+            method: The HTTP method
+            path: The path
+            params: Optional query parameters
+            payload: Optional JSON-serializable request body
+
+        Returns:
+            dict: The answer
+        """
+        body = json.dumps(payload).encode("utf-8") if payload is not None else None
+        headers = {"Content-Type": "application/json"} if body is not None else None
+        with self._request(method, path, params, body, headers) as response:
+            return json.loads(response.read())
+
+    def upload(self, file, file_name, **options):
+        """
+        Upload a CSV or Excel file; the backend loads it in the background.
+
+        The file is streamed from disk (or from its buffer) without being read into memory first.
+
+        Args:
+            file: The path of the file, or a binary file object (e.g. a Streamlit UploadedFile)
+            file_name: The original file name
+            **options: delimiter (CSV) or sheet_name (Excel)
+
+        Returns:
+            dict: The dataset description, see wait_for_dataset
+        """
+        params = {"file_name": file_name, **{name: str(value) for name, value in options.items()}}
+        if isinstance(file, (str, os.PathLike)):
+            with open(file, "rb") as source:
+                return self._upload(source, os.fstat(source.fileno()).st_size, params)
+        file.seek(0, os.SEEK_END)
+        size = file.tell()
+        file.seek(0)
+        return self._upload(file, size, params)
+
+    def _upload(self, source, size, params):
+        headers = {"Content-Type": "application/octet-stream", "Content-Length": str(size)}
+        with self._request("POST", "/datasets", params, source, headers) as response:
+            return json.loads(response.read())
+
+    def dataset(self, dataset_id):
+        """
+        Describe a dataset.
+
+        Args:
+            dataset_id: The dataset id
+
+        Returns:
+            dict: {"dataset", "file_name", "status", "progress", "error", "table_name",
+                   "schema", "converted", "unparsed", "profile"}
+        """
+        return self._json("GET", f"/datasets/{quote(dataset_id)}")
+
+    def wait_for_dataset(self, dataset_id, poll_seconds=0.5):
+        """
+        Wait until a dataset is loaded.
+
+        Args:
+            dataset_id: The dataset id
+            poll_seconds: How often to ask
+
+        Returns:
+            dict: The dataset description
+
+        Raises:
+            BackendError: If loading failed
+            TimeoutError: If it takes longer than the client's timeout
+        """
+        deadline = time.monotonic() + self.timeout
+        while True:
+            dataset = self.dataset(dataset_id)
+            if dataset["status"] == "ready":
+                return dataset
+            if dataset["status"] == "failed":
+                raise BackendError(422, dataset["error"])
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Dataset {dataset_id} is still loading")
+            time.sleep(poll_seconds)
+
+    def drop_dataset(self, dataset_id):
+        """
+        Drop a dataset and everything derived from it.
+
+        Args:
+            dataset_id: The dataset id
+        """
+        self._json("DELETE", f"/datasets/{quote(dataset_id)}")
+
+    def submit(self, dataset_id, question=None, sql=None, approximate=False):
+        """
+        Queue a question or a SQL query.
+
+        Args:
+            dataset_id: The dataset id
+            question: The natural language question
+            sql: The SQL query, if no question is given
+            approximate: Estimate aggregates from the table's sample
+
+        Returns:
+            dict: The job description, see job
+        """
+        if question:
+            return self._json("POST", f"/datasets/{quote(dataset_id)}/query",
+                              payload={"question": question, "approximate": approximate})
+        return self._json("POST", f"/datasets/{quote(dataset_id)}/execute",
+                          payload={"sql": sql, "approximate": approximate})
+
+    def generate_sql(self, dataset_id, question):
+        """
+        Turn a question into checked SQL without running it.
+
+        Args:
+            dataset_id: The dataset id
+            question: The natural language question
+
+        Returns:
+            str: The SQL query
+        """
+        job = self.wait_for_job(self._json("POST", f"/datasets/{quote(dataset_id)}/sql", payload={"question": question})["job"])
+        return job["sql"]
+
+    def job(self, job_id, wait=None):
+        """
+        Describe a job.
+
+        Args:
+            job_id: The job id
+            wait: Optional seconds the backend may hold the answer until the job finishes
+
+        Returns:
+            dict: {"job", "dataset", "status", "question", "sql", "error", "rows",
+                   "columns", "attrs", "seconds"}
+        """
+        return self._json("GET", f"/jobs/{quote(job_id)}", {"wait": wait} if wait else None)
+
+    def wait_for_job(self, job_id):
+        """
+        Wait until a job finishes.
+
+        Args:
+            job_id: The job id
+
+        Returns:
+            dict: The job description
+
+        Raises:
+            BackendError: If the job failed or was cancelled
+            TimeoutError: If it takes longer than the client's timeout
+        """
+        deadline = time.monotonic() + self.timeout
+        while True:
+            job = self.job(job_id, wait=BACKEND_MAX_WAIT_SECONDS)
+            if job["status"] == "done":
+                return job
+            if job["status"] in FINISHED_STATES:
+                raise BackendError(422, job["error"] or f"Job {job_id} was {job['status']}")
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Job {job_id} is still {job['status']}")
+
+    def cancel(self, job_id):
+        """
+        Cancel a job, interrupting its query if it is running.
+
+        Args:
+            job_id: The job id
+        """
+        self._json("DELETE", f"/jobs/{quote(job_id)}")
+
+    def result(self, job):
+        """
+        Download the result of a finished job.
+
+        Args:
+            job: The job description (as returned by wait_for_job)
+
+        Returns:
+            pandas.DataFrame: The result, with the attributes the backend attached
+        """
+        with self._request("GET", f"/jobs/{quote(job['job'])}/result") as response:
+            df = ipc.open_stream(response).read_pandas()
+        df.attrs.update(job["attrs"])
+        return df
+
+    def query(self, dataset_id, question=None, sql=None, approximate=False):
+        """
+        Answer a question (or run a SQL query) and download the result.
+
+        Args:
+            dataset_id: The dataset id
+            question: The natural language question
+            sql: The SQL query, if no question is given
+            approximate: Estimate aggregates from the table's sample
+
+        Returns:
+            tuple: (job description, result DataFrame)
+        """
+        job = self.wait_for_job(self.submit(dataset_id, question, sql, approximate)["job"])
+        return job, self.result(job)
+
+    def chart(self, job_id, chart_type=None):
+        """
+        Get the chart of a job's result, built by the backend.
+
+        Args:
+            job_id: The job id
+            chart_type: The chart type; the backend recommends one if None
+
+        Returns:
+            tuple: (chart type, plotly.graph_objects.Figure)
+        """
+        # Plotly is only needed to show the figure, so it is imported on the first chart
+        import plotly.io as pio
+
+        answer = self._json("GET", f"/jobs/{quote(job_id)}/chart", {"chart_type": chart_type} if chart_type else None)
+        return answer["chart_type"], pio.from_json(json.dumps(answer["figure"]))
+
+    def statistics(self, job_id, column=None):
+        """
+        Get the statistics of a job's result, computed by the backend.
+
+        Args:
+            job_id: The job id
+            column: Optional column to also count the most frequent values of
+
+        Returns:
+            dict: {"numeric": DataFrame shaped like describe() or None,
+                   "distinct": {column: approximate distinct count},
+                   "top_values": DataFrame [column, 'count'] or None}
+        """
+        answer = self._json("GET", f"/jobs/{quote(job_id)}/stats", {"column": column} if column is not None else None)
+        numeric = pd.DataFrame(answer["numeric"]) if answer["numeric"] is not None else None
+        counts = pd.DataFrame(answer["top_values"], columns=[column, "count"]) if answer["top_values"] is not None else None
+        return {"numeric": numeric, "distinct": answer["distinct"], "top_values": counts}
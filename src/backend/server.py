@@ -0,0 +1,356 @@
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlsplit, parse_qs
+
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+# Import custom modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend.service import AnalysisService, NotFoundError, NotReadyError
+from utils.config import (
+    BACKEND_HOST, BACKEND_PORT, BACKEND_WORKERS, BACKEND_MAX_WAIT_SECONDS, MAX_FILE_SIZE_MB, STREAM_BATCH_ROWS,
+    LOG_LEVEL
+)
+from utils.file_utils import save_stream, clean_up_file, get_file_extension
+from utils.telemetry import span, increment, start_metrics_server
+
+logger = logging.getLogger(__name__)
+
+ARROW_STREAM_TYPE = "application/vnd.apache.arrow.stream"
+
+# (method, path pattern, handler method); ids are hex strings
+_ROUTES = [
+    ("GET", r"/health", "health"),
+    ("GET", r"/datasets", "list_datasets"),
+    ("POST", r"/datasets", "upload"),
+    ("GET", r"/datasets/(\w+)", "describe_dataset"),
+    ("DELETE", r"/datasets/(\w+)", "drop_dataset"),
+    ("POST", r"/datasets/(\w+)/sql", "generate_sql"),
+    ("POST", r"/datasets/(\w+)/query", "query"),
+    ("POST", r"/datasets/(\w+)/execute", "execute"),
+    ("GET", r"/jobs/(\w+)", "describe_job"),
+    ("DELETE", r"/jobs/(\w+)", "cancel_job"),
+    ("GET", r"/jobs/(\w+)/result", "job_result"),
+    ("GET", r"/jobs/(\w+)/chart", "job_chart"),
+    ("GET", r"/jobs/(\w+)/stats", "job_stats")
+]
+_COMPILED_ROUTES = [(method, re.compile(f"{pattern}/?"), name) for method, pattern, name in _ROUTES]
+
+class RequestError(Exception):
+    """
+    Raised by a route to answer with an HTTP error status.
+    """
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+class _BackendHandler(BaseHTTPRequestHandler):
+    """
+    Routes the backend's HTTP API to the AnalysisService.
+
+    Every request is handled on its own thread; the heavy work runs on the
+    service's worker pool, and queries run as jobs that clients poll, so a
+    slow question never holds up other requests.
+    """
+
+    service = None
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    def _dispatch(self, method):
+        """
+        Find the route of the request and run it, answering errors as JSON.
+
+        Args:
+            method: The HTTP method
+        """
+        url = urlsplit(self.path)
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        route = None
+        for route_method, pattern, name in _COMPILED_ROUTES:
+            match = pattern.fullmatch(url.path)
+            if match and route_method == method:
+                route = (name, match.groups())
+                break
+            if match:
+                route = route or ("method_not_allowed", ())
+
+        name, args = route or ("not_found", ())
+        status = 500
+        with span("backend_request", route=name) as attrs:
+            try:
+                if name == "not_found":
+                    raise RequestError(404, f"No such endpoint: {url.path}")
+                if name == "method_not_allowed":
+                    raise RequestError(405, f"{method} is not supported on {url.path}")
+                status = getattr(self, f"_route_{name}")(params, *args)
+            except RequestError as e:
+                status = self._send_error_json(e.status, str(e))
+            except NotFoundError as e:
+                status = self._send_error_json(404, str(e))
+            except NotReadyError as e:
+                status = self._send_error_json(409, str(e))
+            except ValueError as e:
+                status = self._send_error_json(400, str(e))
+            except Exception as e:
+                logger.exception("Backend request %s %s failed", method, self.path)
+                status = self._send_error_json(500, str(e))
+            attrs["status"] = status
+        increment("backend_requests_total", route=name, status=str(status))
+
+    def _read_json(self):
+        """
+        Read the JSON object in the request body.
+
+        Returns:
+            dict: The request body
+        """
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError as e:
+            raise RequestError(400, f"Invalid JSON body: {e}")
+        if not isinstance(body, dict):
+            raise RequestError(400, "The request body must be a JSON object")
+        return body
+
+    def _send_json(self, status, payload):
+        """
+        Answer with a JSON document.
+
+        Args:
+            status: The HTTP status
+            payload: The JSON-serializable document
+
+        Returns:
+            int: The status
+        """
+        return self._send_body(status, json.dumps(payload).encode("utf-8"), "application/json")
+
+    def _send_body(self, status, body, content_type):
+        """
+        Answer with a complete body.
+
+        Args:
+            status: The HTTP status
+            body: The body bytes
+            content_type: The Content-Type header
+
+        Returns:
+            int: The status
+        """
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        return status
+
+    def _send_error_json(self, status, message):
+        """
+        Answer with {"error": message}.
+
+        Args:
+            status: The HTTP status
+            message: The error message
+
+        Returns:
+            int: The status
+        """
+        return self._send_json(status, {"error": message})
+
+    def _route_health(self, params):
+        return self._send_json(200, {"status": "ok", "datasets": len(self.service.list_datasets())})
+
+    def _route_list_datasets(self, params):
+        datasets = [
+            {"dataset": dataset_id, "file_name": file_name} for dataset_id, file_name in self.service.list_datasets()
+        ]
+        return self._send_json(200, {"datasets": datasets})
+
+    def _route_upload(self, params):
+        """
+        POST /datasets?file_name=sales.csv[&delimiter=;|&sheet_name=Sheet1] with the raw
+        file as the body. The file is spooled to disk and loaded in the background.
+        """
+        file_name = Path(params.get("file_name", "")).name
+        if get_file_extension(file_name) not in (".csv", ".xlsx", ".xls"):
+            raise RequestError(400, "file_name must name a CSV or Excel file")
+        if self.headers.get("Content-Length") is None:
+            raise RequestError(411, "Uploads need a Content-Length")
+        size = int(self.headers["Content-Length"])
+        if size > MAX_FILE_SIZE_MB * 1024 * 1024:
+            raise RequestError(413, f"File exceeds maximum size of {MAX_FILE_SIZE_MB}MB")
+
+        options = {}
+        if "delimiter" in params:
+            options["delimiter"] = params["delimiter"]
+        if "sheet_name" in params:
+            sheet_name = params["sheet_name"]
+            options["sheet_name"] = int(sheet_name) if sheet_name.isdigit() else sheet_name
+        file_path = save_stream(self.rfile, file_name, size)
+        try:
+            dataset = self.service.upload(file_path, file_name, **options)
+        except Exception:
+            clean_up_file(file_path)
+            raise
+        return self._send_json(202, dataset.describe())
+
+    def _route_describe_dataset(self, params, dataset_id):
+        return self._send_json(200, self.service.dataset(dataset_id).describe())
+
+    def _route_drop_dataset(self, params, dataset_id):
+        self.service.drop_dataset(dataset_id)
+        return self._send_json(200, {"dataset": dataset_id, "dropped": True})
+
+    def _route_generate_sql(self, params, dataset_id):
+        body = self._read_json()
+        job = self.service.submit_query(dataset_id, question=body.get("question"), execute=False)
+        return self._send_json(202, job.describe())
+
+    def _route_query(self, params, dataset_id):
+        body = self._read_json()
+        if not body.get("question"):
+            raise RequestError(400, "A question is required")
+        job = self.service.submit_query(
+            dataset_id, question=body["question"], approximate=bool(body.get("approximate"))
+        )
+        return self._send_json(202, job.describe())
+
+    def _route_execute(self, params, dataset_id):
+        body = self._read_json()
+        if not body.get("sql"):
+            raise RequestError(400, "A SQL query is required")
+        job = self.service.submit_query(dataset_id, sql=body["sql"], approximate=bool(body.get("approximate")))
+        return self._send_json(202, job.describe())
+
+    def _route_describe_job(self, params, job_id):
+        """
+        GET /jobs/<id>[?wait=seconds]: with wait, the answer is held until the
+        job finishes or the wait (at most BACKEND_MAX_WAIT_SECONDS) runs out.
+        """
+        if "wait" in params:
+            job = self.service.wait(job_id, min(float(params["wait"]), BACKEND_MAX_WAIT_SECONDS))
+        else:
+            job = self.service.job(job_id)
+        return self._send_json(200, job.describe())
+
+    def _route_cancel_job(self, params, job_id):
+        self.service.cancel_job(job_id)
+        return self._send_json(200, self.service.job(job_id).describe())
+
+    def _route_job_result(self, params, job_id):
+        """
+        GET /jobs/<id>/result: the result as an Arrow IPC stream, written batch by batch.
+        """
+        df = self.service.result(job_id)
+        # Attributes travel in the job description, not in the Arrow schema
+        plain = df.copy(deep=False)
+        plain.attrs = {}
+        table = pa.Table.from_pandas(plain, preserve_index=False)
+
+        self.send_response(200)
+        self.send_header("Content-Type", ARROW_STREAM_TYPE)
+        # The stream is written as it is produced; the connection closing ends it
+        self.send_header("Connection", "close")
+        self.end_headers()
+        try:
+            with span("result_transfer", rows=table.num_rows):
+                with ipc.new_stream(self.wfile, table.schema) as writer:
+                    for batch in table.to_batches(max_chunksize=STREAM_BATCH_ROWS):
+                        writer.write_batch(batch)
+        except (OSError, pa.ArrowException) as e:
+            # The headers are sent, so no error can be answered any more
+            logger.warning("Sending the result of job %s failed: %s", job_id, e)
+        return 200
+
+    def _route_job_chart(self, params, job_id):
+        chart = self.service.chart(job_id, params.get("chart_type"))
+        # The figure is already JSON; embed it rather than parse and re-encode it
+        body = f'{{"chart_type": {json.dumps(chart["chart_type"])}, "figure": {chart["figure"]}}}'
+        return self._send_body(200, body.encode("utf-8"), "application/json")
+
+    def _route_job_stats(self, params, job_id):
+        return self._send_json(200, self.service.statistics(job_id, params.get("column")))
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+def make_server(host=BACKEND_HOST, port=BACKEND_PORT, workers=BACKEND_WORKERS):
+    """
+    Create the backend HTTP server and its AnalysisService.
+
+    Args:
+        host: The interface to bind
+        port: The port to listen on (0 picks a free port)
+        workers: The size of the service's worker pool
+
+    Returns:
+        ThreadingHTTPServer: The server; its service is server.service
+    """
+    service = AnalysisService(workers)
+    handler = type("BackendHandler", (_BackendHandler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+def start_server(host=BACKEND_HOST, port=BACKEND_PORT, workers=BACKEND_WORKERS):
+    """
+    Serve the backend from a background thread, e.g. inside another process for testing.
+
+    Args:
+        host: The interface to bind
+        port: The port to listen on (0 picks a free port)
+        workers: The size of the service's worker pool
+
+    Returns:
+        ThreadingHTTPServer: The running server; stop it with shutdown()
+    """
+    server = make_server(host, port, workers)
+    threading.Thread(target=server.serve_forever, name="backend-server", daemon=True).start()
+    return server
+
+def main(argv=None):
+    """
+    Command line entry point of the backend service.
+
+    Args:
+        argv: Optional argument list (defaults to sys.argv)
+    """
+    parser = argparse.ArgumentParser(description="Serve uploads, questions, queries, charts and statistics over HTTP.")
+    parser.add_argument("--host", default=BACKEND_HOST, help="Interface to bind")
+    parser.add_argument("--port", type=int, default=BACKEND_PORT, help="Port to listen on")
+    parser.add_argument("-w", "--workers", type=int, default=BACKEND_WORKERS, help="Size of the worker pool")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    start_metrics_server()
+    server = make_server(args.host, args.port, args.workers)
+    logger.info("Backend listening on http://%s:%s with %d workers", args.host, server.server_port, args.workers)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.service.shutdown()
+
+if __name__ == "__main__":
+    main()
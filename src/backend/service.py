@@ -0,0 +1,623 @@
+import logging
+import math
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import duckdb
+
+# Import custom modules
+from core.db.ingestion import start_ingestion
+from core.db.duckdb_manager import close_connection
+from core.db.profiler import get_profile
+from core.db.query_executor import execute_query
+from core.db.rollups import RollupManager
+from core.db.approximate import SampleManager
+from core.db.result_cache import ResultCache
+from core.db.stats_engine import summarize_result, top_values
+from core.nlp.nl_to_sql import generate_checked_sql
+from utils.config import BACKEND_WORKERS, BACKEND_JOB_TTL_SECONDS
+from utils.result_store import result_store
+from utils.telemetry import span, increment, start_trace, finish_trace
+
+logger = logging.getLogger(__name__)
+
+# Result attributes that only make sense inside the process that built them
+_LOCAL_ATTRS = ("figure",)
+
+class NotFoundError(Exception):
+    """
+    Raised for an unknown (or expired) dataset or job id.
+    """
+
+class NotReadyError(Exception):
+    """
+    Raised when a dataset or job is asked for something it does not have yet.
+    """
+
+class QueryCancelled(Exception):
+    """
+    Raised inside a query job that was cancelled.
+    """
+
+def _plain(value):
+    """
+    Convert a value to one JSON can represent: NumPy scalars become Python
+    numbers, NaN becomes None and dates become ISO strings.
+
+    Args:
+        value: The value
+
+    Returns:
+        The converted value
+    """
+    if isinstance(value, dict):
+        return {str(key): _plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(item) for item in value]
+    if hasattr(value, "item") and not hasattr(value, "__len__"):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+class Dataset:
+    """
+    A table uploaded to the backend, with the rollups, sample and cached
+    results derived from it.
+
+    The dataset's DuckDB work runs under its lock on its one connection; SQL is
+    generated outside it. Each query is still parallelized by DuckDB; different
+    datasets run concurrently.
+    """
+
+    def __init__(self, dataset_id, file_name, ingestion_job):
+        self.dataset_id = dataset_id
+        self.file_name = file_name
+        self.ingestion_job = ingestion_job
+        self.lock = threading.Lock()
+        self.connection = None
+        self.table_name = None
+        self.schema = None
+        self.profile_job = None
+        self.rollups = None
+        self.sampler = None
+        self.results = None
+        self.error = None
+        self.running_job = None
+        self._state_lock = threading.Lock()
+
+    def ready(self):
+        """
+        Check whether the upload is loaded, finishing the dataset's set-up the first time it is.
+
+        Returns:
+            bool: True once the table can be queried
+        """
+        with self._state_lock:
+            if self.connection is not None:
+                return True
+            if self.error is not None or not self.ingestion_job.done():
+                return False
+            try:
+                self.connection, self.table_name, self.schema, self.profile_job = self.ingestion_job.result()
+            except Exception as e:
+                self.error = str(e)
+                return False
+            self.rollups = RollupManager(self.connection)
+            self.sampler = SampleManager(self.connection)
+            self.results = ResultCache(self.connection)
+            self.sampler.start(self.table_name)
+            return True
+
+    def profile(self):
+        """
+        Get the whole-table profile without blocking.
+
+        Returns:
+            dict: The profile, or None while it is computed
+        """
+        return get_profile(self.profile_job) if self.ready() else None
+
+    def describe(self):
+        """
+        Describe the dataset for clients.
+
+        Returns:
+            dict: {"dataset", "file_name", "status", "progress", "error", "table_name",
+                   "schema", "converted", "unparsed", "profile"}; status is "loading", "ready" or "failed"
+        """
+        ready = self.ready()
+        profile = self.profile()
+        if profile is not None:
+            # The value index only serves SQL generation, which stays in the backend
+            profile = _plain({name: value for name, value in profile.items() if name != "value_index"})
+        return {
+            "dataset": self.dataset_id,
+            "file_name": self.file_name,
+            "status": "ready" if ready else ("failed" if self.error is not None else "loading"),
+            "progress": _plain(self.ingestion_job.progress()),
+            "error": self.error,
+            "table_name": self.table_name,
+            "schema": self.schema,
+            "converted": self.ingestion_job.converted,
+            "unparsed": self.ingestion_job.unparsed,
+            "profile": profile
+        }
+
+    def close(self):
+        """
+        Drop the dataset: stop loading it, or drop its derived tables and close its connection.
+        """
+        if not self.ingestion_job.done():
+            # The job closes its connection when it notices
+            self.ingestion_job.cancel()
+            self.ingestion_job.future.add_done_callback(
+                lambda future: future.exception() is None and close_connection(future.result()[0])
+            )
+            return
+        if not self.ready():
+            return
+        if self.running_job is not None:
+            self.connection.interrupt()
+        with self.lock:
+            self.rollups.invalidate()
+            self.sampler.invalidate()
+            self.results.invalidate()
+            close_connection(self.connection)
+
+class QueryJob:
+    """
+    Handle of a question or SQL query run by the backend's worker pool.
+
+    A question is first turned into SQL. Unless the job only generates SQL,
+    the query then runs and its result is kept in the shared result store.
+    """
+
+    def __init__(self, job_id, dataset, question=None, sql=None, approximate=False, execute=True):
+        self.job_id = job_id
+        self.dataset = dataset
+        self.question = question
+        self.sql = sql
+        self.approximate = approximate
+        self.execute = execute
+        self.result = None
+        self.rows = None
+        self.columns = None
+        self.attrs = {}
+        self.error = None
+        self.created = time.monotonic()
+        self.started = None
+        self.finished = None
+        self.future = None
+        self._cancelled = threading.Event()
+
+    def state(self):
+        """
+        Get the job's state.
+
+        Returns:
+            str: "queued", "running", "done", "failed" or "cancelled"
+        """
+        if self._cancelled.is_set() and (self.finished is None or self.error is not None):
+            return "cancelled"
+        if self.finished is not None:
+            return "failed" if self.error is not None else "done"
+        return "running" if self.started is not None else "queued"
+
+    def describe(self):
+        """
+        Describe the job for clients.
+
+        Returns:
+            dict: {"job", "dataset", "status", "question", "sql", "error", "rows",
+                   "columns", "attrs", "seconds"}
+        """
+        return {
+            "job": self.job_id,
+            "dataset": self.dataset.dataset_id,
+            "status": self.state(),
+            "question": self.question,
+            "sql": self.sql,
+            "error": self.error,
+            "rows": self.rows,
+            "columns": self.columns,
+            "attrs": self.attrs,
+            "seconds": (self.finished - self.started) if self.finished is not None and self.started else None
+        }
+
+    def check_cancelled(self):
+        """
+        Raise QueryCancelled if the job was cancelled.
+        """
+        if self._cancelled.is_set():
+            raise QueryCancelled(f"Job {self.job_id} was cancelled")
+
+class AnalysisService:
+    """
+    Runs uploads, SQL generation, queries, charts and statistics for any
+    number of frontends, on a bounded worker pool.
+
+    Datasets and jobs are addressed by id, so frontends keep no DuckDB
+    connection, LLM client or Plotly figure of their own, and several
+    frontends share one warm backend.
+    """
+
+    def __init__(self, workers=BACKEND_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="backend")
+        self._lock = threading.Lock()
+        self._datasets = {}
+        self._jobs = {}
+
+    def upload(self, file_path, file_name, **options):
+        """
+        Start loading an upload into a new dataset.
+
+        Args:
+            file_path: The upload spooled to a temp file; the ingestion job removes it
+            file_name: The original file name, used for the table name and file type
+            **options: delimiter (CSV) or sheet_name (Excel)
+
+        Returns:
+            Dataset: The dataset, loading in the background
+        """
+        dataset = Dataset(uuid.uuid4().hex, file_name, start_ingestion(file_path, file_name, **options))
+        with self._lock:
+            self._datasets[dataset.dataset_id] = dataset
+        increment("backend_uploads_total")
+        return dataset
+
+    def dataset(self, dataset_id):
+        """
+        Get a dataset.
+
+        Args:
+            dataset_id: The dataset id
+
+        Returns:
+            Dataset: The dataset
+
+        Raises:
+            NotFoundError: If there is no such dataset
+        """
+        with self._lock:
+            dataset = self._datasets.get(dataset_id)
+        if dataset is None:
+            raise NotFoundError(f"Unknown dataset {dataset_id}")
+        return dataset
+
+    def list_datasets(self):
+        """
+        List the datasets.
+
+        Returns:
+            list: (dataset id, file name) tuples, oldest first
+        """
+        with self._lock:
+            return [(dataset.dataset_id, dataset.file_name) for dataset in self._datasets.values()]
+
+    def drop_dataset(self, dataset_id):
+        """
+        Drop a dataset, cancelling its jobs and deleting their results.
+
+        Args:
+            dataset_id: The dataset id
+        """
+        with self._lock:
+            dataset = self._datasets.pop(dataset_id, None)
+            jobs = [job for job in self._jobs.values() if job.dataset is dataset]
+            for job in jobs:
+                del self._jobs[job.job_id]
+        if dataset is None:
+            raise NotFoundError(f"Unknown dataset {dataset_id}")
+        for job in jobs:
+            job._cancelled.set()
+            job.future.cancel()
+        dataset.close()
+        result_store.release_session(dataset_id)
+
+    def submit_query(self, dataset_id, question=None, sql=None, approximate=False, execute=True):
+        """
+        Queue a question or SQL query on a dataset.
+
+        Args:
+            dataset_id: The dataset id
+            question: The natural language question, turned into SQL first
+            sql: The SQL query, if no question is given
+            approximate: Estimate aggregates from the table's sample when one is ready
+            execute: False to only generate the SQL of the question
+
+        Returns:
+            QueryJob: The job handle
+
+        Raises:
+            NotReadyError: If the dataset is still loading (or failed to load)
+            ValueError: If neither a question nor SQL is given
+        """
+        dataset = self.dataset(dataset_id)
+        if not dataset.ready():
+            raise NotReadyError(dataset.error or f"Dataset {dataset_id} is still loading")
+        if not question and not sql:
+            raise ValueError("A question or a SQL query is required")
+        if not question and not execute:
+            raise ValueError("Generating SQL needs a question")
+
+        self._expire_jobs()
+        job = QueryJob(uuid.uuid4().hex, dataset, question, sql, approximate, execute)
+        with self._lock:
+            self._jobs[job.job_id] = job
+        job.future = self._executor.submit(self._run_query, job)
+        increment("backend_jobs_total", kind="query" if execute else "sql")
+        return job
+
+    def _run_query(self, job):
+        """
+        Generate and run a job's query (runs on the worker pool).
+
+        Args:
+            job: The QueryJob
+        """
+        dataset = job.dataset
+        trace = start_trace("query", question=job.question or job.sql, table=dataset.table_name, backend=True)
+        try:
+            job.check_cancelled()
+            job.started = time.monotonic()
+            results = self._answer(job)
+            if results is not None:
+                job.rows = len(results)
+                job.columns = [str(column) for column in results.columns]
+                job.attrs = _plain({name: value for name, value in results.attrs.items() if name not in _LOCAL_ATTRS})
+                job.result = result_store.put(dataset.dataset_id, job.job_id, results)
+        except Exception as e:
+            if job._cancelled.is_set():
+                job.error = "Cancelled"
+            else:
+                logger.error("Backend job %s failed: %s", job.job_id, e)
+                job.error = str(e)
+        finally:
+            job.finished = time.monotonic()
+            finish_trace(trace)
+
+    def _answer(self, job):
+        """
+        Generate a job's SQL if needed and run it, on the dataset's connection.
+
+        The LLM is called without the dataset's lock, so a slow completion does
+        not hold up the dataset's other queries; the lock is only held while the
+        generated SQL is checked and while the query runs.
+
+        Args:
+            job: The QueryJob
+
+        Returns:
+            pandas.DataFrame: The result, or None if the job only generates SQL
+        """
+        dataset = job.dataset
+        profile = dataset.profile()
+        if job.question:
+            job.sql = generate_checked_sql(
+                job.question, dataset.connection, dataset.table_name, dataset.schema, profile,
+                dataset.results.describe(), lock=dataset.lock
+            )
+        if not job.execute:
+            return None
+        with dataset.lock:
+            job.check_cancelled()
+            dataset.running_job = job
+            try:
+                return self._execute(job, profile)
+            finally:
+                dataset.running_job = None
+
+    def _execute(self, job, profile):
+        """
+        Run a job's SQL on the dataset's connection (under the dataset's lock).
+
+        Args:
+            job: The QueryJob
+            profile: The dataset's whole-table profile, or None
+
+        Returns:
+            pandas.DataFrame: The result
+        """
+        dataset = job.dataset
+        sampler = dataset.sampler if job.approximate else None
+        results = execute_query(
+            dataset.connection, job.sql, dataset.table_name, rollups=dataset.rollups, sampler=sampler,
+            results=dataset.results
+        )
+        # No rows often means a filter value that is not stored as written
+        if results.empty and job.question and profile and profile.get("value_index"):
+            repaired_sql, literal_repairs = profile["value_index"].repair_literals(job.sql)
+            if literal_repairs:
+                job.sql = repaired_sql
+                results = execute_query(
+                    dataset.connection, job.sql, dataset.table_name, rollups=dataset.rollups, sampler=sampler,
+                    results=dataset.results
+                )
+                results.attrs["literal_repairs"] = literal_repairs
+        dataset.results.add(job.question or job.sql, job.sql, results)
+        return results
+
+    def job(self, job_id):
+        """
+        Get a job.
+
+        Args:
+            job_id: The job id
+
+        Returns:
+            QueryJob: The job
+
+        Raises:
+            NotFoundError: If there is no such job
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            raise NotFoundError(f"Unknown job {job_id}")
+        return job
+
+    def wait(self, job_id, timeout):
+        """
+        Wait for a job to finish.
+
+        Args:
+            job_id: The job id
+            timeout: The most seconds to wait
+
+        Returns:
+            QueryJob: The job, finished or not
+        """
+        job = self.job(job_id)
+        try:
+            job.future.exception(timeout=timeout)
+        except Exception:
+            # Timed out or cancelled; the caller reads the state
+            pass
+        return job
+
+    def cancel_job(self, job_id):
+        """
+        Cancel a job, interrupting its query if it is running.
+
+        Args:
+            job_id: The job id
+        """
+        job = self.job(job_id)
+        job._cancelled.set()
+        if job.future.cancel():
+            job.finished = time.monotonic()
+        elif job.dataset.running_job is job:
+            job.dataset.connection.interrupt()
+        increment("backend_jobs_cancelled_total")
+
+    def result(self, job_id):
+        """
+        Get the result of a finished query job.
+
+        Args:
+            job_id: The job id
+
+        Returns:
+            pandas.DataFrame: The result
+
+        Raises:
+            NotReadyError: If the job has not finished successfully or has no result
+            NotFoundError: If the result expired
+        """
+        job = self.job(job_id)
+        if job.state() != "done" or not job.execute:
+            raise NotReadyError(f"Job {job_id} has no result ({job.state()})")
+        df = job.result.get()
+        if df is None:
+            raise NotFoundError(f"The result of job {job_id} expired")
+        return df
+
+    def chart(self, job_id, chart_type=None):
+        """
+        Build the chart of a job's result on the worker pool.
+
+        Args:
+            job_id: The job id
+            chart_type: The chart type; recommended from the result if None
+
+        Returns:
+            dict: {"chart_type", "figure": the Plotly figure as JSON}
+        """
+        job = self.job(job_id)
+        df = self.result(job_id)
+        return self._executor.submit(self._build_chart, job, df, chart_type).result()
+
+    def _build_chart(self, job, df, chart_type):
+        """
+        Recommend a chart type if needed and build the figure (runs on the worker pool).
+
+        Args:
+            job: The QueryJob
+            df: Its result
+            chart_type: The chart type, or None
+
+        Returns:
+            dict: See chart
+        """
+        # Only charts load Plotly
+        from core.viz.chart_generator import generate_chart
+        from core.viz.chart_recommendations import recommend_chart_type
+
+        if chart_type is None:
+            with span("chart_recommend"):
+                chart_type = recommend_chart_type(df, job.question, job.dataset.profile())
+        with span("chart_build", chart_type=chart_type):
+            figure = generate_chart(df, chart_type, job.question)
+        return {"chart_type": chart_type, "figure": figure.to_json()}
+
+    def statistics(self, job_id, column=None):
+        """
+        Summarize a job's result on the worker pool.
+
+        Args:
+            job_id: The job id
+            column: Optional column to also count the most frequent values of
+
+        Returns:
+            dict: {"numeric": {column: {statistic: value}}, "distinct": {column: count},
+                   "top_values": [[value, count], ...] or None}
+        """
+        df = self.result(job_id)
+        if column is not None and column not in df.columns:
+            raise ValueError(f"Unknown column {column}")
+        return self._executor.submit(self._summarize, df, job_id, column).result()
+
+    def _summarize(self, df, job_id, column):
+        """
+        Compute the statistics returned by statistics (runs on the worker pool).
+
+        Args:
+            df: The result
+            job_id: The job id, which identifies the result in the statistics cache
+            column: The column to count values of, or None
+
+        Returns:
+            dict: See statistics
+        """
+        summary = summarize_result(df, job_id)
+        numeric = summary["numeric"]
+        counts = top_values(df, column, fingerprint=job_id) if column is not None else None
+        return _plain({
+            "numeric": numeric.to_dict() if numeric is not None else None,
+            "distinct": summary["distinct"],
+            "top_values": counts.values.tolist() if counts is not None else None
+        })
+
+    def _expire_jobs(self):
+        """
+        Forget jobs that finished more than BACKEND_JOB_TTL_SECONDS ago, with their results.
+        """
+        now = time.monotonic()
+        with self._lock:
+            expired = [
+                job for job in self._jobs.values()
+                if job.finished is not None and now - job.finished > BACKEND_JOB_TTL_SECONDS
+            ]
+            for job in expired:
+                del self._jobs[job.job_id]
+        for job in expired:
+            if job.result is not None:
+                job.result.release()
+
+    def shutdown(self):
+        """
+        Drop every dataset and stop the worker pool.
+        """
+        for dataset_id, _ in self.list_datasets():
+            try:
+                self.drop_dataset(dataset_id)
+            except (NotFoundError, duckdb.Error) as e:
+                logger.debug("Could not drop dataset %s: %s", dataset_id, e)
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,183 @@
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+# Import custom modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from core.db.duckdb_manager import init_db_connection, load_data_to_db, close_connection
+from core.db.schema_inference import infer_schema
+from core.db.type_coercion import coerce_types
+from core.db.profiler import profile_table
+from core.db.query_executor import execute_query
+from core.nlp.nl_to_sql import generate_checked_sql
+from utils.file_utils import read_data_file
+
+DEFAULT_WORKERS = 4
+
+# Columns of the batch summary, one row per question
+SUMMARY_COLUMNS = [
+    "question_id", "question", "sql", "status", "error", "row_count", "result_path",
+    "generate_seconds", "execute_seconds", "write_seconds", "total_seconds"
+]
+
+def load_dataset(data_path, delimiter=","):
+    """
+    Load a data file into a new DuckDB connection.
+
+    Args:
+        data_path: The path to the CSV or Excel file
+        delimiter: The CSV delimiter
+
+    Returns:
+        tuple: (db_connection, table_name, schema, profile)
+    """
+    df = read_data_file(data_path, delimiter=delimiter)
+    schema = infer_schema(df)
+    df, schema, _ = coerce_types(df, schema)
+    db_connection = init_db_connection()
+    table_name = load_data_to_db(db_connection, df, Path(data_path).name, schema)
+    profile = profile_table(db_connection, table_name, schema)
+    return db_connection, table_name, schema, profile
+
+def read_questions(questions_path):
+    """
+    Read natural language questions from a file.
+
+    Plain text files hold one question per line (blank lines and lines starting
+    with '#' are skipped); CSV and Parquet files need a 'question' column.
+
+    Args:
+        questions_path: The path to the questions file
+
+    Returns:
+        list: The questions, in file order
+    """
+    extension = Path(questions_path).suffix.lower()
+    if extension == '.csv':
+        questions = pd.read_csv(questions_path)["question"].dropna().tolist()
+    elif extension == '.parquet':
+        questions = pd.read_parquet(questions_path)["question"].dropna().tolist()
+    else:
+        with open(questions_path, encoding="utf-8") as f:
+            questions = [line.strip() for line in f if line.strip() and not line.strip().startswith("#")]
+    return [str(question) for question in questions]
+
+def run_batch(data_path, questions_path, output_dir, workers=DEFAULT_WORKERS, delimiter=","):
+    """
+    Answer a file of questions against a dataset without the Streamlit UI.
+
+    Questions run on a bounded thread pool; each worker thread uses its own DuckDB
+    cursor so LLM calls and query execution overlap across questions. Each result
+    is written to `<output_dir>/results/<question_id>.parquet` and a summary with
+    per-stage timings to `<output_dir>/summary.parquet`.
+
+    Args:
+        data_path: The path to the CSV or Excel file to analyze
+        questions_path: The path to the questions file
+        output_dir: The directory to write results to
+        workers: The maximum number of questions processed concurrently
+        delimiter: The CSV delimiter
+
+    Returns:
+        pandas.DataFrame: The summary, one row per question
+    """
+    results_dir = Path(output_dir) / "results"
+    results_dir.mkdir(parents=True, exist_ok=True)
+
+    load_start = time.perf_counter()
+    db_connection, table_name, schema, profile = load_dataset(data_path, delimiter)
+    print(f"Loaded '{data_path}' into table {table_name} in {time.perf_counter() - load_start:.2f}s")
+
+    questions = read_questions(questions_path)
+    thread_state = threading.local()
+    cursors = []
+    cursors_lock = threading.Lock()
+
+    def get_cursor():
+        # One cursor per worker thread, created on first use
+        if not hasattr(thread_state, "cursor"):
+            thread_state.cursor = db_connection.cursor()
+            with cursors_lock:
+                cursors.append(thread_state.cursor)
+        return thread_state.cursor
+
+    def answer(question_id, question):
+        record = dict.fromkeys(SUMMARY_COLUMNS)
+        record.update(question_id=question_id, question=question, status="ok")
+        total_start = time.perf_counter()
+        try:
+            stage_start = time.perf_counter()
+            record["sql"] = generate_checked_sql(question, get_cursor(), table_name, schema, profile)
+            record["generate_seconds"] = time.perf_counter() - stage_start
+
+            stage_start = time.perf_counter()
+            results = execute_query(get_cursor(), record["sql"], table_name)
+            if results.empty and profile.get("value_index"):
+                # Retry with filter values corrected to how they are stored
+                repaired_sql, literal_repairs = profile["value_index"].repair_literals(record["sql"])
+                if literal_repairs:
+                    record["sql"] = repaired_sql
+                    results = execute_query(get_cursor(), record["sql"], table_name)
+            record["execute_seconds"] = time.perf_counter() - stage_start
+            record["row_count"] = len(results)
+
+            stage_start = time.perf_counter()
+            result_path = results_dir / f"{question_id}.parquet"
+            results.attrs.clear()  # Metadata is not part of the Parquet output
+            results.to_parquet(result_path, index=False)
+            record["result_path"] = str(result_path)
+            record["write_seconds"] = time.perf_counter() - stage_start
+        except Exception as e:
+            record["status"] = "error"
+            record["error"] = str(e)
+        record["total_seconds"] = time.perf_counter() - total_start
+        return record
+
+    batch_start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch") as executor:
+            records = list(executor.map(
+                answer,
+                [f"q{i:05d}" for i in range(1, len(questions) + 1)],
+                questions
+            ))
+    finally:
+        for cursor in cursors:
+            cursor.close()
+        close_connection(db_connection)
+    elapsed = time.perf_counter() - batch_start
+
+    summary = pd.DataFrame(records, columns=SUMMARY_COLUMNS)
+    summary.to_parquet(Path(output_dir) / "summary.parquet", index=False)
+
+    failed = int((summary["status"] == "error").sum())
+    print(f"Answered {len(summary) - failed}/{len(summary)} questions in {elapsed:.2f}s "
+          f"({len(summary) / elapsed if elapsed else 0:.2f} questions/s, {workers} workers)")
+    return summary
+
+def main(argv=None):
+    """
+    Command line entry point for the batch query runner.
+
+    Args:
+        argv: Optional argument list (defaults to sys.argv)
+    """
+    parser = argparse.ArgumentParser(description="Answer a file of natural language questions against a dataset.")
+    parser.add_argument("data", help="CSV or Excel file to analyze")
+    parser.add_argument("questions", help="Text file with one question per line, or CSV/Parquet with a 'question' column")
+    parser.add_argument("-o", "--output", default="batch_output", help="Directory for summary.parquet and results/")
+    parser.add_argument("-w", "--workers", type=int, default=DEFAULT_WORKERS, help="Number of concurrent questions")
+    parser.add_argument("--delimiter", default=",", help="CSV delimiter")
+    args = parser.parse_args(argv)
+
+    summary = run_batch(args.data, args.questions, args.output, args.workers, args.delimiter)
+    sys.exit(1 if (summary["status"] == "error").any() else 0)
+
+if __name__ == "__main__":
+    main()
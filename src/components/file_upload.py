@@ -1,18 +1,228 @@
 import streamlit as st
 import pandas as pd
 import os
-import tempfile
+import logging
 from pathlib import Path
 
 # Import custom modules
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from core.db.duckdb_manager import init_db_connection, load_data_to_db, close_connection
-from core.db.schema_inference import infer_schema
-from utils.file_utils import validate_file_size, get_supported_file_types
-from utils.config import MAX_FILE_SIZE_MB
+from core.db.duckdb_manager import close_connection, quote_identifier
+from core.db.ingestion import start_ingestion, start_multi_ingestion
+from core.db.profiler import get_profile
+from utils.file_utils import validate_file_size, get_supported_file_types, save_uploaded_file, clean_up_file
+from utils.config import MAX_FILE_SIZE_MB, INGEST_POLL_SECONDS
 
-def file_upload_component(current_file, current_connection, container=st):
+logger = logging.getLogger(__name__)
+
+class CombinedUpload:
+    """
+    Several uploaded files (or a zip archive) loaded together into one table.
+
+    Stands in for a single Streamlit UploadedFile in the session state.
+    """
+
+    def __init__(self, files):
+        self.files = files
+        self.name = ", ".join(file.name for file in files)
+        self.size = sum(file.size for file in files)
+
+@st.fragment(run_every=INGEST_POLL_SECONDS)
+def ingestion_progress_component(job):
+    """
+    Show the progress of a background ingestion job, refreshing on its own
+    until the job finishes and then rerunning the app to pick up the result.
+
+    Args:
+        job: The IngestionJob to report on
+    """
+    if job.done():
+        st.rerun()
+    progress = job.progress()
+    st.progress(
+        progress["fraction"],
+        text=f"Processing {job.file_name}: {progress['stage']} ({progress['rows_loaded']:,} rows loaded)"
+    )
+
+def read_options_component(uploaded_file, container=st, key_prefix=""):
+    """
+    Ask for the options needed to read an upload: the CSV delimiter or the Excel sheet.
+
+    Args:
+        uploaded_file: The uploaded file (or CombinedUpload)
+        container: The Streamlit container to place the widgets in
+        key_prefix: Prefix of the widget keys, to tell apart uploaders of the same file
+
+    Returns:
+        dict: {"delimiter": ...} or {"sheet_name": ...}, or None if the file type is unsupported
+    """
+    # Get file extension
+    file_extension = Path(uploaded_file.name).suffix.lower()
+
+    if file_extension == '.csv' or isinstance(uploaded_file, CombinedUpload):
+        delimiter = container.selectbox(
+            "Select CSV delimiter", options=[",", ";", "\t", "|"], index=0,
+            key=f"{key_prefix}delimiter_{uploaded_file.name}_{uploaded_file.size}" # Use name and size for key
+        )
+        return {"delimiter": delimiter}
+    if file_extension in ['.xlsx', '.xls']:
+        # Use name and size for the selectbox key
+        sheet_key = f"{key_prefix}sheet_name_{uploaded_file.name}_{uploaded_file.size}"
+        xls = pd.ExcelFile(uploaded_file)
+        sheet_name = container.selectbox(
+             "Select sheet", options=xls.sheet_names, index=0, key=sheet_key
+        )
+        return {"sheet_name": sheet_name}
+    # This case should ideally not be reached due to 'type' filter
+    container.error(f"Unsupported file type: {file_extension}")
+    return None
+
+def _start_upload_job(uploaded_file, options, append_to=None):
+    """
+    Start loading an upload in the background.
+
+    The upload is spooled to a temp file first, which the job removes when it ends.
+
+    Args:
+        uploaded_file: The uploaded file (or CombinedUpload)
+        options: The read options, see read_options_component
+        append_to: Optional loaded table to append the rows to, see start_ingestion
+
+    Returns:
+        IngestionJob: The job handle
+    """
+    if isinstance(uploaded_file, CombinedUpload):
+        files = []
+        try:
+            for file in uploaded_file.files:
+                files.append((file.name, save_uploaded_file(file)))
+        except OSError:
+            for _, path in files:
+                clean_up_file(path)
+            raise
+        return start_multi_ingestion(files, uploaded_file.name, append_to=append_to, **options)
+    return start_ingestion(save_uploaded_file(uploaded_file), uploaded_file.name, append_to=append_to, **options)
+
+def _get_upload(uploaded_files):
+    """
+    Wrap the files of a multi-file uploader as one upload.
+
+    Args:
+        uploaded_files: The files returned by st.file_uploader
+
+    Returns:
+        The single UploadedFile, a CombinedUpload, or None
+    """
+    if len(uploaded_files) == 1 and Path(uploaded_files[0].name).suffix.lower() != '.zip':
+        return uploaded_files[0]
+    if uploaded_files:
+        return CombinedUpload(uploaded_files)
+    return None
+
+def append_upload_component(container, db_connection, table_name, schema, profile_job, derived=()):
+    """
+    Component appending a newer extract of the loaded table (e.g. today's rows)
+    instead of replacing it.
+
+    The upload must have the same columns as the table. Only new rows are
+    inserted, optionally skipping rows whose key column value is already
+    loaded; the schema, profile, rollups, samples and cached results are
+    updated from the new rows rather than rebuilt.
+
+    Args:
+        container: The Streamlit container to place the component in
+        db_connection: The DuckDB connection holding the table
+        table_name: The loaded table
+        schema: The table's inferred schema
+        profile_job: The table's profiling job
+        derived: The RollupManager, SampleManager and ResultCache of the table
+
+    Returns:
+        tuple: (schema, profile_job), updated once an append has finished
+    """
+    uploaded_files = container.file_uploader(
+        f"Append new rows to {table_name}",
+        type=get_supported_file_types(),
+        accept_multiple_files=True,
+        # A new uploader per loaded dataset, so an extract is never appended to a replaced table
+        key=f"append_uploader_{id(db_connection)}_{table_name}",
+        help="Upload a newer extract with the same columns; its rows are added to the loaded table."
+    )
+    uploaded_file = _get_upload(uploaded_files)
+    pending = st.session_state.get("append_job")
+    if uploaded_file is None:
+        if pending is not None:
+            pending["job"].cancel()
+        st.session_state.append_job = None
+        st.session_state.appended_upload = None
+        return schema, profile_job
+
+    if not validate_file_size(uploaded_file, MAX_FILE_SIZE_MB):
+        container.error(f"File exceeds maximum size of {MAX_FILE_SIZE_MB}MB.")
+        return schema, profile_job
+    options = read_options_component(uploaded_file, container, key_prefix="append_")
+    if options is None:
+        return schema, profile_job
+    key_column = container.selectbox(
+        "Skip rows already loaded, by key column",
+        options=[None, *schema],
+        format_func=lambda column: "Append every row" if column is None else column,
+        key=f"append_key_{uploaded_file.name}_{uploaded_file.size}",
+        help="Rows whose value in this column is already in the table (or repeats in the upload) are not appended"
+    )
+
+    # Each upload is appended once, however often the script reruns
+    upload = (uploaded_file.name, uploaded_file.size, tuple(options.items()), key_column)
+    appended = st.session_state.get("appended_upload")
+    if appended is not None and appended["upload"] == upload:
+        if appended["error"]:
+            container.error(f"Error appending file: {appended['error']}")
+            return schema, profile_job
+        container.success(
+            f"Appended {appended['rows_added']:,} rows from '{uploaded_file.name}'"
+            + (f" ({appended['rows_skipped']:,} already loaded)" if appended["rows_skipped"] else "")
+        )
+        return schema, profile_job
+
+    if pending is None or pending["upload"] != upload:
+        if pending is not None:
+            pending["job"].cancel()
+        logger.debug("Appending %s to %s", uploaded_file.name, table_name)
+        job = _start_upload_job(uploaded_file, options, append_to={
+            "connection": db_connection,
+            "table_name": table_name,
+            "schema": schema,
+            "profile": get_profile(profile_job),
+            "key_column": key_column,
+            "derived": list(derived)
+        })
+        pending = {"job": job, "upload": upload}
+        st.session_state.append_job = pending
+
+    job = pending["job"]
+    if not job.done():
+        with container.container():
+            ingestion_progress_component(job)
+        return schema, profile_job
+
+    st.session_state.append_job = None
+    try:
+        _, _, schema, profile_job = job.result()
+    except Exception as e:
+        container.error(f"Error appending file: {str(e)}")
+        st.session_state.appended_upload = {"upload": upload, "error": str(e)}
+        return schema, profile_job
+    st.session_state.appended_upload = {
+        "upload": upload,
+        "error": None,
+        "rows_added": job.appended["rows_added"],
+        "rows_skipped": job.appended["rows_skipped"]
+    }
+    container.success(f"Appended {job.appended['rows_added']:,} rows from '{uploaded_file.name}'")
+    return schema, profile_job
+
+def file_upload_component(current_file, current_connection, container=st,
+                          current_table_name=None, current_schema=None, current_profile_job=None):
     """
     Component for handling file uploads, data parsing, and schema inference.
     Placed within the specified container (e.g., st.sidebar or st).
@@ -21,109 +231,112 @@ def file_upload_component(current_file, current_connection, container=st):
         current_file: The currently uploaded file in session state
         current_connection: The current DuckDB connection in session state
         container: The Streamlit container to place the component in (defaults to main page)
+        current_table_name: The current table name in session state
+        current_schema: The current inferred schema in session state
+        current_profile_job: The current table profiling job in session state
         
     Returns:
-        tuple: (uploaded_file_object, db_connection, table_name, schema)
+        tuple: (uploaded_file_object, db_connection, table_name, schema, profile_job)
     """
     # Initialize return values based on current state
     uploaded_file_object = current_file
     db_connection = current_connection
-    table_name = None
-    schema = None
+    table_name = current_table_name
+    schema = current_schema
+    profile_job = current_profile_job
 
     # File uploader within the specified container
-    uploaded_file = container.file_uploader(
+    uploaded_files = container.file_uploader(
         "Upload your CSV or Excel file",
         type=get_supported_file_types(),
-        help=f"Supported formats: {', '.join(get_supported_file_types())}. Max size: {MAX_FILE_SIZE_MB}MB"
+        accept_multiple_files=True,
+        help=(f"Supported formats: {', '.join(get_supported_file_types())}. Max size: {MAX_FILE_SIZE_MB}MB. "
+              "Several CSV files or a zip archive of CSV files are combined into one table.")
     )
+    uploaded_file = _get_upload(uploaded_files)
     
-    # Process the uploaded file if it's new or different
-    if uploaded_file is not None and (current_file is None or uploaded_file.name != current_file.name):
-        print(f"[DEBUG] New file uploaded: {uploaded_file.name}") # Debug print
-        
-        # Close previous connection if it exists
+    # Process the uploaded file if it's new or different; a file re-uploaded
+    # under the same name but with other contents is a new file too
+    if uploaded_file is not None and (
+            current_file is None or (uploaded_file.name, uploaded_file.size) != (current_file.name, current_file.size)):
+        # Until the new file has loaded, the current dataset stays in place
+        # Validate file size
+        if not validate_file_size(uploaded_file, MAX_FILE_SIZE_MB):
+            container.error(f"File exceeds maximum size of {MAX_FILE_SIZE_MB}MB.")
+            return uploaded_file_object, db_connection, table_name, schema, profile_job
+
+        # Ask for the read options; changing one restarts the load
+        options = read_options_component(uploaded_file, container)
+        if options is None:
+            return uploaded_file_object, db_connection, table_name, schema, profile_job
+
+        # Parse and load in the background; the current dataset stays usable meanwhile
+        job = st.session_state.get("ingestion_job")
+        if job is None or (job.file_name, job.total_bytes, job.options) != (uploaded_file.name, uploaded_file.size, options):
+            if job is not None:
+                job.cancel()
+            logger.debug("New file uploaded: %s", uploaded_file.name)
+            job = _start_upload_job(uploaded_file, options)
+            st.session_state.ingestion_job = job
+
+        if not job.done():
+            with container.container():
+                ingestion_progress_component(job)
+            return uploaded_file_object, db_connection, table_name, schema, profile_job
+
+        try:
+            db_connection, table_name, schema, profile_job = job.result()
+        except Exception as e:
+            # The failed job stays in the session state so it is not restarted on every rerun
+            container.error(f"Error processing file: {str(e)}")
+            return uploaded_file_object, current_connection, current_table_name, current_schema, current_profile_job
+        st.session_state.ingestion_job = None
+        # Close previous connection only now that the new file has loaded
         if current_connection:
-            print("[DEBUG] Closing previous DB connection.") # Debug print
+            logger.debug("Closing previous DB connection.")
             close_connection(current_connection)
-            db_connection = None # Reset connection
-
-        with st.spinner("Processing your data..."):
-            try:
-                # Validate file size
-                if not validate_file_size(uploaded_file, MAX_FILE_SIZE_MB):
-                    container.error(f"File exceeds maximum size of {MAX_FILE_SIZE_MB}MB.")
-                    return uploaded_file, None, None, None # Return error state
-                
-                # Get file extension
-                file_extension = Path(uploaded_file.name).suffix.lower()
-                
-                # Read the data based on file type
-                if file_extension == '.csv':
-                    delimiter = container.selectbox(
-                        "Select CSV delimiter", options=[",", ";", "\t", "|"], index=0, 
-                        key=f"delimiter_{uploaded_file.name}_{uploaded_file.size}" # Use name and size for key
-                    )
-                    df = pd.read_csv(uploaded_file, sep=delimiter)
-                    
-                elif file_extension in ['.xlsx', '.xls']:
-                    # Use name and size for the selectbox key
-                    sheet_key = f"sheet_name_{uploaded_file.name}_{uploaded_file.size}"
-                    xls = pd.ExcelFile(uploaded_file)
-                    sheet_name = container.selectbox(
-                         "Select sheet", options=xls.sheet_names, index=0, key=sheet_key
-                    )
-                    df = pd.read_excel(xls, sheet_name=sheet_name)
-                else:
-                    # This case should ideally not be reached due to 'type' filter
-                    container.error(f"Unsupported file type: {file_extension}")
-                    return uploaded_file, None, None, None # Return error state
-                
-                # Basic data info
-                container.write(f"Rows: {df.shape[0]}, Columns: {df.shape[1]}")
-                
-                # Display data preview
-                with container.expander("Data Preview (first 5 rows)", expanded=False):
-                    st.dataframe(df.head(5), use_container_width=True) # Use st.dataframe for main area display
-                
-                # Infer schema
-                schema = infer_schema(df)
-                container.write("Schema inferred.") # Status update
-                
-                # Display inferred schema
-                with container.expander("Inferred Schema", expanded=False):
-                    schema_df = pd.DataFrame(schema.items(), columns=['Column', 'Inferred Type'])
-                    st.dataframe(schema_df, use_container_width=True) # Use st.dataframe for main area display
-                
-                # Initialize DuckDB connection
-                db_connection = init_db_connection()
-                print("[DEBUG] Initialized new DB connection.") # Debug print
-                
-                # Load data to DuckDB
-                table_name = load_data_to_db(db_connection, df, uploaded_file.name)
-                print(f"[DEBUG] Loaded data into table: {table_name}") # Debug print
-                
-                container.success(f"Successfully processed '{uploaded_file.name}'")
-                uploaded_file_object = uploaded_file # Update the file object state
-                
-            except Exception as e:
-                print(f"[ERROR] Error processing file: {str(e)}") # Debug print
-                container.error(f"Error processing file: {str(e)}")
-                # Ensure connection is closed on error
-                if db_connection:
-                     close_connection(db_connection)
-                return uploaded_file, None, None, None # Return error state
-    
-    elif uploaded_file is None and current_file is not None:
+        logger.debug("Loaded data into table: %s", table_name)
+
+        # Basic data info
+        container.write(f"Rows: {job.rows_loaded}, Columns: {len(schema)}")
+
+        # Display data preview
+        with container.expander("Data Preview (first 5 rows)", expanded=False):
+            preview = db_connection.execute(f"SELECT * FROM {quote_identifier(table_name)} LIMIT 5").fetchdf()
+            st.dataframe(preview, use_container_width=True) # Use st.dataframe for main area display
+
+        if job.converted:
+            container.write(f"Converted to native types: {', '.join(job.converted)}")
+        if job.unparsed:
+            container.warning(
+                "Values that did not parse were loaded as empty: "
+                + ", ".join(f"{column} ({count:,})" for column, count in job.unparsed.items())
+            )
+
+        # Display inferred schema
+        with container.expander("Inferred Schema", expanded=False):
+            schema_df = pd.DataFrame(schema.items(), columns=['Column', 'Inferred Type'])
+            st.dataframe(schema_df, use_container_width=True) # Use st.dataframe for main area display
+
+        container.success(f"Successfully processed '{uploaded_file.name}'")
+        uploaded_file_object = uploaded_file # Update the file object state
+
+    elif uploaded_file is None and st.session_state.get("ingestion_job") is not None:
+        # The upload was removed while it was still loading
+        st.session_state.ingestion_job.cancel()
+        st.session_state.ingestion_job = None
+
+    if uploaded_file is None and current_file is not None:
         # If the file is deselected/cleared, reset the state
-        print("[DEBUG] File removed by user.") # Debug print
+        logger.debug("File removed by user.")
         if db_connection:
              close_connection(db_connection)
         uploaded_file_object = None
         db_connection = None
         table_name = None
         schema = None
+        profile_job = None
         # Reset relevant session state parts (handled in app.py now)
 
     # Return the current state (might be unchanged if no new file)    
-    return uploaded_file_object, db_connection, table_name, schema 
\ No newline at end of file
+    return uploaded_file_object, db_connection, table_name, schema, profile_job 
\ No newline at end of file
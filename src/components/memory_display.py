@@ -0,0 +1,35 @@
+import streamlit as st
+import pandas as pd
+
+def session_memory_component(sessions, database_usage, current_session_id=None):
+    """
+    Component showing the memory used by every session on this server, for admins.
+    
+    Args:
+        sessions: Per-session result usage, see ResultStore.usage()
+        database_usage: Memory of all DuckDB connections, see get_total_memory_usage()
+        current_session_id: Optional id of the viewing session, marked in the table
+    """
+    memory_mb = sum(session["memory_bytes"] for session in sessions) / (1024 * 1024)
+    disk_mb = sum(session["disk_bytes"] for session in sessions) / (1024 * 1024)
+    st.caption(
+        f"Results: {memory_mb:.1f} MB in memory, {disk_mb:.1f} MB spilled, across {len(sessions)} sessions. "
+        f"Databases: {database_usage['memory_bytes'] / (1024 * 1024):.0f} MB in memory, "
+        f"{database_usage['spilled_bytes'] / (1024 * 1024):.0f} MB spilled, "
+        f"across {database_usage['connections']} connections."
+    )
+    if not sessions:
+        return
+    
+    sessions_df = pd.DataFrame([
+        {
+            "Session": session["session"][:8] + (" (you)" if session["session"] == current_session_id else ""),
+            "In Memory": session["results_in_memory"],
+            "Memory (MB)": round(session["memory_bytes"] / (1024 * 1024), 2),
+            "On Disk": session["results_on_disk"],
+            "Disk (MB)": round(session["disk_bytes"] / (1024 * 1024), 2),
+            "Idle (s)": round(session["idle_seconds"])
+        }
+        for session in sessions
+    ])
+    st.dataframe(sessions_df, use_container_width=True, hide_index=True)
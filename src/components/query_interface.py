@@ -1,15 +1,21 @@
 import streamlit as st
 import pandas as pd
 import time
+import logging
 
 # Import custom modules
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from core.nlp.nl_to_sql import generate_sql_from_nl_query
-from core.db.query_executor import execute_query
+from core.nlp.nl_to_sql import generate_checked_sql
+from core.db.query_executor import execute_query, stream_query, batches_to_dataframe, update_running_totals
+from utils.config import STREAM_PREVIEW_ROWS, SUGGESTION_POLL_SECONDS
+from utils.telemetry import start_trace, span
 
-def query_interface_component(db_connection, table_name, schema):
+logger = logging.getLogger(__name__)
+
+def query_interface_component(db_connection, table_name, schema, profile=None, rollups=None, sampler=None, results=None,
+                              suggestions=None):
     """
     Component for handling natural language queries and converting them to SQL.
     
@@ -17,12 +23,27 @@ def query_interface_component(db_connection, table_name, schema):
         db_connection: The DuckDB connection
         table_name: The name of the table in DuckDB
         schema: The schema of the data
+        profile: Optional whole-table profile to describe column values to the LLM
+        rollups: Optional RollupManager used to answer aggregate queries from precomputed tables
+        sampler: Optional SampleManager used to estimate aggregate answers on large tables
+        results: Optional ResultCache keeping recent results for follow-up questions
+        suggestions: Optional SuggestionJob precomputing suggested questions; cancelled when a query is run
         
     Returns:
         tuple: (nl_query, generated_sql, query_results)
     """
     st.header("Ask Questions About Your Data")
     
+    # One-click suggested questions, answered from precomputed results
+    if suggestions is not None:
+        suggestion = suggested_questions_component(suggestions)
+        if suggestion is not None:
+            start_trace("query", question=suggestion["question"], table=table_name, suggested=True)
+            st.session_state.approximate_query = None
+            if results is not None:
+                results.add(suggestion["question"], suggestion["sql"], suggestion["results"])
+            return suggestion["question"], suggestion["sql"], suggestion["results"]
+    
     # Query input
     nl_query = st.text_area(
         "Ask a question about your data in plain English",
@@ -30,38 +51,249 @@ def query_interface_component(db_connection, table_name, schema):
         help="You can ask complex questions, request charts, or ask for statistical analysis"
     )
     
+    # Optional DuckDB profiling of the generated query
+    profile_query = st.checkbox(
+        "Profile query execution",
+        help="Capture DuckDB's per-operator timings, rows scanned and memory (EXPLAIN ANALYZE) for the generated SQL"
+    )
+    
+    # Progressive execution for large results
+    stream_results = st.checkbox(
+        "Show rows as they arrive",
+        help="Stream the results in batches, showing the first rows and running totals while the query runs; it can be stopped early"
+    )
+    
+    # Sampled answers, offered once the table's sample is ready
+    approximate = False
+    if sampler is not None and sampler.has_sample(table_name):
+        approximate = st.checkbox(
+            "Approximate answers (fast, estimated from a sample)",
+            value=False,
+            help="Estimate sums, counts and averages from a random sample of the table, with 95% confidence margins"
+        )
+    
     # Initialize return values
     generated_sql = None
     query_results = None
     
+    # A streamed query interrupted by Stop (or any other interaction) keeps the rows received so far
+    stopped_query = st.session_state.get("streaming_query")
+    st.session_state.streaming_query = None
+    
     # Process query on button click
     if st.button("Run Query") and nl_query:
-        print(f"[DEBUG] Run Query button clicked. Query: {nl_query}")
+        logger.debug("Run Query button clicked. Query: %s", nl_query)
+        if suggestions is not None:
+            # Speculative work must not slow down the user's own question
+            suggestions.cancel()
+        # The trace stays current for the rest of this run, so chart and statistics
+        # spans attach to it too; app.py finishes it after the results are shown
+        start_trace("query", question=nl_query, table=table_name)
+        st.session_state.approximate_query = None
         with st.spinner("Analyzing your question..."):
             try:
-                print("[DEBUG] Attempting to generate SQL...")
+                logger.debug("Attempting to generate SQL...")
                 # Generate SQL from natural language
-                generated_sql = generate_sql_from_nl_query(nl_query, table_name, schema)
-                print(f"[DEBUG] Generated SQL: {generated_sql}")
+                prior_results = results.describe() if results is not None else None
+                generated_sql = generate_checked_sql(nl_query, db_connection, table_name, schema, profile, prior_results)
+                logger.debug("Generated SQL: %s", generated_sql)
                 
                 # Display the generated SQL with a copy button
                 with st.expander("Generated SQL Query", expanded=False):
                     st.code(generated_sql, language="sql")
                     
-                print("[DEBUG] Attempting to execute query...")
+                logger.debug("Attempting to execute query...")
                 # Execute the query
                 query_start_time = time.time()
-                query_results = execute_query(db_connection, generated_sql, table_name)
+                literal_repairs = []
+                if stream_results:
+                    query_results = streaming_results_component(db_connection, generated_sql, table_name, nl_query, results)
+                else:
+                    query_results = execute_query(
+                        db_connection, generated_sql, table_name, profile=profile_query, rollups=rollups,
+                        sampler=sampler if approximate else None, results=results
+                    )
+                    # No rows often means a filter value that is not stored as written
+                    if query_results.empty and profile and profile.get("value_index"):
+                        repaired_sql, literal_repairs = profile["value_index"].repair_literals(generated_sql)
+                        if literal_repairs:
+                            generated_sql = repaired_sql
+                            query_results = execute_query(
+                                db_connection, generated_sql, table_name, profile=profile_query, rollups=rollups,
+                                sampler=sampler if approximate else None, results=results
+                            )
                 query_execution_time = time.time() - query_start_time
-                print(f"[DEBUG] Query executed successfully. Result rows: {len(query_results)}")
+                logger.debug("Query executed successfully. Result rows: %d", len(query_results))
                 
                 # Show query stats
                 st.info(f"Query executed in {query_execution_time:.2f} seconds, returning {len(query_results)} rows")
+                if literal_repairs:
+                    st.caption(f"No rows matched at first; corrected filter values ({'; '.join(literal_repairs)})")
+                if "rollup" in query_results.attrs:
+                    st.caption(f"Answered from precomputed rollup `{query_results.attrs['rollup']}`")
+                if "cached_results" in query_results.attrs:
+                    st.caption(f"Refined the earlier result `{', '.join(query_results.attrs['cached_results'])}`")
+                if results is not None:
+                    # Kept so follow-up questions can query this result directly
+                    results.add(nl_query, generated_sql, query_results)
+                if "approximate" in query_results.attrs:
+                    # Remembered so the answer can be refined on a later rerun
+                    st.session_state.approximate_query = {"nl_query": nl_query, "sql": generated_sql}
+                
+                if "query_profile" in query_results.attrs:
+                    query_profile_component(query_results.attrs["query_profile"])
                 
             except Exception as e:
-                print(f"[ERROR] Exception occurred: {str(e)}")
+                logger.error("Exception occurred: %s", e)
                 st.error(f"Error processing query: {str(e)}")
                 generated_sql = None
                 query_results = None
     
-    return nl_query, generated_sql, query_results 
\ No newline at end of file
+    if query_results is None and stopped_query is not None:
+        query_results = batches_to_dataframe(stopped_query["batches"], stopped_query["schema"])
+        query_results.attrs["partial"] = True
+        nl_query, generated_sql = stopped_query["nl_query"], stopped_query["sql"]
+    
+    # Rerun the last approximate answer exactly on request
+    pending = st.session_state.get("approximate_query")
+    if pending is not None and st.button("Refine to exact answer"):
+        start_trace("query", question=pending["nl_query"], table=table_name, refined=True)
+        with st.spinner("Computing the exact answer..."):
+            try:
+                query_results = execute_query(db_connection, pending["sql"], table_name, rollups=rollups, results=results)
+                if results is not None:
+                    results.add(pending["nl_query"], pending["sql"], query_results)
+                nl_query, generated_sql = pending["nl_query"], pending["sql"]
+                st.session_state.approximate_query = None
+            except Exception as e:
+                logger.error("Exception occurred: %s", e)
+                st.error(f"Error processing query: {str(e)}")
+    
+    return nl_query, generated_sql, query_results
+
+def suggested_questions_component(job):
+    """
+    Component offering the suggested questions whose results are precomputed,
+    one button each.
+    
+    Args:
+        job: The SuggestionJob precomputing the suggestions
+        
+    Returns:
+        dict: The clicked suggestion ("question", "sql", "chart_type", "results"), or None
+    """
+    ready = job.ready()
+    if not ready and job.done():
+        return None
+    
+    st.markdown("**Suggested questions**")
+    clicked = None
+    columns = st.columns(max(len(ready), 1))
+    for i, suggestion in enumerate(ready):
+        if columns[i].button(suggestion["question"], key=f"suggestion_{i}", use_container_width=True):
+            clicked = suggestion
+    if not job.done():
+        suggestion_progress_component(job, len(ready))
+    return clicked
+
+@st.fragment(run_every=SUGGESTION_POLL_SECONDS)
+def suggestion_progress_component(job, shown):
+    """
+    Refresh on its own while suggestions are computed, rerunning the app
+    whenever another suggestion is ready to be shown.
+    
+    Args:
+        job: The SuggestionJob precomputing the suggestions
+        shown: The number of suggestions already shown
+    """
+    if job.done() or len(job.ready()) > shown:
+        st.rerun()
+    st.caption(f"Preparing suggested questions ({shown} of {len(job.suggestions)} ready)...")
+
+def streaming_results_component(db_connection, sql_query, table_name, nl_query, results=None):
+    """
+    Component running a query progressively: the first rows, a row counter and
+    running totals are shown as record batches arrive.
+    
+    Clicking Stop reruns the script, which interrupts the stream; the batches
+    received so far are kept in session state and returned by
+    query_interface_component on that rerun.
+    
+    Args:
+        db_connection: The DuckDB connection
+        sql_query: The generated SQL query
+        table_name: The name of the table in DuckDB
+        nl_query: The natural language query
+        results: Optional ResultCache whose cached results the query may read
+        
+    Returns:
+        pandas.DataFrame: All result rows
+    """
+    reader = stream_query(db_connection, sql_query, table_name, results=results)
+    streaming_query = {"nl_query": nl_query, "sql": sql_query, "schema": reader.schema, "batches": []}
+    st.session_state.streaming_query = streaming_query
+    
+    st.button("Stop", key="stop_streaming", help="Stop the query and keep the rows received so far")
+    status = st.status("Running query...", expanded=True)
+    preview_slot = status.empty()
+    totals_slot = status.empty()
+    
+    rows = 0
+    totals = {}
+    start_time = time.time()
+    try:
+        with span("sql_stream") as attrs:
+            for batch in reader:
+                streaming_query["batches"].append(batch)
+                if rows == 0 and batch.num_rows > 0:
+                    preview_slot.dataframe(
+                        batches_to_dataframe([batch.slice(0, STREAM_PREVIEW_ROWS)], reader.schema),
+                        use_container_width=True
+                    )
+                rows += batch.num_rows
+                update_running_totals(totals, batch)
+                if totals:
+                    totals_slot.dataframe(pd.DataFrame(totals).T, use_container_width=True)
+                elapsed = time.time() - start_time
+                status.update(label=f"Received {rows:,} rows ({rows / max(elapsed, 1e-6):,.0f} rows/s)...")
+            attrs["rows"] = rows
+    except Exception:
+        # A failed stream is reported as an error, not kept as a stopped partial result
+        # (Stop reruns the script with a Streamlit control exception, which is not caught here)
+        streaming_query["batches"].clear()
+        st.session_state.streaming_query = None
+        status.update(label=f"Query failed after {rows:,} rows", state="error", expanded=False)
+        raise
+    
+    status.update(label=f"Received all {rows:,} rows", state="complete", expanded=False)
+    st.session_state.streaming_query = None
+    return batches_to_dataframe(streaming_query["batches"], reader.schema)
+
+def query_profile_component(query_profile):
+    """
+    Component showing the DuckDB operator profile of an executed query.
+    
+    Args:
+        query_profile: The profile attached by execute_query(..., profile=True)
+    """
+    for warning in query_profile["warnings"]:
+        st.warning(warning)
+    
+    with st.expander("Query Profile", expanded=bool(query_profile["warnings"])):
+        st.caption(
+            f"Latency: {query_profile['latency'] * 1000:.1f} ms, "
+            f"rows scanned: {query_profile['rows_scanned'] or 0:,}, "
+            f"peak buffer memory: {(query_profile['peak_memory_bytes'] or 0) / (1024 * 1024):.1f} MB"
+        )
+        operators_df = pd.DataFrame([
+            {
+                "Operator": "  " * op["depth"] + op["operator"],
+                "Time (ms)": round(op["seconds"] * 1000, 3),
+                "Rows": op["rows"],
+                "Rows Scanned": op["rows_scanned"],
+                "Peak Memory (KB)": round(op["peak_memory_bytes"] / 1024, 1),
+                "Output (KB)": round(op["output_bytes"] / 1024, 1)
+            }
+            for op in query_profile["operators"]
+        ])
+        st.dataframe(operators_df, use_container_width=True, hide_index=True)
\ No newline at end of file
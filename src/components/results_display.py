@@ -1,6 +1,5 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
 
 # Import custom modules
 import sys
@@ -8,14 +7,20 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from core.viz.chart_generator import generate_chart
 from core.viz.chart_recommendations import recommend_chart_type
+from core.db.stats_engine import result_fingerprint, summarize_result, top_values
+from utils.telemetry import span
 
-def results_display_component(results, query=None):
+def results_display_component(results, query=None, profile=None, show_table_profile=False, result_key=None):
     """
     Component for displaying query results and visualizations.
     
     Args:
         results: The pandas DataFrame with query results
         query: The natural language query that generated the results
+        profile: Optional whole-table profile computed at ingest
+        show_table_profile: If True, the Statistics tab describes the whole table from the profile
+        result_key: Optional key identifying the results (e.g. their result store key), so
+                    statistics are cached without hashing the results on every rerun
         
     Returns:
         visualization: The generated visualization if any
@@ -27,6 +32,11 @@ def results_display_component(results, query=None):
     if results is not None and not results.empty:
         st.header("Results")
         
+        if results.attrs.get("partial"):
+            st.warning(f"Partial results: the query was stopped after {len(results):,} rows.")
+        if "approximate" in results.attrs:
+            approximate_notice(results)
+        
         # Display tabs for different views of the data
         tab1, tab2, tab3 = st.tabs(["Data Table", "Visualization", "Statistics"])
         
@@ -47,7 +57,16 @@ def results_display_component(results, query=None):
             # Chart generation based on results and query
             if len(results) > 0:
                 # Get chart recommendation
-                chart_type = recommend_chart_type(results, query)
+                # Suggested questions come with the chart precomputed
+                precomputed = results.attrs.get("figure")
+                if precomputed is not None:
+                    chart_type = precomputed[0]
+                elif results.attrs.get("chart_type"):
+                    # The figure was dropped when the result was spilled; it is generated again below
+                    chart_type = results.attrs["chart_type"]
+                else:
+                    with span("chart_recommend"):
+                        chart_type = recommend_chart_type(results, query, profile)
                 
                 # Let user override chart type
                 available_charts = ["bar", "line", "scatter", "pie", "histogram", "heatmap", "box"]
@@ -60,7 +79,11 @@ def results_display_component(results, query=None):
                 # Generate and display the chart
                 try:
                     with st.spinner("Generating visualization..."):
-                        visualization = generate_chart(results, selected_chart, query)
+                        if precomputed is not None and precomputed[0] == selected_chart:
+                            visualization = precomputed[1]
+                        else:
+                            with span("chart_build", chart_type=selected_chart):
+                                visualization = generate_chart(results, selected_chart, query)
                         st.plotly_chart(visualization, use_container_width=True)
                 except Exception as e:
                     st.error(f"Error generating visualization: {str(e)}")
@@ -68,26 +91,94 @@ def results_display_component(results, query=None):
                 st.info("No data available to visualize")
         
         with tab3:
-            # Statistical summary of the results
-            if results.shape[1] > 0 and results.shape[0] > 0:
+            if show_table_profile and profile is not None:
+                # Whole-table statistics precomputed at ingest
+                table_profile_display(profile)
+            elif results.shape[1] > 0 and results.shape[0] > 0:
+                if show_table_profile:
+                    st.info("Profiling the full table in the background. Statistics below cover the preview rows only.")
+                
+                # Statistical summary of the results, computed in DuckDB and cached per result
+                fingerprint = result_key or result_fingerprint(results)
+                summary = summarize_result(results, fingerprint)
+                
                 # Numeric columns
-                numeric_cols = results.select_dtypes(include=[np.number]).columns.tolist()
-                if numeric_cols:
+                if summary["numeric"] is not None:
                     st.subheader("Numeric Columns")
-                    st.dataframe(results[numeric_cols].describe(), use_container_width=True)
+                    st.dataframe(summary["numeric"], use_container_width=True)
                 
                 # Categorical columns
-                cat_cols = results.select_dtypes(exclude=[np.number]).columns.tolist()
-                if cat_cols:
+                if summary["distinct"]:
                     st.subheader("Categorical Columns")
-                    for col in cat_cols:
-                        with st.expander(f"{col} - Value Counts"):
-                            # Calculate value counts and reset index
-                            value_counts_df = results[col].value_counts().reset_index()
-                            # Explicitly assign final column names to avoid duplicates
-                            value_counts_df.columns = [col, 'count'] 
-                            st.dataframe(value_counts_df, use_container_width=True)
+                    for col, n_distinct in summary["distinct"].items():
+                        with st.expander(f"{col} - Value Counts (~{n_distinct} distinct)"):
+                            # Only count values once the user asks for them
+                            if st.checkbox("Show value counts", key=f"value_counts_{fingerprint}_{col}"):
+                                st.dataframe(top_values(results, col, fingerprint=fingerprint), use_container_width=True)
             else:
                 st.info("No data available for statistical analysis")
     
-    return visualization 
\ No newline at end of file
+    return visualization
+
+def table_profile_display(profile):
+    """
+    Display the whole-table profile computed at ingest.
+    
+    Args:
+        profile: The table profile from the background profiling job
+    """
+    st.subheader(f"Whole Table ({profile['row_count']:,} rows)")
+    overview_df = pd.DataFrame([
+        {
+            "Column": col,
+            "Type": col_profile["type"],
+            "Null %": round(col_profile["null_rate"] * 100, 2),
+            "Distinct (approx.)": col_profile["approx_distinct"],
+            "Min": str(col_profile["min"]),
+            "Max": str(col_profile["max"])
+        }
+        for col, col_profile in profile["columns"].items()
+    ])
+    st.dataframe(overview_df, use_container_width=True, hide_index=True)
+    
+    # Numeric distributions as equi-depth histogram boundaries
+    histograms = {
+        col: col_profile["histogram"]
+        for col, col_profile in profile["columns"].items() if col_profile["histogram"]
+    }
+    if histograms:
+        st.subheader("Numeric Distributions")
+        bins = len(next(iter(histograms.values()))) - 1
+        histogram_df = pd.DataFrame(histograms, index=[f"{round(100 * i / bins)}%" for i in range(bins + 1)])
+        st.dataframe(histogram_df, use_container_width=True)
+    
+    # Most frequent values of categorical columns
+    top_value_cols = {col: col_profile for col, col_profile in profile["columns"].items() if col_profile["top_values"]}
+    if top_value_cols:
+        st.subheader("Categorical Columns")
+        for col, col_profile in top_value_cols.items():
+            with st.expander(f"{col} - Top Values"):
+                st.dataframe(pd.DataFrame(col_profile["top_values"], columns=[col, 'count']), use_container_width=True)
+
+def approximate_notice(results):
+    """
+    Explain that results were estimated from a sample and show their confidence margins.
+    
+    Args:
+        results: The approximate query results (see execute_query's sampler argument)
+    """
+    approximation = results.attrs["approximate"]
+    st.info(
+        f"Approximate answer estimated from a {approximation['sample_rows']:,}-row sample "
+        f"of {approximation['table_rows']:,} rows. Groups too rare to appear in the sample are not listed; "
+        f"use \"Refine to exact answer\" for exact figures."
+    )
+    if approximation["margins"]:
+        with st.expander("95% confidence intervals"):
+            intervals = pd.DataFrame(index=results.index)
+            for col, margins in approximation["margins"].items():
+                intervals[f"{col} (low)"] = results[col] - margins
+                intervals[col] = results[col]
+                intervals[f"{col} (high)"] = results[col] + margins
+            dimensions = [col for col in results.columns if col not in approximation["margins"]]
+            st.dataframe(pd.concat([results[dimensions], intervals], axis=1), use_container_width=True, hide_index=True)
@@ -0,0 +1,44 @@
+import streamlit as st
+import pandas as pd
+
+def trace_waterfall_component(trace):
+    """
+    Component showing a collapsible timing waterfall of the stages of one query.
+    
+    Args:
+        trace: The finished Trace of the query
+    """
+    if trace is None or not trace.spans:
+        return
+    
+    # Plotly is imported on the first waterfall rather than at start-up
+    import plotly.graph_objects as go
+    
+    with st.expander(f"Query timing ({trace.duration * 1000:.0f} ms total)", expanded=False):
+        spans_df = pd.DataFrame([
+            {
+                "Stage": span["name"],
+                "Start (ms)": span["offset"] * 1000,
+                "Duration (ms)": span["duration"] * 1000,
+                "Details": ", ".join(f"{key}={value}" for key, value in span["attributes"].items())
+            }
+            for span in sorted(trace.spans, key=lambda span: span["offset"])
+        ])
+        
+        # One bar per span, offset by its start so the bars form a waterfall
+        fig = go.Figure(go.Bar(
+            y=[f"{i + 1}. {stage}" for i, stage in enumerate(spans_df["Stage"])],
+            x=spans_df["Duration (ms)"],
+            base=spans_df["Start (ms)"],
+            orientation="h",
+            hovertext=spans_df["Details"]
+        ))
+        fig.update_layout(
+            xaxis_title="Milliseconds since the query started",
+            yaxis=dict(autorange="reversed"),
+            height=80 + 30 * len(spans_df),
+            margin=dict(l=50, r=50, b=50, t=20, pad=4),
+            template="plotly_white"
+        )
+        st.plotly_chart(fig, use_container_width=True)
+        st.dataframe(spans_df.round(2), use_container_width=True, hide_index=True)
@@ -0,0 +1,183 @@
+import logging
+
+import duckdb
+
+# Import custom modules
+from core.db.duckdb_manager import get_table_info, encode_enum_columns, quote_identifier
+from utils.config import INGEST_CHUNK_ROWS
+from utils.telemetry import span, increment
+
+logger = logging.getLogger(__name__)
+
+STAGED_TABLE = "__append_staged"
+DELTA_TABLE = "__append_delta"
+
+_INTEGER_TYPES = ("TINYINT", "SMALLINT", "INTEGER", "BIGINT", "HUGEINT", "UTINYINT", "USMALLINT", "UINTEGER", "UBIGINT")
+_FLOAT_TYPES = ("FLOAT", "DOUBLE")
+
+def merge_schemas(schema, new_schema):
+    """
+    Merge the inferred schema of appended rows into a table's schema.
+
+    A column stays the type it was, except that INTEGER columns become FLOAT
+    when the new rows have fractional values.
+
+    Args:
+        schema: The table's inferred schema
+        new_schema: The inferred schema of the appended rows
+
+    Returns:
+        dict: The merged schema, in the table's column order
+    """
+    new_types = {column.lower(): col_type for column, col_type in new_schema.items()}
+    return {
+        column: "FLOAT" if col_type == "INTEGER" and new_types.get(column.lower()) == "FLOAT" else col_type
+        for column, col_type in schema.items()
+    }
+
+def _match_columns(table_columns, new_columns):
+    """
+    Match the columns of appended rows to a table's columns by name, ignoring case.
+
+    Args:
+        table_columns: The table's column names
+        new_columns: The column names of the appended rows
+
+    Returns:
+        dict: {table column: appended column}
+
+    Raises:
+        ValueError: If the columns differ
+    """
+    by_lower = {column.lower(): column for column in new_columns}
+    missing = [column for column in table_columns if column.lower() not in by_lower]
+    extra = set(by_lower) - {column.lower() for column in table_columns}
+    if missing or extra:
+        details = []
+        if missing:
+            details.append(f"missing {', '.join(missing)}")
+        if extra:
+            details.append(f"unexpected {', '.join(by_lower[column] for column in sorted(extra))}")
+        raise ValueError(f"The upload's columns do not match the table ({'; '.join(details)})")
+    return {column: by_lower[column.lower()] for column in table_columns}
+
+def append_table(connection, table_name, schema, source_connection, source_table, source_schema, key_column=None):
+    """
+    Append the rows of a freshly loaded table to an existing table with the same columns.
+
+    The source table lives in another DuckDB connection (the one the upload was
+    loaded into); its rows are streamed across as Arrow record batches. With a
+    key column, rows whose key is already in the table (or repeats within the
+    upload) are skipped. Integer columns receiving fractional values become
+    DOUBLE and ENUM columns receiving new values are re-encoded.
+
+    The appended rows are also kept in DELTA_TABLE, typed like the table, so
+    statistics and aggregates can be updated from them; the caller drops it.
+
+    Args:
+        connection: The DuckDB connection holding the table
+        table_name: The table to append to
+        schema: The table's inferred schema
+        source_connection: The DuckDB connection holding the new rows
+        source_table: The table with the new rows
+        source_schema: The inferred schema of the new rows
+        key_column: Optional column identifying a row, used to skip rows already loaded
+
+    Returns:
+        dict: {"schema": the merged schema, "delta_table": DELTA_TABLE,
+               "rows_added", "rows_skipped", "widened": columns made DOUBLE,
+               "reencoded": ENUM columns that gained values}
+
+    Raises:
+        ValueError: If the columns of the new rows do not match the table
+    """
+    table_types = {column["name"]: column["type"] for column in get_table_info(connection, quote_identifier(table_name))["columns"]}
+    source_types = {
+        column["name"]: column["type"]
+        for column in get_table_info(source_connection, quote_identifier(source_table))["columns"]
+    }
+    columns = _match_columns(list(table_types), list(source_types))
+    table = quote_identifier(table_name)
+    view_name = f"{STAGED_TABLE}_batches"
+
+    with span("append_rows", table=table_name, key=bool(key_column)) as attrs:
+        # Stage the new rows in the table's connection, minus already loaded keys
+        select_items = ", ".join(f"{quote_identifier(columns[column])} AS {quote_identifier(column)}" for column in table_types)
+        dedup = ""
+        if key_column:
+            key = quote_identifier(key_column)
+            # ENUM keys are compared as text, as new values cannot be cast to the ENUM
+            table_key = f"CAST(t.{key} AS VARCHAR)" if table_types[key_column].startswith("ENUM") else f"t.{key}"
+            source_key = f"CAST(s.{key} AS VARCHAR)" if table_types[key_column].startswith("ENUM") else f"s.{key}"
+            dedup = (
+                f" WHERE NOT EXISTS (SELECT 1 FROM {table} t WHERE {table_key} = {source_key})"
+                f" QUALIFY row_number() OVER (PARTITION BY s.{key}) = 1"
+            )
+        source_rows = source_connection.execute(f"SELECT count(*) FROM {quote_identifier(source_table)}").fetchone()[0]
+        reader = source_connection.execute(f"SELECT {select_items} FROM {quote_identifier(source_table)}").to_arrow_reader(INGEST_CHUNK_ROWS)
+        connection.register(view_name, reader)
+        try:
+            connection.execute(f"CREATE OR REPLACE TABLE {STAGED_TABLE} AS SELECT * FROM {view_name} s{dedup}")
+        finally:
+            connection.unregister(view_name)
+        rows_added = connection.execute(f"SELECT count(*) FROM {STAGED_TABLE}").fetchone()[0]
+
+        widened = [
+            column for column, col_type in table_types.items()
+            if col_type in _INTEGER_TYPES
+            and (source_types[columns[column]] in _FLOAT_TYPES or source_types[columns[column]].startswith("DECIMAL"))
+        ]
+        reencoded = [
+            column for column, col_type in table_types.items()
+            if col_type.startswith("ENUM") and connection.execute(
+                f"SELECT count(*) FROM {STAGED_TABLE} WHERE {quote_identifier(column)} IS NOT NULL "
+                f"AND NOT list_contains((SELECT enum_range({quote_identifier(column)}) FROM {table} "
+                f"WHERE {quote_identifier(column)} IS NOT NULL LIMIT 1), CAST({quote_identifier(column)} AS VARCHAR))"
+            ).fetchone()[0] > 0
+        ]
+
+        connection.begin()
+        try:
+            for column in widened:
+                connection.execute(f"ALTER TABLE {table} ALTER {quote_identifier(column)} TYPE DOUBLE")
+            for column in reencoded:
+                connection.execute(f"ALTER TABLE {table} ALTER {quote_identifier(column)} TYPE VARCHAR")
+            connection.execute(f"INSERT INTO {table} BY NAME SELECT * FROM {STAGED_TABLE}")
+            if reencoded:
+                encode_enum_columns(connection, table_name, reencoded)
+            # Typed like the table (including the re-encoded ENUMs), so derived tables can take its rows
+            connection.execute(f"CREATE OR REPLACE TABLE {DELTA_TABLE} AS SELECT * FROM {table} LIMIT 0")
+            connection.execute(f"INSERT INTO {DELTA_TABLE} BY NAME SELECT * FROM {STAGED_TABLE}")
+            connection.commit()
+        except duckdb.Error:
+            connection.rollback()
+            raise
+        finally:
+            connection.execute(f"DROP TABLE IF EXISTS {STAGED_TABLE}")
+
+        attrs["rows"] = rows_added
+        attrs["skipped"] = source_rows - rows_added
+
+    increment("rows_appended_total", rows_added)
+    logger.info(
+        "Appended %d rows to %s (%d skipped as already loaded)", rows_added, table_name, source_rows - rows_added
+    )
+    return {
+        "schema": merge_schemas(schema, source_schema),
+        "delta_table": DELTA_TABLE,
+        "rows_added": rows_added,
+        "rows_skipped": source_rows - rows_added,
+        "widened": widened,
+        "reencoded": reencoded
+    }
+
+def drop_delta(connection):
+    """
+    Drop the appended rows kept by append_table once derived tables are updated.
+
+    Args:
+        connection: The DuckDB connection holding the table
+    """
+    # On a cursor of its own, as appends run on the ingestion thread
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {DELTA_TABLE}")
@@ -0,0 +1,330 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import duckdb
+
+# Import custom modules
+from core.db.duckdb_manager import quote_identifier
+from core.db.rollups import parse_aggregate_query, strip_alias, AGGREGATE_PATTERN
+from utils.config import (
+    APPROX_MIN_TABLE_ROWS, APPROX_SAMPLE_ROWS, APPROX_SAMPLE_SEED, APPROX_CONFIDENCE_Z, APPROX_MIN_SAMPLE_ROWS,
+    BACKGROUND_WORKERS
+)
+from utils.telemetry import span, increment
+
+logger = logging.getLogger(__name__)
+
+# Samples are drawn off the Streamlit script thread, by a pool shared by all sessions
+_executor = ThreadPoolExecutor(max_workers=BACKGROUND_WORKERS, thread_name_prefix="sampler")
+
+# Extra column of rewritten queries counting the sampled rows behind each result row
+SAMPLED_ROWS_COLUMN = "__sampled_rows"
+
+def _sample_table_name(table_name):
+    """
+    Name the sample table of a base table.
+
+    Args:
+        table_name: The base table
+
+    Returns:
+        str: The sample table name
+    """
+    return f"__sample_{table_name.lower()}"
+
+class SampleManager:
+    """
+    Maintains a uniform reservoir sample of each large table and answers
+    aggregate queries approximately from it.
+
+    SUM and COUNT estimates are scaled up by table rows / sample rows; AVG is
+    unscaled. Each single-aggregate result column gets a 95% confidence margin
+    (normal approximation with finite population correction). Estimates
+    resting on fewer than APPROX_MIN_SAMPLE_ROWS sampled rows are not
+    trustworthy, see reliable.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._samples = {}
+
+    def start(self, table_name):
+        """
+        Start drawing the sample of a table in the background, if it is large
+        enough to benefit from approximate answers.
+
+        Args:
+            table_name: The base table
+
+        Returns:
+            concurrent.futures.Future: The sampling job, or None for small tables
+        """
+        # fetchall() closes the result; a half-read one keeps the connection's
+        # transaction open, hiding the sample table once it is created
+        table_rows = self.connection.execute(f"SELECT count(*) FROM {quote_identifier(table_name)}").fetchall()[0][0]
+        if table_rows < APPROX_MIN_TABLE_ROWS:
+            return None
+        with self._lock:
+            generation = self._generation
+        return _executor.submit(self._build, table_name, table_rows, generation)
+
+    def _build(self, table_name, table_rows, generation):
+        """
+        Draw the reservoir sample of a table (runs on the background executor).
+
+        Args:
+            table_name: The base table
+            table_rows: The number of rows in the base table
+            generation: The invalidation generation the job was started in
+        """
+        sample_table = _sample_table_name(table_name)
+        cursor = self.connection.cursor()
+        try:
+            with span("sample_build", table=table_name, rows=APPROX_SAMPLE_ROWS):
+                cursor.execute(
+                    f"CREATE OR REPLACE TABLE {quote_identifier(sample_table)} AS "
+                    f"SELECT * FROM {quote_identifier(table_name)} "
+                    f"USING SAMPLE reservoir({int(APPROX_SAMPLE_ROWS)} ROWS) REPEATABLE ({int(APPROX_SAMPLE_SEED)})"
+                )
+                sample_rows = cursor.execute(f"SELECT count(*) FROM {quote_identifier(sample_table)}").fetchone()[0]
+            with self._lock:
+                if generation == self._generation:
+                    self._samples[table_name.lower()] = {
+                        "sample": sample_table,
+                        "sample_rows": sample_rows,
+                        "table_rows": table_rows
+                    }
+                    return
+            cursor.execute(f"DROP TABLE IF EXISTS {quote_identifier(sample_table)}")
+        except duckdb.Error as e:
+            logger.error("Failed to sample %s: %s", table_name, e)
+        finally:
+            cursor.close()
+
+    def has_sample(self, table_name):
+        """
+        Check whether approximate answers are available for a table.
+
+        Args:
+            table_name: The base table
+
+        Returns:
+            bool: True once the table's sample is ready
+        """
+        with self._lock:
+            return table_name.lower() in self._samples
+
+    def rewrite(self, sql_query):
+        """
+        Rewrite an aggregate query to estimate its answer from the table's sample.
+
+        Queries using MIN, MAX or DISTINCT aggregates cannot be estimated and
+        run exactly.
+
+        Args:
+            sql_query: The validated SQL query
+
+        Returns:
+            dict: {"sql": rewritten query, "columns": original result column names,
+                   "margins": {result column: margin column}, "sample_rows", "table_rows"},
+                  or None to run the query exactly
+        """
+        parsed = parse_aggregate_query(sql_query)
+        if parsed is None or any(func in ("min", "max") for func, _ in parsed["measures"]):
+            return None
+        with self._lock:
+            sample = self._samples.get(parsed["table"].lower())
+        if sample is None:
+            return None
+
+        n, total = sample["sample_rows"], sample["table_rows"]
+        scale = total / n
+        # Finite population correction, shared by every margin
+        fpc = max(1 - n / total, 0.0)
+
+        def estimate(match):
+            func, arg = match.group("func").lower(), match.group("arg")
+            if func == "sum":
+                return f"(sum({arg}) * {scale!r})"
+            if func == "count":
+                return f"CAST(round(count({arg}) * {scale!r}) AS BIGINT)"
+            return match.group(0)
+
+        def margin(match):
+            func, arg = match.group("func").lower(), match.group("arg")
+            if func == "avg":
+                return f"({APPROX_CONFIDENCE_Z!r} * stddev_samp({arg}) / sqrt(count({arg})) * sqrt({fpc!r}))"
+            if func == "sum":
+                # Per-row contribution y = value in group, 0 elsewhere; total = N * mean(y)
+                first, second = f"sum(CAST({arg} AS DOUBLE)) / {n}", f"sum(CAST({arg} AS DOUBLE) * CAST({arg} AS DOUBLE)) / {n}"
+            else:
+                first = second = f"count({arg}) / {n}"
+            variance = f"greatest({second} - pow({first}, 2), 0) * {n} / {max(n - 1, 1)}"
+            return f"({APPROX_CONFIDENCE_Z!r} * {total} * sqrt({fpc!r} * {variance} / {n}))"
+
+        try:
+            columns = self.connection.sql(sql_query).columns
+        except duckdb.Error:
+            return None
+
+        select_items, margin_items, margins = [], [], {}
+        for column, item in zip(columns, parsed["select"]):
+            expr, alias = strip_alias(item)
+            aggregate = AGGREGATE_PATTERN.fullmatch(expr.strip())
+            if aggregate:
+                margin_column = f"{column} ±"
+                margin_items.append(f"{margin(aggregate)} AS {quote_identifier(margin_column)}")
+                margins[column] = margin_column
+            expr = AGGREGATE_PATTERN.sub(estimate, expr)
+            select_items.append(f"{expr} AS {alias}" if alias else expr)
+
+        # Filters no sampled row matches would otherwise be estimated as 0 ± 0
+        margin_items.append(f"count(*) AS {quote_identifier(SAMPLED_ROWS_COLUMN)}")
+        rewritten = f"SELECT {', '.join(select_items + margin_items)} FROM {quote_identifier(sample['sample'])}"
+        if parsed["where"]:
+            rewritten += f" WHERE {parsed['where']}"
+        if parsed["group"]:
+            rewritten += f" GROUP BY {', '.join(parsed['group'])}"
+        rewritten += AGGREGATE_PATTERN.sub(estimate, parsed["tail"])
+
+        try:
+            self.connection.sql(rewritten)
+        except duckdb.Error as e:
+            logger.debug("Approximate rewrite rejected: %s", e)
+            return None
+
+        increment("approximate_queries_total")
+        return {
+            "sql": rewritten,
+            "columns": list(columns) + list(margins.values()) + [SAMPLED_ROWS_COLUMN],
+            "margins": margins,
+            "sample_rows": n,
+            "table_rows": total
+        }
+
+    def apply_append(self, table_name, delta_table):
+        """
+        Update the sample of a table after rows were appended to it.
+
+        The sample stays uniform over the grown table without rescanning it:
+        old and new rows keep their share of the sample, drawing the old share
+        from the current sample and the new share from the appended rows.
+
+        Args:
+            table_name: The base table
+            delta_table: A table holding just the appended rows
+        """
+        with self._lock:
+            sample = self._samples.get(table_name.lower())
+            generation = self._generation
+        if sample is None:
+            # Not sampled (yet): the table may have grown large enough now
+            self.invalidate(table_name)
+            self.start(table_name)
+            return
+
+        cursor = self.connection.cursor()
+        try:
+            delta_rows = cursor.execute(f"SELECT count(*) FROM {quote_identifier(delta_table)}").fetchone()[0]
+            table_rows = sample["table_rows"] + delta_rows
+            new_share = round(APPROX_SAMPLE_ROWS * delta_rows / table_rows) if table_rows else 0
+            old_share = min(sample["sample_rows"], APPROX_SAMPLE_ROWS - new_share)
+            merged_table = quote_identifier(f"{sample['sample']}_merged")
+            with span("sample_merge", table=table_name, rows=old_share + new_share):
+                # Typed like the table now, e.g. with ENUMs that gained values
+                cursor.execute(f"CREATE OR REPLACE TABLE {merged_table} AS SELECT * FROM {quote_identifier(delta_table)} LIMIT 0")
+                cursor.execute(
+                    f"INSERT INTO {merged_table} BY NAME "
+                    f"SELECT * FROM {quote_identifier(sample['sample'])} "
+                    f"USING SAMPLE reservoir({int(old_share)} ROWS) REPEATABLE ({int(APPROX_SAMPLE_SEED)})"
+                )
+                cursor.execute(
+                    f"INSERT INTO {merged_table} BY NAME "
+                    f"SELECT * FROM {quote_identifier(delta_table)} "
+                    f"USING SAMPLE reservoir({int(new_share)} ROWS) REPEATABLE ({int(APPROX_SAMPLE_SEED)})"
+                )
+                sample_rows = cursor.execute(f"SELECT count(*) FROM {merged_table}").fetchone()[0]
+
+            with self._lock:
+                current = generation == self._generation and self._samples.get(table_name.lower()) is sample
+            if not current:
+                cursor.execute(f"DROP TABLE {merged_table}")
+                return
+            cursor.begin()
+            cursor.execute(f"DROP TABLE {quote_identifier(sample['sample'])}")
+            cursor.execute(f"ALTER TABLE {merged_table} RENAME TO {quote_identifier(sample['sample'])}")
+            cursor.commit()
+            with self._lock:
+                self._samples[table_name.lower()] = {**sample, "sample_rows": sample_rows, "table_rows": table_rows}
+        except duckdb.Error as e:
+            logger.error("Failed to update the sample of %s: %s", table_name, e)
+            self.invalidate(table_name)
+        finally:
+            cursor.close()
+
+    def invalidate(self, table_name=None):
+        """
+        Drop the sample of a table (or all samples), e.g. after its data changed.
+
+        Args:
+            table_name: The base table, or None for every table
+        """
+        with self._lock:
+            self._generation += 1
+            stale = [
+                key for key in self._samples
+                if table_name is None or key == table_name.lower()
+            ]
+            samples = [self._samples.pop(key)["sample"] for key in stale]
+
+        for sample_table in samples:
+            try:
+                # On a cursor of its own, as this also runs on the background threads
+                with self.connection.cursor() as cursor:
+                    cursor.execute(f"DROP TABLE IF EXISTS {quote_identifier(sample_table)}")
+            except duckdb.Error as e:
+                # The connection may already be closed along with its tables
+                logger.debug("Could not drop sample %s: %s", sample_table, e)
+
+def split_margins(result, approximation):
+    """
+    Move the confidence margins of an approximate result out of its columns.
+
+    Args:
+        result: The DataFrame returned by the rewritten query
+        approximation: The dict returned by SampleManager.rewrite
+
+    Returns:
+        dict: Metadata for result.attrs["approximate"]: sample and table row
+              counts, the confidence z-score, {column: list of margins} and
+              min_sampled_rows, the fewest sampled rows behind a result row
+              (0 if no sampled row matched)
+    """
+    margins = {column: result.pop(margin_column).tolist() for column, margin_column in approximation["margins"].items()}
+    sampled_rows = result.pop(SAMPLED_ROWS_COLUMN)
+    return {
+        "sample_rows": approximation["sample_rows"],
+        "table_rows": approximation["table_rows"],
+        "z": APPROX_CONFIDENCE_Z,
+        "margins": margins,
+        "min_sampled_rows": int(sampled_rows.min()) if len(sampled_rows) else 0
+    }
+
+def reliable(estimate):
+    """
+    Check whether an approximate result rests on enough sampled rows.
+
+    A filter matching no sampled row would be reported as 0 ± 0, and a group
+    with a handful of sampled rows gets a meaningless margin; such queries
+    are answered exactly instead.
+
+    Args:
+        estimate: The metadata returned by split_margins
+
+    Returns:
+        bool: True if every result row is estimated from at least APPROX_MIN_SAMPLE_ROWS sampled rows
+    """
+    return estimate["min_sampled_rows"] >= APPROX_MIN_SAMPLE_ROWS
@@ -2,45 +2,335 @@ import duckdb
 import pandas as pd
 import os
 import re
+import shutil
+import tempfile
+import threading
+import weakref
 from pathlib import Path
 
+# Import custom modules
+from core.db.schema_inference import encode_categoricals
+from utils.config import (
+    DB_MEMORY_LIMIT, DB_THREADS, DB_TEMP_DIRECTORY, DB_MAX_TEMP_DIRECTORY_SIZE, COERCE_DOWNCAST_FLOATS, COERCE_FLOAT_RTOL
+)
+
+# Finalizer removing the spill directory of each open connection, run when the
+# connection is closed or garbage collected (or at exit)
+_spill_finalizers = weakref.WeakKeyDictionary()
+_spill_lock = threading.Lock()
+_stale_spill_checked = False
+
+def _process_alive(pid):
+    """
+    Check whether a process is running.
+
+    Args:
+        pid: The process id
+
+    Returns:
+        bool: False only if the process is known not to exist
+    """
+    if os.name == "nt":
+        return True  # os.kill would terminate the process on Windows
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+def remove_stale_spill_directories():
+    """
+    Remove the spill directories left under DB_TEMP_DIRECTORY by processes
+    that exited without closing their connections (e.g. were killed).
+
+    Directories are named session_<pid>_..., so those of other running
+    processes sharing the directory are kept.
+
+    Returns:
+        int: The number of directories removed
+    """
+    removed = 0
+    try:
+        entries = list(os.scandir(DB_TEMP_DIRECTORY))
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        if not entry.is_dir() or not entry.name.startswith("session_"):
+            continue
+        # Directories without a pid predate the naming and are stale too
+        match = re.match(r'session_(\d+)_', entry.name)
+        if match and (int(match.group(1)) == os.getpid() or _process_alive(int(match.group(1)))):
+            continue
+        shutil.rmtree(entry.path, ignore_errors=True)
+        removed += 1
+    return removed
+
 def init_db_connection():
     """
     Initialize an in-memory DuckDB connection.
     
+    Each connection is a separate DuckDB instance limited to DB_MEMORY_LIMIT
+    and DB_THREADS. Sorts, joins and aggregations that do not fit spill to a
+    private directory under DB_TEMP_DIRECTORY instead of exhausting the
+    server's memory.
+    
     Returns:
         duckdb.DuckDBPyConnection: A DuckDB connection object
     """
-    return duckdb.connect(database=':memory:')
+    global _stale_spill_checked
+    with _spill_lock:
+        if not _stale_spill_checked:
+            _stale_spill_checked = True
+            remove_stale_spill_directories()
+    os.makedirs(DB_TEMP_DIRECTORY, exist_ok=True)
+    spill_directory = tempfile.mkdtemp(prefix=f"session_{os.getpid()}_", dir=DB_TEMP_DIRECTORY)
+    config = {
+        "memory_limit": DB_MEMORY_LIMIT,
+        "temp_directory": spill_directory,
+        "max_temp_directory_size": DB_MAX_TEMP_DIRECTORY_SIZE
+    }
+    if DB_THREADS:
+        config["threads"] = DB_THREADS
+    connection = duckdb.connect(database=':memory:', config=config)
+    with _spill_lock:
+        _spill_finalizers[connection] = weakref.finalize(connection, shutil.rmtree, spill_directory, ignore_errors=True)
+    return connection
 
-def load_data_to_db(connection, dataframe, filename):
+def get_memory_usage(connection):
     """
-    Load a pandas DataFrame into a DuckDB table.
+    Get the memory and spill usage of a DuckDB connection.
     
     Args:
         connection: The DuckDB connection
-        dataframe: The pandas DataFrame to load
-        filename: The original filename, used to generate a table name
         
     Returns:
-        str: The name of the created table
+        dict: {"memory_bytes", "spilled_bytes", "memory_limit"}; memory_limit is
+              the configured limit as text, e.g. "2.0 GiB"
+    """
+    memory_bytes, spilled_bytes = connection.execute(
+        "SELECT COALESCE(SUM(memory_usage_bytes), 0), COALESCE(SUM(temporary_storage_bytes), 0) FROM duckdb_memory()"
+    ).fetchone()
+    memory_limit = connection.execute("SELECT current_setting('memory_limit')").fetchone()[0]
+    return {"memory_bytes": int(memory_bytes), "spilled_bytes": int(spilled_bytes), "memory_limit": memory_limit}
+
+def get_total_memory_usage():
+    """
+    Get the memory and spill usage of all open DuckDB connections of this process.
+    
+    Returns:
+        dict: {"connections", "memory_bytes", "spilled_bytes"}
+    """
+    with _spill_lock:
+        connections = list(_spill_finalizers)
+    total = {"connections": 0, "memory_bytes": 0, "spilled_bytes": 0}
+    for connection in connections:
+        try:
+            usage = get_memory_usage(connection)
+        except duckdb.Error:
+            continue  # Closed concurrently
+        total["connections"] += 1
+        total["memory_bytes"] += usage["memory_bytes"]
+        total["spilled_bytes"] += usage["spilled_bytes"]
+    return total
+
+def make_table_name(filename):
+    """
+    Generate a safe table name from a file name.
+    
+    Args:
+        filename: The original filename
+        
+    Returns:
+        str: The table name
     """
-    # Generate a safe table name from the file name
     base_name = Path(filename).stem
     table_name = re.sub(r'[^a-zA-Z0-9_]', '_', base_name).lower()
     
     # Ensure the table name is unique and valid
     if not table_name or table_name[0].isdigit():
         table_name = f"data_{table_name}"
+    return table_name
+
+def load_data_to_db(connection, dataframe, filename, schema=None):
+    """
+    Load a pandas DataFrame into a DuckDB table.
+    
+    Args:
+        connection: The DuckDB connection
+        dataframe: The pandas DataFrame to load
+        filename: The original filename, used to generate a table name
+        schema: Optional inferred schema; CATEGORICAL columns are stored as ENUMs
+        
+    Returns:
+        str: The name of the created table
+    """
+    table_name = make_table_name(filename)
+    
+    # Dictionary-encode low-cardinality text so DuckDB stores it as ENUM
+    if schema:
+        dataframe = encode_categoricals(dataframe, schema)
     
-    # Register the DataFrame as a table
-    connection.register(table_name, dataframe)
+    # Register the DataFrame as a temporary view
+    view_name = f"{table_name}_df"
+    connection.register(view_name, dataframe)
     
-    # Create a persistent table from the registered view
-    connection.execute(f"CREATE TABLE {table_name} AS SELECT * FROM {table_name}")
+    # Integer columns narrowed below 32 bits at ingest are stored as INTEGER:
+    # generated SQL does arithmetic on them, which overflows TINYINT/SMALLINT
+    select_items = [
+        f"CAST({quote_identifier(col)} AS INTEGER) AS {quote_identifier(col)}"
+        if pd.api.types.is_integer_dtype(dtype) and dtype.itemsize < 4 else quote_identifier(col)
+        for col, dtype in dataframe.dtypes.items()
+    ]
+    
+    # Create a persistent table from the registered view, then drop the view so
+    # queries read the DuckDB table instead of rescanning the DataFrame
+    connection.execute(f"CREATE TABLE {table_name} AS SELECT {', '.join(select_items)} FROM {view_name}")
+    connection.unregister(view_name)
     
     return table_name
 
+def load_csv_files_to_db(connection, paths, filename, delimiter=","):
+    """
+    Load several CSV files on disk into one DuckDB table.
+    
+    DuckDB parses the files in parallel on its own thread pool. Columns are
+    matched by name across files (a column missing from a file is null for its
+    rows) and a source_file column holds the name of the file each row came from.
+    
+    Args:
+        connection: The DuckDB connection
+        paths: The paths of the CSV files
+        filename: The name to generate the table name from
+        delimiter: The CSV delimiter
+        
+    Returns:
+        str: The name of the created table
+    """
+    table_name = make_table_name(filename)
+    file_list = ", ".join(quote_literal(path) for path in paths)
+    connection.execute(
+        f"CREATE TABLE {quote_identifier(table_name)} AS "
+        f"SELECT * EXCLUDE (filename), regexp_replace(filename, '^.*[/\\\\]', '') AS source_file "
+        f"FROM read_csv([{file_list}], delim={quote_literal(delimiter)}, header=true, "
+        f"union_by_name=true, filename=true)"
+    )
+    return table_name
+
+def append_data_to_db(connection, table_name, dataframe):
+    """
+    Append the rows of a pandas DataFrame to an existing DuckDB table.
+    
+    Columns are matched by name; values are cast to the table's column types.
+    
+    Args:
+        connection: The DuckDB connection
+        table_name: The name of the table to append to
+        dataframe: The pandas DataFrame with the new rows
+    """
+    view_name = f"{table_name}_append_df"
+    connection.register(view_name, dataframe)
+    try:
+        connection.execute(f"INSERT INTO {quote_identifier(table_name)} BY NAME SELECT * FROM {view_name}")
+    finally:
+        connection.unregister(view_name)
+
+def widen_numeric_columns(connection, table_name):
+    """
+    Store a table's integer columns as BIGINT and float columns as DOUBLE.
+    
+    Used when a table is created from its first chunk of rows, so later chunks
+    with larger values still fit; narrow_numeric_columns settles the widths
+    once every chunk is loaded.
+    
+    Args:
+        connection: The DuckDB connection
+        table_name: The name of the table
+    """
+    widened = {"TINYINT": "BIGINT", "SMALLINT": "BIGINT", "INTEGER": "BIGINT", "FLOAT": "DOUBLE"}
+    for column in get_table_info(connection, table_name)['columns']:
+        if column['type'] in widened:
+            alter_column_type(connection, table_name, column['name'], widened[column['type']])
+
+def narrow_numeric_columns(connection, table_name):
+    """
+    Store a table's BIGINT and DOUBLE columns in the narrowest type that holds their values.
+    
+    Integers fitting 32 bits become INTEGER (not narrower: generated SQL does
+    arithmetic on them, which overflows TINYINT/SMALLINT). Floats become FLOAT
+    when COERCE_DOWNCAST_FLOATS is set and every value survives the conversion
+    within COERCE_FLOAT_RTOL. All columns are checked in a single scan.
+    
+    Args:
+        connection: The DuckDB connection
+        table_name: The name of the table
+        
+    Returns:
+        dict: {column: new type} of the narrowed columns
+    """
+    checks = {}
+    for column in get_table_info(connection, table_name)['columns']:
+        quoted = quote_identifier(column['name'])
+        if column['type'] == "BIGINT":
+            checks[column['name']] = (
+                "INTEGER",
+                f"coalesce(min({quoted}) >= {-2 ** 31} AND max({quoted}) < {2 ** 31}, true)"
+            )
+        elif column['type'] == "DOUBLE" and COERCE_DOWNCAST_FLOATS:
+            checks[column['name']] = (
+                "FLOAT",
+                f"coalesce(bool_and(CASE WHEN {quoted} IS NULL OR NOT isfinite({quoted}) THEN true "
+                f"WHEN abs({quoted}) > 3.4e38 THEN false "
+                f"ELSE abs(CAST(CAST({quoted} AS FLOAT) AS DOUBLE) - {quoted}) <= {COERCE_FLOAT_RTOL!r} * abs({quoted}) END), true)"
+            )
+    if not checks:
+        return {}
+    
+    fits = connection.execute(
+        f"SELECT {', '.join(check for _, check in checks.values())} FROM {quote_identifier(table_name)}"
+    ).fetchone()
+    narrowed = {}
+    for (column, (new_type, _)), fit in zip(checks.items(), fits):
+        if fit:
+            alter_column_type(connection, table_name, column, new_type)
+            narrowed[column] = new_type
+    return narrowed
+
+def alter_column_type(connection, table_name, column, new_type):
+    """
+    Change the type of a table column, casting its values.
+    
+    Args:
+        connection: The DuckDB connection
+        table_name: The name of the table
+        column: The column
+        new_type: The DuckDB type, e.g. "VARCHAR"
+    """
+    connection.execute(
+        f"ALTER TABLE {quote_identifier(table_name)} ALTER {quote_identifier(column)} TYPE {new_type}"
+    )
+
+def encode_enum_columns(connection, table_name, columns):
+    """
+    Convert text columns of a table to ENUM types built from their distinct values.
+    
+    Args:
+        connection: The DuckDB connection
+        table_name: The name of the table
+        columns: The columns to convert
+    """
+    for position, column in enumerate(columns):
+        quoted = quote_identifier(column)
+        enum_type = quote_identifier(f"{table_name}_enum_{position}")
+        connection.execute(f"DROP TYPE IF EXISTS {enum_type}")
+        connection.execute(
+            f"CREATE TYPE {enum_type} AS ENUM ("
+            f"SELECT DISTINCT CAST({quoted} AS VARCHAR) FROM {quote_identifier(table_name)} "
+            f"WHERE {quoted} IS NOT NULL ORDER BY 1)"
+        )
+        connection.execute(f"ALTER TABLE {quote_identifier(table_name)} ALTER {quoted} TYPE {enum_type}")
+
 def get_table_info(connection, table_name):
     """
     Get information about a table in DuckDB.
@@ -81,4 +371,32 @@ def close_connection(connection):
         connection: The DuckDB connection to close
     """
     if connection:
-        connection.close() 
\ No newline at end of file
+        connection.close()
+        with _spill_lock:
+            finalizer = _spill_finalizers.pop(connection, None)
+        if finalizer is not None:
+            finalizer()
+
+def quote_identifier(name):
+    """
+    Quote a column or table name for use in a DuckDB SQL statement.
+
+    Args:
+        name: The identifier to quote
+
+    Returns:
+        str: The identifier wrapped in double quotes, with embedded quotes escaped
+    """
+    return '"' + str(name).replace('"', '""') + '"' 
+
+def quote_literal(value):
+    """
+    Quote a string for use as a literal in a DuckDB SQL statement.
+
+    Args:
+        value: The string to quote
+
+    Returns:
+        str: The string wrapped in single quotes, with embedded quotes escaped
+    """
+    return "'" + str(value).replace("'", "''") + "'"
@@ -0,0 +1,618 @@
+import logging
+import mmap
+import os
+import re
+import shutil
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+import pandas as pd
+
+# Import custom modules
+from core.db.duckdb_manager import (
+    init_db_connection, load_data_to_db, load_csv_files_to_db, append_data_to_db, get_table_info,
+    widen_numeric_columns, narrow_numeric_columns, alter_column_type, encode_enum_columns, close_connection,
+    quote_identifier
+)
+from core.db.schema_inference import infer_schema
+from core.db.type_coercion import plan_coercions, apply_coercions, coerce_chunk
+from core.db.profiler import start_profile_job
+from core.db.append import append_table, drop_delta
+from utils.config import INGEST_CHUNK_ROWS, INGEST_SCHEMA_SAMPLE_ROWS, BACKGROUND_WORKERS
+from utils.file_utils import clean_up_file
+from utils.telemetry import span, start_trace, finish_trace
+
+logger = logging.getLogger(__name__)
+
+# Uploads are ingested off the Streamlit script thread; the pool is shared by
+# all sessions, so one session's upload does not wait for another's
+_executor = ThreadPoolExecutor(max_workers=BACKGROUND_WORKERS, thread_name_prefix="ingestion")
+
+class IngestionCancelled(Exception):
+    """
+    Raised inside an ingestion job that was cancelled.
+    """
+
+class _CountingReader:
+    """
+    File wrapper that reports how many bytes have been read to an ingestion job.
+    """
+
+    def __init__(self, file, job):
+        self._file = file
+        self._job = job
+
+    def read(self, size=-1):
+        data = self._file.read(size)
+        self._job.bytes_read += len(data)
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+class IngestionJob:
+    """
+    Handle of an upload being parsed and loaded into DuckDB in the background.
+
+    The stage, bytes read and rows loaded are updated by the worker as it goes
+    and can be polled from the Streamlit script with progress(). Once done,
+    converted lists the columns converted to native types and unparsed counts,
+    per column, the values loaded as nulls because they did not parse.
+    """
+
+    def __init__(self, file_name, total_bytes, options):
+        self.file_name = file_name
+        self.total_bytes = total_bytes
+        self.options = options
+        self.stage = "queued"
+        self.bytes_read = 0
+        self.rows_loaded = 0
+        self.converted = []
+        self.unparsed = {}
+        self.appended = None
+        self.future = None
+        self._cancelled = threading.Event()
+
+    def progress(self):
+        """
+        Get a snapshot of the job's progress.
+
+        Returns:
+            dict: {"stage", "bytes_read", "total_bytes", "rows_loaded", "fraction"}
+        """
+        return {
+            "stage": self.stage,
+            "bytes_read": self.bytes_read,
+            "total_bytes": self.total_bytes,
+            "rows_loaded": self.rows_loaded,
+            "fraction": min(self.bytes_read / self.total_bytes, 1.0) if self.total_bytes else 0.0
+        }
+
+    def done(self):
+        """
+        Check whether the job has finished (successfully or not).
+
+        Returns:
+            bool: True if the job is no longer running
+        """
+        return self.future is not None and self.future.done()
+
+    def result(self):
+        """
+        Get the loaded dataset; raises the job's exception if it failed.
+
+        Returns:
+            tuple: (db_connection, table_name, schema, profile_job)
+        """
+        return self.future.result()
+
+    def cancel(self):
+        """
+        Ask the job to stop; it closes its connection at the next chunk boundary.
+        """
+        self._cancelled.set()
+
+    def check_cancelled(self):
+        """
+        Raise IngestionCancelled if the job was cancelled.
+        """
+        if self._cancelled.is_set():
+            raise IngestionCancelled(f"Ingestion of {self.file_name} was cancelled")
+
+@contextmanager
+def _open_mapped(file_path):
+    """
+    Open a spooled upload as a read-only memory map.
+
+    Parsers read the file through the page cache, so its contents are not
+    held in the process's memory a second time.
+
+    Args:
+        file_path: The path of the spooled upload
+
+    Yields:
+        The memory map (or the plain file, as an empty file cannot be mapped)
+    """
+    with open(file_path, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            yield file
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
+
+def _ingest_csv(job, file_path, db_connection, delimiter):
+    """
+    Stream a CSV file into DuckDB chunk by chunk.
+
+    The schema and type conversions are inferred from the first chunk, which
+    is loaded right away; later chunks are converted the same way and
+    appended while the rest of the file is still being read. Columns whose
+    values stop fitting their type in a later chunk are widened (integers to
+    DOUBLE, anything to VARCHAR) rather than forced into it, and numeric
+    columns are narrowed again once the whole file is in.
+
+    Args:
+        job: The ingestion job to report progress to
+        file_path: The path of the spooled upload
+        db_connection: The DuckDB connection to load into
+        delimiter: The CSV delimiter
+
+    Returns:
+        tuple: (table_name, schema)
+    """
+    with _open_mapped(file_path) as file:
+        return _load_csv_chunks(job, file, db_connection, delimiter)
+
+def _load_csv_chunks(job, file, db_connection, delimiter):
+    """
+    Parse a CSV file object in chunks and load them into DuckDB, see _ingest_csv.
+
+    Args:
+        job: The ingestion job to report progress to
+        file: The file object
+        db_connection: The DuckDB connection to load into
+        delimiter: The CSV delimiter
+
+    Returns:
+        tuple: (table_name, schema)
+    """
+    table_name = None
+    schema = None
+    plan = None
+    column_types = None
+    chunks = pd.read_csv(_CountingReader(file, job), sep=delimiter, chunksize=INGEST_CHUNK_ROWS)
+    while True:
+        job.stage = "parsing"
+        with span("upload_parse", file_type="csv") as parse_span:
+            chunk = next(chunks, None)
+            parse_span["rows"] = 0 if chunk is None else len(chunk)
+        if chunk is None:
+            break
+        job.check_cancelled()
+
+        if table_name is None:
+            job.stage = "inferring schema"
+            with span("infer_schema"):
+                schema = infer_schema(chunk)
+            with span("coerce_types") as coerce_span:
+                # Widths are settled once the whole file is in (narrow_numeric_columns), so only parse types here
+                plan = {column: step for column, step in plan_coercions(chunk, schema).items() if step["kind"] != "narrow"}
+                coerced, schema, job.converted = apply_coercions(chunk, schema, plan)
+                _count_unparsed(job, chunk, coerced, job.converted)
+                chunk = coerced
+                plan = {column: plan[column] for column in job.converted}
+                coerce_span["converted"] = len(job.converted)
+            job.stage = "loading"
+            with span("load_data_to_db", rows=len(chunk)):
+                table_name = load_data_to_db(db_connection, chunk, job.file_name)
+                widen_numeric_columns(db_connection, table_name)
+            column_types = {column['name']: column['type'] for column in get_table_info(db_connection, table_name)['columns']}
+        else:
+            with span("coerce_types") as coerce_span:
+                coerced, lost, drifted = coerce_chunk(chunk, plan)
+                for column in drifted:
+                    # The values no longer fit the conversion planned on the first chunk: keep the column as text
+                    logger.warning("%s of %s no longer parses after row %d; loading it as text", column, job.file_name, job.rows_loaded)
+                    del plan[column]
+                    job.converted.remove(column)
+                    schema[column] = "TEXT"
+                for column, count in lost.items():
+                    job.unparsed[column] = job.unparsed.get(column, 0) + count
+                chunk = _fit_chunk(db_connection, table_name, coerced, column_types, schema)
+                coerce_span["drifted"] = len(drifted)
+            job.stage = "loading"
+            with span("load_data_to_db", rows=len(chunk)):
+                append_data_to_db(db_connection, table_name, chunk)
+        job.rows_loaded += len(chunk)
+
+    if table_name is None:
+        raise ValueError(f"{job.file_name} contains no data")
+
+    job.stage = "narrowing types"
+    with span("narrow_types") as narrow_span:
+        narrow_span["columns"] = len(narrow_numeric_columns(db_connection, table_name))
+
+    categorical = [column for column, col_type in schema.items() if col_type == "CATEGORICAL"]
+    if categorical:
+        job.stage = "encoding categories"
+        with span("encode_categories", columns=len(categorical)):
+            encode_enum_columns(db_connection, table_name, categorical)
+    return table_name, schema
+
+def _count_unparsed(job, parsed, coerced, columns):
+    """
+    Record the values of converted columns that did not parse and were loaded as nulls.
+
+    Args:
+        job: The ingestion job
+        parsed: The DataFrame as parsed from the file
+        coerced: The DataFrame after conversion
+        columns: The converted columns
+    """
+    for column in columns:
+        count = int(coerced[column].isna().sum() - parsed[column].isna().sum())
+        if count:
+            job.unparsed[column] = job.unparsed.get(column, 0) + count
+
+def _value_kind(series):
+    """
+    Classify the values of a parsed column.
+
+    Args:
+        series: The column
+
+    Returns:
+        str: "integer", "float", "boolean", "datetime" or "text"
+    """
+    dtype = series.dtype
+    if pd.api.types.is_bool_dtype(dtype):
+        return "boolean"
+    if pd.api.types.is_integer_dtype(dtype):
+        return "integer"
+    if pd.api.types.is_float_dtype(dtype):
+        return "float"
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return "datetime"
+    inferred = pd.api.types.infer_dtype(series, skipna=True)
+    return {
+        "boolean": "boolean", "integer": "integer", "floating": "float", "mixed-integer-float": "float",
+        "datetime64": "datetime", "datetime": "datetime"
+    }.get(inferred, "text")
+
+def _type_kind(db_type):
+    """
+    Classify a DuckDB column type like _value_kind classifies values.
+
+    Args:
+        db_type: The DuckDB type name
+
+    Returns:
+        str: "integer", "float", "boolean", "datetime" or "text"
+    """
+    if db_type in ("TINYINT", "SMALLINT", "INTEGER", "BIGINT", "HUGEINT"):
+        return "integer"
+    if db_type in ("FLOAT", "DOUBLE") or db_type.startswith("DECIMAL"):
+        return "float"
+    if db_type == "BOOLEAN":
+        return "boolean"
+    if db_type.startswith("TIMESTAMP") or db_type == "DATE":
+        return "datetime"
+    return "text"
+
+def _fit_chunk(db_connection, table_name, chunk, column_types, schema):
+    """
+    Make a later chunk fit the table, widening columns its values do not fit.
+
+    Integer columns whose chunk has blanks stay integers; ones receiving
+    fractions become DOUBLE, and columns receiving values of another kind
+    (e.g. "unknown" in a numeric column) become VARCHAR, so no value is
+    rounded, nulled or rejected.
+
+    Args:
+        db_connection: The DuckDB connection
+        table_name: The table being loaded
+        chunk: The coerced chunk
+        column_types: {column: DuckDB type} of the table, updated when a column is widened
+        schema: The inferred schema, updated when a column is widened
+
+    Returns:
+        pandas.DataFrame: The chunk, ready to append
+    """
+    chunk = chunk.copy(deep=False)
+    for column in chunk.columns:
+        series = chunk[column]
+        if series.isna().all():
+            continue
+        kind = _value_kind(series)
+        table_kind = _type_kind(column_types[column])
+        if table_kind == "text" or kind == table_kind or (table_kind == "float" and kind == "integer"):
+            continue
+        if table_kind == "integer" and kind == "float":
+            if (series.dropna() % 1 == 0).all():
+                # An integer column with blanks in this chunk
+                chunk[column] = series.astype("Int64")
+                continue
+            new_type, schema_type = "DOUBLE", "FLOAT"
+        else:
+            new_type, schema_type = "VARCHAR", "TEXT"
+        logger.info("Widening %s of %s from %s to %s", column, table_name, column_types[column], new_type)
+        alter_column_type(db_connection, table_name, column, new_type)
+        column_types[column] = new_type
+        schema[column] = schema_type
+    return chunk
+
+def _ingest_excel(job, file_path, db_connection, sheet_name):
+    """
+    Load an Excel sheet into DuckDB.
+
+    Args:
+        job: The ingestion job to report progress to
+        file_path: The path of the spooled upload
+        db_connection: The DuckDB connection to load into
+        sheet_name: The sheet to load
+
+    Returns:
+        tuple: (table_name, schema)
+    """
+    job.stage = "parsing"
+    with span("upload_parse", file_type="excel") as parse_span, open(file_path, "rb") as file:
+        df = pd.read_excel(_CountingReader(file, job), sheet_name=sheet_name)
+        parse_span["rows"] = len(df)
+    job.check_cancelled()
+
+    job.stage = "inferring schema"
+    with span("infer_schema"):
+        schema = infer_schema(df)
+    with span("coerce_types") as coerce_span:
+        coerced, schema, job.converted = apply_coercions(df, schema, plan_coercions(df, schema))
+        _count_unparsed(job, df, coerced, job.converted)
+        df = coerced
+        coerce_span["converted"] = len(job.converted)
+
+    job.stage = "loading"
+    with span("load_data_to_db", rows=len(df)):
+        table_name = load_data_to_db(db_connection, df, job.file_name, schema)
+    job.rows_loaded = len(df)
+    return table_name, schema
+
+def _spool_csv_files(files, spool_dir):
+    """
+    Gather uploaded CSV files under their original names, extracting the CSV
+    files of zip archives.
+
+    Args:
+        files: List of (file name, spooled file path) tuples
+        spool_dir: The directory to gather them in
+
+    Returns:
+        list: The paths of the CSV files
+    """
+    paths = []
+
+    def target_path(name):
+        # One directory per file, so files with the same name do not collide
+        file_dir = os.path.join(spool_dir, str(len(paths)))
+        os.makedirs(file_dir)
+        return os.path.join(file_dir, Path(name).name)
+
+    for name, file_path in files:
+        if Path(name).suffix.lower() == ".zip":
+            with zipfile.ZipFile(file_path) as archive:
+                for member in archive.infolist():
+                    member_name = Path(member.filename)
+                    if member.is_dir() or member_name.suffix.lower() != ".csv" or member_name.name.startswith("."):
+                        continue
+                    path = target_path(member.filename)
+                    with archive.open(member) as source, open(path, "wb") as target:
+                        shutil.copyfileobj(source, target)
+                    paths.append(path)
+        elif Path(name).suffix.lower() == ".csv":
+            # The file names are kept as the source_file column, so the spooled file is moved, not copied
+            path = target_path(name)
+            shutil.move(file_path, path)
+            paths.append(path)
+        else:
+            raise ValueError(f"Only CSV files and zip archives of CSV files can be combined: {name}")
+    return paths
+
+def _combined_table_name(file_names):
+    """
+    Pick the name to generate the table name of several combined files from.
+
+    Args:
+        file_names: The uploaded file names
+
+    Returns:
+        str: The name of a single archive, or the common prefix of the file names
+    """
+    if len(file_names) == 1:
+        return file_names[0]
+    stems = [Path(name).stem for name in file_names]
+    prefix = os.path.commonprefix(stems)
+    if prefix not in stems:
+        # Drop a partial trailing token, e.g. sales_2024_01_0 -> sales_2024_01
+        prefix = re.sub(r'[^_\-. ]*$', '', prefix)
+    return prefix.rstrip("_- .") or "combined"
+
+def _ingest_csv_files(job, files, db_connection, delimiter):
+    """
+    Load several CSV files (or zip archives of CSV files) into one DuckDB table.
+
+    The files are read by DuckDB in parallel, so load time scales with the
+    available cores. The schema is inferred from a sample of the loaded rows.
+
+    Args:
+        job: The ingestion job to report progress to
+        files: List of (file name, spooled file path) tuples
+        db_connection: The DuckDB connection to load into
+        delimiter: The CSV delimiter
+
+    Returns:
+        tuple: (table_name, schema)
+    """
+    with tempfile.TemporaryDirectory(prefix="ingestion_") as spool_dir:
+        job.stage = "unpacking"
+        paths = _spool_csv_files(files, spool_dir)
+        if not paths:
+            raise ValueError(f"{job.file_name} contains no CSV files")
+        job.check_cancelled()
+
+        job.stage = f"parsing {len(paths)} files"
+        with span("upload_parse", file_type="csv", files=len(paths)) as parse_span:
+            table_name = load_csv_files_to_db(
+                db_connection, paths, _combined_table_name([name for name, _ in files]), delimiter
+            )
+            job.rows_loaded = db_connection.execute(f"SELECT COUNT(*) FROM {quote_identifier(table_name)}").fetchone()[0]
+            parse_span["rows"] = job.rows_loaded
+    job.check_cancelled()
+
+    # DuckDB has already typed numbers and dates; the sample settles what is categorical
+    job.stage = "inferring schema"
+    with span("infer_schema"):
+        sample = db_connection.execute(
+            f"SELECT * FROM {quote_identifier(table_name)} USING SAMPLE {INGEST_SCHEMA_SAMPLE_ROWS} ROWS"
+        ).fetchdf()
+        schema = infer_schema(sample)
+
+    categorical = [column for column, col_type in schema.items() if col_type == "CATEGORICAL"]
+    if categorical:
+        job.stage = "encoding categories"
+        with span("encode_categories", columns=len(categorical)):
+            encode_enum_columns(db_connection, table_name, categorical)
+    return table_name, schema
+
+def _append_upload(job, db_connection, table_name, schema, append_to):
+    """
+    Append a loaded upload to an existing table and update what is derived from it.
+
+    Args:
+        job: The ingestion job
+        db_connection: The connection the upload was loaded into
+        table_name: The table the upload was loaded into
+        schema: The inferred schema of the upload
+        append_to: See start_ingestion
+
+    Returns:
+        tuple: (db_connection, table_name, schema, profile_job) of the grown table
+    """
+    target = append_to["connection"]
+    target_table = append_to["table_name"]
+    job.stage = "appending"
+    cursor = target.cursor()
+    try:
+        job.appended = append_table(
+            cursor, target_table, append_to["schema"], db_connection, table_name, schema, append_to.get("key_column")
+        )
+    finally:
+        cursor.close()
+    close_connection(db_connection)
+    merged_schema = job.appended["schema"]
+    delta_table = job.appended["delta_table"]
+
+    try:
+        # Fold the new rows into rollups, samples, cached results and the profile
+        job.stage = "updating statistics"
+        for derived in append_to.get("derived", ()):
+            if derived is not None:
+                derived.apply_append(target_table, delta_table)
+        profile_job = start_profile_job(target, target_table, merged_schema, append_to.get("profile"), delta_table)
+        # The delta table is dropped below, so the profile has to be merged first
+        profile_job.exception()
+    finally:
+        drop_delta(target)
+    return target, target_table, merged_schema, profile_job
+
+def _run_ingestion(job, ingest, upload, option, append_to=None, spooled=()):
+    """
+    Ingest an upload into a new DuckDB connection (runs on the background executor).
+
+    Args:
+        job: The ingestion job
+        ingest: The function that loads the upload, called as
+                ingest(job, upload, db_connection, option) -> (table_name, schema)
+        upload: The spooled file path, or the list of files to combine
+        option: The read option passed on to ingest (delimiter or sheet name)
+        append_to: Optional table to append the upload to instead, see start_ingestion
+        spooled: The temp files of the upload, removed when the job ends
+
+    Returns:
+        tuple: (db_connection, table_name, schema, profile_job)
+    """
+    upload_trace = start_trace("upload", file_name=job.file_name, append=append_to is not None)
+    db_connection = init_db_connection()
+    try:
+        table_name, schema = ingest(job, upload, db_connection, option)
+        job.check_cancelled()
+
+        if append_to is not None:
+            result = _append_upload(job, db_connection, table_name, schema, append_to)
+            job.stage = "done"
+            job.bytes_read = job.total_bytes
+            return result
+
+        # Profile the whole table in the background
+        profile_job = start_profile_job(db_connection, table_name, schema)
+        job.stage = "done"
+        job.bytes_read = job.total_bytes
+        return db_connection, table_name, schema, profile_job
+    except Exception as e:
+        job.stage = "failed"
+        if not isinstance(e, IngestionCancelled):
+            logger.error("Error ingesting %s: %s", job.file_name, e)
+        close_connection(db_connection)
+        raise
+    finally:
+        for path in spooled:
+            clean_up_file(path)
+        finish_trace(upload_trace)
+
+def start_ingestion(file_path, file_name, append_to=None, **options):
+    """
+    Start parsing and loading an upload into a new DuckDB connection in the background.
+
+    Args:
+        file_path: The upload saved to a temp file by save_uploaded_file; the job removes it
+        file_name: The original file name, used for the table name and file type
+        append_to: Optional dict describing a loaded table to append the upload's
+                   rows to instead: {"connection", "table_name", "schema", "profile",
+                   "key_column", "derived"}. profile (the table's current profile)
+                   and key_column may be None; derived lists the RollupManager,
+                   SampleManager and ResultCache to update
+        **options: delimiter (CSV) or sheet_name (Excel)
+
+    Returns:
+        IngestionJob: The job handle
+    """
+    job = IngestionJob(file_name, os.path.getsize(file_path), options)
+    if Path(file_name).suffix.lower() == ".csv":
+        job.future = _executor.submit(
+            _run_ingestion, job, _ingest_csv, file_path, options.get("delimiter", ","), append_to, [file_path]
+        )
+    else:
+        job.future = _executor.submit(
+            _run_ingestion, job, _ingest_excel, file_path, options.get("sheet_name", 0), append_to, [file_path]
+        )
+    return job
+
+def start_multi_ingestion(files, name, delimiter=",", append_to=None):
+    """
+    Start loading several CSV files, or zip archives of CSV files, into one table in the background.
+
+    Args:
+        files: List of (file name, spooled file path) tuples, see start_ingestion; the job removes the files
+        name: The name the job reports as its file name
+        delimiter: The CSV delimiter
+        append_to: Optional loaded table to append the rows to instead, see start_ingestion
+
+    Returns:
+        IngestionJob: The job handle
+    """
+    job = IngestionJob(name, sum(os.path.getsize(path) for _, path in files), {"delimiter": delimiter})
+    job.future = _executor.submit(
+        _run_ingestion, job, _ingest_csv_files, files, delimiter, append_to, [path for _, path in files]
+    )
+    return job
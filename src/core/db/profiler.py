@@ -0,0 +1,281 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Import custom modules
+from core.db.duckdb_manager import quote_identifier
+from core.db.value_index import build_value_index, merge_value_indexes
+from utils.config import PROFILE_TOP_K, PROFILE_HISTOGRAM_BINS, BACKGROUND_WORKERS
+from utils.telemetry import span
+
+logger = logging.getLogger(__name__)
+
+NUMERIC_TYPES = ("INTEGER", "FLOAT")
+TOP_K_TYPES = ("CATEGORICAL", "BOOLEAN")
+
+# Profiling runs off the Streamlit script thread so the first render is not blocked
+_executor = ThreadPoolExecutor(max_workers=BACKGROUND_WORKERS, thread_name_prefix="profiler")
+
+def profile_table(connection, table_name, schema):
+    """
+    Profile every column of a table in DuckDB.
+
+    Counts, null rates, distinct estimates, min/max and equi-depth histogram
+    boundaries are computed in a single pass; top values are computed with one
+    GROUP BY per categorical or boolean column. The distinct values of
+    categorical columns are indexed for resolving values named in questions.
+
+    Args:
+        connection: The DuckDB connection
+        table_name: The name of the table to profile
+        schema: The inferred schema (dict mapping column names to types)
+
+    Returns:
+        dict: {"table": str, "row_count": int, "columns": {column: column_profile},
+               "value_index": ValueIndex}
+    """
+    quantiles = [i / PROFILE_HISTOGRAM_BINS for i in range(PROFILE_HISTOGRAM_BINS + 1)]
+    quantile_list = ", ".join(str(q) for q in quantiles)
+
+    select_items = ["count(*)"]
+    for col, col_type in schema.items():
+        quoted = quote_identifier(col)
+        select_items.extend([
+            f"count({quoted})",
+            f"approx_count_distinct({quoted})",
+            f"min({quoted})",
+            f"max({quoted})"
+        ])
+        if col_type in NUMERIC_TYPES:
+            select_items.append(f"approx_quantile({quoted}, [{quantile_list}])")
+
+    row = connection.execute(
+        f"SELECT {', '.join(select_items)} FROM {quote_identifier(table_name)}"
+    ).fetchone()
+
+    row_count = row[0]
+    columns = {}
+    position = 1
+    for col, col_type in schema.items():
+        non_null, approx_distinct, min_value, max_value = row[position:position + 4]
+        position += 4
+
+        histogram = None
+        if col_type in NUMERIC_TYPES:
+            histogram = row[position]
+            position += 1
+
+        columns[col] = {
+            "type": col_type,
+            "null_rate": (1 - non_null / row_count) if row_count else 0.0,
+            "approx_distinct": approx_distinct,
+            "min": min_value,
+            "max": max_value,
+            "histogram": histogram,
+            "top_values": _top_values(connection, table_name, col) if col_type in TOP_K_TYPES else None
+        }
+
+    return {
+        "table": table_name,
+        "row_count": row_count,
+        "columns": columns,
+        "value_index": build_value_index(connection, table_name, schema)
+    }
+
+def _top_values(connection, table_name, column):
+    """
+    Get the most frequent values of a column.
+
+    Args:
+        connection: The DuckDB connection
+        table_name: The name of the table
+        column: The column to count values for
+
+    Returns:
+        list: (value, count) tuples, most frequent first
+    """
+    quoted = quote_identifier(column)
+    return connection.execute(f"""
+        SELECT {quoted}, count(*) AS value_count
+        FROM {quote_identifier(table_name)}
+        WHERE {quoted} IS NOT NULL
+        GROUP BY {quoted}
+        ORDER BY value_count DESC
+        LIMIT {int(PROFILE_TOP_K)}
+    """).fetchall()
+
+def _merge_histograms(histogram, weight, other, other_weight):
+    """
+    Combine the equi-depth histogram boundaries of two sets of rows.
+
+    Each histogram is read as a piecewise-linear distribution function; the
+    boundaries of their weighted mixture are interpolated back out.
+
+    Args:
+        histogram: Quantile boundaries of the first set
+        weight: Non-null rows of the first set
+        other: Quantile boundaries of the second set
+        other_weight: Non-null rows of the second set
+
+    Returns:
+        list: The combined quantile boundaries
+    """
+    if not other or not other_weight:
+        return histogram
+    if not histogram or not weight:
+        return other
+    quantiles = np.linspace(0, 1, len(histogram))
+    points = np.array(sorted(set(histogram) | set(other)), dtype=float)
+    mixture = (
+        weight * np.interp(points, np.array(histogram, dtype=float), quantiles)
+        + other_weight * np.interp(points, np.array(other, dtype=float), np.linspace(0, 1, len(other)))
+    ) / (weight + other_weight)
+    return [float(value) for value in np.interp(quantiles, mixture, points)]
+
+def _merge_top_values(top_values, other):
+    """
+    Combine the most frequent values of two sets of rows.
+
+    Counts of values outside either list are unknown, so the result is exact
+    for values frequent in both sets and an estimate otherwise.
+
+    Args:
+        top_values: (value, count) tuples of the first set
+        other: (value, count) tuples of the second set
+
+    Returns:
+        list: (value, count) tuples, most frequent first
+    """
+    counts = {}
+    for value, count in list(top_values or []) + list(other or []):
+        counts[value] = counts.get(value, 0) + count
+    return sorted(counts.items(), key=lambda item: item[1], reverse=True)[:PROFILE_TOP_K]
+
+def merge_profiles(profile, delta_profile, schema):
+    """
+    Combine the profile of a table with the profile of rows appended to it.
+
+    Row counts, null rates, minimums and maximums are exact. Distinct counts of
+    indexed categorical columns are exact; others are capped estimates, as are
+    the merged histograms and top values.
+
+    Args:
+        profile: The table's profile before the append
+        delta_profile: The profile of the appended rows
+        schema: The table's (merged) inferred schema
+
+    Returns:
+        dict: The profile of the grown table
+    """
+    row_count = profile["row_count"] + delta_profile["row_count"]
+    value_index = merge_value_indexes(profile["value_index"], delta_profile["value_index"])
+    columns = {}
+    for col, col_type in schema.items():
+        old, new = profile["columns"][col], delta_profile["columns"][col]
+        old_non_null = (1 - old["null_rate"]) * profile["row_count"]
+        new_non_null = (1 - new["null_rate"]) * delta_profile["row_count"]
+        if col in value_index.columns:
+            approx_distinct = len(value_index.columns[col])
+        else:
+            approx_distinct = min(old["approx_distinct"] + new["approx_distinct"], row_count)
+        lower = [value for value in (old["min"], new["min"]) if value is not None]
+        upper = [value for value in (old["max"], new["max"]) if value is not None]
+        columns[col] = {
+            "type": col_type,
+            "null_rate": (1 - (old_non_null + new_non_null) / row_count) if row_count else 0.0,
+            "approx_distinct": approx_distinct,
+            "min": min(lower) if lower else None,
+            "max": max(upper) if upper else None,
+            "histogram": _merge_histograms(old["histogram"], old_non_null, new["histogram"], new_non_null)
+                         if col_type in NUMERIC_TYPES else None,
+            "top_values": _merge_top_values(old["top_values"], new["top_values"]) if col_type in TOP_K_TYPES else None
+        }
+    return {"table": profile["table"], "row_count": row_count, "columns": columns, "value_index": value_index}
+
+def start_profile_job(connection, table_name, schema, previous=None, delta_table=None):
+    """
+    Start profiling a freshly loaded table in the background.
+
+    The job runs on its own cursor so the session's connection stays free for queries.
+    After an append, only the appended rows are profiled and merged into the
+    table's previous profile.
+
+    Args:
+        connection: The DuckDB connection holding the table
+        table_name: The name of the table to profile
+        schema: The inferred schema (dict mapping column names to types)
+        previous: Optional profile of the table before rows were appended
+        delta_table: Optional table holding just the appended rows, used with previous
+
+    Returns:
+        concurrent.futures.Future: Resolves to the table profile
+    """
+    cursor = connection.cursor()
+
+    def run():
+        try:
+            if previous is not None and delta_table is not None:
+                with span("profile_append", table=table_name):
+                    return merge_profiles(previous, profile_table(cursor, delta_table, schema), schema)
+            with span("profile_table", table=table_name):
+                return profile_table(cursor, table_name, schema)
+        except Exception as e:
+            # Logged once here; readers of the job only see that it failed
+            logger.error("Table profiling failed: %s", e)
+            raise
+        finally:
+            cursor.close()
+
+    return _executor.submit(run)
+
+def get_profile(profile_job):
+    """
+    Get the result of a profiling job without blocking.
+
+    Args:
+        profile_job: The Future returned by start_profile_job, or None
+
+    Returns:
+        dict: The table profile, or None if the job is missing, running or failed
+    """
+    if profile_job is None or not profile_job.done() or profile_job.cancelled():
+        return None
+    if profile_job.exception() is not None:
+        return None
+    return profile_job.result()
+
+def get_profile_error(profile_job):
+    """
+    Get the error of a failed profiling job without blocking.
+
+    Args:
+        profile_job: The Future returned by start_profile_job, or None
+
+    Returns:
+        Exception: The error the job failed with, or None if it is missing, running or succeeded
+    """
+    if profile_job is None or not profile_job.done() or profile_job.cancelled():
+        return None
+    return profile_job.exception()
+
+def describe_column(column_profile):
+    """
+    Build a one-line description of a column profile, for use in LLM prompts.
+
+    Args:
+        column_profile: A single column entry from a table profile
+
+    Returns:
+        str: A short description such as "range 1 to 100, 5% null"
+    """
+    parts = []
+    if column_profile["top_values"]:
+        values = ", ".join(repr(str(value)) for value, _ in column_profile["top_values"])
+        parts.append(f"values: {values}")
+    elif column_profile["min"] is not None:
+        parts.append(f"range {column_profile['min']} to {column_profile['max']}")
+    parts.append(f"~{column_profile['approx_distinct']} distinct")
+    if column_profile["null_rate"] > 0:
+        parts.append(f"{column_profile['null_rate']:.0%} null")
+    return ", ".join(parts)
@@ -1,5 +1,16 @@
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 import re
+import logging
+
+# Import custom modules
+from core.db.query_profiler import execute_with_profiling
+from core.db.approximate import split_margins, reliable
+from utils.config import STREAM_BATCH_ROWS
+from utils.telemetry import span, increment
+
+logger = logging.getLogger(__name__)
 
 def sanitize_sql(sql_query):
     """
@@ -36,13 +47,14 @@ def sanitize_sql(sql_query):
     
     return sanitized
 
-def validate_query(sql_query, table_name):
+def validate_query(sql_query, table_name, other_tables=()):
     """
     Validate that a SQL query is only accessing the specified table.
     
     Args:
         sql_query: The SQL query to validate
         table_name: The name of the allowed table
+        other_tables: Names of further tables the query may read, e.g. cached results
         
     Returns:
         bool: True if the query is valid
@@ -55,12 +67,12 @@ def validate_query(sql_query, table_name):
     tables.extend(re.findall(r'JOIN\s+([a-zA-Z0-9_]+)', sql_query, re.IGNORECASE))
     
     for table in tables:
-        if table.strip() != table_name:
+        if table.strip() != table_name and table.strip() not in other_tables:
             raise ValueError(f"Query contains unauthorized table: {table}")
     
     return True
 
-def execute_query(connection, sql_query, table_name=None):
+def execute_query(connection, sql_query, table_name=None, profile=False, rollups=None, sampler=None, results=None):
     """
     Execute a SQL query against the DuckDB connection.
     
@@ -68,22 +80,229 @@ def execute_query(connection, sql_query, table_name=None):
         connection: The DuckDB connection
         sql_query: The SQL query to execute
         table_name: Optional. If provided, validates the query only accesses this table
+        profile: If True, run with DuckDB profiling and attach the operator profile
+                 to the result as result.attrs["query_profile"]
+        rollups: Optional RollupManager. Eligible aggregate queries are answered from
+                 its materialized rollups (named in result.attrs["rollup"]), and
+                 the others are recorded so frequent patterns get a rollup
+        sampler: Optional SampleManager. Aggregate queries no rollup answers are
+                 estimated from the table's sample, with the confidence margins
+                 in result.attrs["approximate"]
+        results: Optional ResultCache. The query may read its cached results
+                 (named in result.attrs["cached_results"]); such queries are run
+                 as written, without rollups or sampling
         
     Returns:
         pandas.DataFrame: The query results as a DataFrame
     """
-    # Sanitize the query
-    sanitized_query = sanitize_sql(sql_query)
+    with span("sql_validation"):
+        # Sanitize the query
+        sanitized_query = sanitize_sql(sql_query)
+        
+        # Validate the query if table_name is provided
+        if table_name:
+            validate_query(sanitized_query, table_name, results.table_names() if results is not None else ())
+    
+    # Follow-up queries over a cached result are already small
+    cached_results = results.referenced_tables(sanitized_query) if results is not None else []
+    if cached_results:
+        rollups = None
+        sampler = None
     
-    # Validate the query if table_name is provided
-    if table_name:
-        validate_query(sanitized_query, table_name)
+    # Answer the query from a precomputed rollup if one covers it
+    rollup = None
+    if rollups is not None:
+        with span("rollup_rewrite") as attrs:
+            rollup = rollups.rewrite(sanitized_query)
+            attrs["rollup"] = rollup["rollup"] if rollup else None
+    
+    # Otherwise estimate it from the table's sample, if approximate answers were requested
+    approximation = None
+    if sampler is not None and not rollup:
+        with span("approximate_rewrite") as attrs:
+            approximation = sampler.rewrite(sanitized_query)
+            attrs["approximate"] = approximation is not None
+    
+    executed_query = (rollup or approximation or {}).get("sql", sanitized_query)
     
     # Execute the query
     try:
-        result = connection.execute(sanitized_query).fetchdf()
+        if profile:
+            with span("sql_execute", profiled=True):
+                result, query_profile = execute_with_profiling(connection, executed_query)
+            result.attrs["query_profile"] = query_profile
+        else:
+            with span("sql_execute"):
+                pending = connection.execute(executed_query)
+            with span("sql_fetch"):
+                result = pending.fetchdf()
+        
+        if rollup:
+            # Keep the column names the original query would have produced
+            result.columns = rollup["columns"]
+            result.attrs["rollup"] = rollup["rollup"]
+        else:
+            if approximation:
+                result.columns = approximation["columns"]
+                estimate = split_margins(result, approximation)
+                if not reliable(estimate):
+                    # Too few sampled rows match (or none): answer exactly rather than guess
+                    logger.info("Approximate answer rests on %d sampled rows; running exactly", estimate["min_sampled_rows"])
+                    increment("approximate_fallbacks_total")
+                    return execute_query(connection, sql_query, table_name, profile, rollups, None, results)
+                result.attrs["approximate"] = estimate
+            if rollups is not None:
+                rollups.record_query(sanitized_query)
+        
+        if cached_results:
+            result.attrs["cached_results"] = cached_results
+        
+        # Describe the result once so downstream consumers need not rescan it
+        result.attrs["result_metadata"] = compute_result_metadata(result)
         return result
     except Exception as e:
         # Log the error and re-raise
-        print(f"Error executing query: {str(e)}")
-        raise 
\ No newline at end of file
+        logger.error("Error executing query: %s", e)
+        raise 
+
+def stream_query(connection, sql_query, table_name=None, batch_rows=STREAM_BATCH_ROWS, results=None):
+    """
+    Execute a SQL query and stream its results as Arrow record batches.
+    
+    Rows are produced as DuckDB computes them, so the first batch of a large
+    result arrives long before the last. Rollups, sampling and profiling are
+    not applied to streamed queries.
+    
+    Args:
+        connection: The DuckDB connection
+        sql_query: The SQL query to execute
+        table_name: Optional. If provided, validates the query only accesses this table
+        batch_rows: The maximum number of rows per record batch
+        results: Optional ResultCache whose cached results the query may read
+        
+    Returns:
+        pyarrow.RecordBatchReader: The result batches
+    """
+    with span("sql_validation"):
+        sanitized_query = sanitize_sql(sql_query)
+        if table_name:
+            validate_query(sanitized_query, table_name, results.table_names() if results is not None else ())
+    if results is not None:
+        results.referenced_tables(sanitized_query)
+    
+    try:
+        with span("sql_execute", streamed=True):
+            return connection.execute(sanitized_query).to_arrow_reader(batch_rows)
+    except Exception as e:
+        logger.error("Error executing query: %s", e)
+        raise
+
+def batches_to_dataframe(batches, schema):
+    """
+    Combine streamed record batches into a query result DataFrame.
+    
+    Args:
+        batches: The record batches received so far
+        schema: The pyarrow schema of the result
+        
+    Returns:
+        pandas.DataFrame: The rows of all batches, with result metadata attached
+    """
+    result = pa.Table.from_batches(batches, schema=schema).to_pandas(date_as_object=False)
+    result.attrs["result_metadata"] = compute_result_metadata(result)
+    return result
+
+def update_running_totals(totals, batch):
+    """
+    Fold a record batch into running aggregates of its numeric columns.
+    
+    Args:
+        totals: Dict of {column: {"sum", "min", "max", "count"}}, updated in place
+        batch: The pyarrow RecordBatch
+        
+    Returns:
+        dict: The updated totals
+    """
+    for name, column in zip(batch.schema.names, batch.columns):
+        if not (pa.types.is_integer(column.type) or pa.types.is_floating(column.type) or pa.types.is_decimal(column.type)):
+            continue
+        extremes = pc.min_max(column)
+        batch_totals = {
+            "sum": pc.sum(column).as_py(),
+            "min": extremes["min"].as_py(),
+            "max": extremes["max"].as_py(),
+            "count": len(column) - column.null_count
+        }
+        if name not in totals:
+            totals[name] = batch_totals
+            continue
+        current = totals[name]
+        for key, combine in (("sum", lambda a, b: a + b), ("min", min), ("max", max)):
+            if batch_totals[key] is not None:
+                current[key] = batch_totals[key] if current[key] is None else combine(current[key], batch_totals[key])
+        current["count"] += batch_totals["count"]
+    return totals
+
+def column_role(dtype):
+    """
+    Classify a column by its dtype.
+    
+    Args:
+        dtype: The pandas dtype of the column
+        
+    Returns:
+        str: One of "numeric", "datetime", "boolean" or "categorical"
+    """
+    if pd.api.types.is_bool_dtype(dtype):
+        return "boolean"
+    if pd.api.types.is_numeric_dtype(dtype):
+        return "numeric"
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return "datetime"
+    return "categorical"
+
+def compute_result_metadata(df):
+    """
+    Compute metadata describing a query result.
+    
+    Args:
+        df: The pandas DataFrame with query results
+        
+    Returns:
+        dict: {"row_count": int, "columns": {column: {"role", "cardinality", "monotonic", "sum"}}}
+    """
+    columns = {}
+    for col in df.columns:
+        series = df[col]
+        role = column_role(series.dtype)
+        
+        try:
+            cardinality = int(series.nunique())
+        except TypeError:
+            # Unhashable cell values (lists, dicts)
+            cardinality = None
+        
+        columns[col] = {
+            "role": role,
+            "cardinality": cardinality,
+            "monotonic": bool(series.is_monotonic_increasing) if role in ("numeric", "datetime") else False,
+            "sum": float(series.sum()) if role == "numeric" else None
+        }
+    
+    return {"row_count": len(df), "columns": columns}
+
+def get_result_metadata(df):
+    """
+    Get the metadata attached to a result by execute_query, computing it if missing or stale.
+    
+    Args:
+        df: The pandas DataFrame with query results
+        
+    Returns:
+        dict: The result metadata, see compute_result_metadata
+    """
+    metadata = df.attrs.get("result_metadata")
+    if metadata is None or metadata["row_count"] != len(df) or list(metadata["columns"]) != list(df.columns):
+        metadata = compute_result_metadata(df)
+        df.attrs["result_metadata"] = metadata
+    return metadata
\ No newline at end of file
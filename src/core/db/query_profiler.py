@@ -0,0 +1,130 @@
+import json
+import os
+import tempfile
+
+# Import custom modules
+from utils.config import PROFILE_FULL_SCAN_ROWS, PROFILE_LARGE_JOIN_ROWS, PROFILE_LARGE_SORT_ROWS, MAX_QUERY_RESULTS
+
+SCAN_OPERATORS = ("TABLE_SCAN", "SEQ_SCAN")
+JOIN_OPERATORS = ("HASH_JOIN",)
+SORT_OPERATORS = ("ORDER_BY",)
+CROSS_PRODUCT_OPERATORS = ("CROSS_PRODUCT", "BLOCKWISE_NL_JOIN", "NESTED_LOOP_JOIN")
+
+def execute_with_profiling(connection, sql_query):
+    """
+    Execute a query with DuckDB's JSON profiler enabled (the data behind EXPLAIN ANALYZE).
+
+    The query runs on its own cursor so profiling settings never leak into the
+    session's connection.
+
+    Args:
+        connection: The DuckDB connection
+        sql_query: The (already validated) SQL query
+
+    Returns:
+        tuple: (pandas.DataFrame with the results, query profile dict)
+    """
+    cursor = connection.cursor()
+    fd, profile_path = tempfile.mkstemp(suffix=".json", prefix="duckdb_profile_")
+    os.close(fd)
+    try:
+        cursor.execute("PRAGMA enable_profiling='json'")
+        cursor.execute(f"PRAGMA profiling_output='{profile_path}'")
+        result = cursor.execute(sql_query).fetchdf()
+        cursor.execute("PRAGMA disable_profiling")
+
+        with open(profile_path, encoding="utf-8") as f:
+            raw_profile = json.load(f)
+    finally:
+        cursor.close()
+        os.unlink(profile_path)
+
+    return result, parse_profile(raw_profile)
+
+def parse_profile(raw_profile):
+    """
+    Flatten DuckDB's JSON profiling output into a list of operators.
+
+    Handles both the current key names (operator_type, operator_timing, ...) and
+    the older ones (name, timing, cardinality).
+
+    Args:
+        raw_profile: The parsed JSON profiling output
+
+    Returns:
+        dict: {"latency": seconds, "rows_returned": int, "rows_scanned": int,
+               "peak_memory_bytes": int, "operators": [operator dicts, root first],
+               "warnings": [anti-pattern warnings]}
+    """
+    operators = []
+
+    def visit(node, depth):
+        operator_type = node.get("operator_type") or node.get("name", "")
+        operators.append({
+            "depth": depth,
+            "operator": operator_type.strip(),
+            "seconds": node.get("operator_timing", node.get("timing", 0.0)) or 0.0,
+            "rows": node.get("operator_cardinality", node.get("cardinality", 0)) or 0,
+            "rows_scanned": node.get("operator_rows_scanned", 0) or 0,
+            "peak_memory_bytes": node.get("system_peak_buffer_memory", 0) or 0,
+            "output_bytes": node.get("result_set_size", 0) or 0,
+            "extra_info": node.get("extra_info", {})
+        })
+        for child in node.get("children", []):
+            visit(child, depth + 1)
+
+    for child in raw_profile.get("children", []):
+        visit(child, 0)
+
+    return {
+        "latency": raw_profile.get("latency", raw_profile.get("timing", 0.0)),
+        "rows_returned": raw_profile.get("rows_returned"),
+        "rows_scanned": raw_profile.get("cumulative_rows_scanned", sum(op["rows_scanned"] for op in operators)),
+        "peak_memory_bytes": raw_profile.get("system_peak_buffer_memory"),
+        "operators": operators,
+        "warnings": detect_anti_patterns(operators, raw_profile.get("rows_returned"))
+    }
+
+def _has_filters(extra_info):
+    """
+    Check whether a scan operator applied any filter.
+
+    Args:
+        extra_info: The operator's extra_info (a dict, or text in older DuckDB versions)
+
+    Returns:
+        bool: True if the scan pushed down a filter
+    """
+    if isinstance(extra_info, dict):
+        return bool(extra_info.get("Filters"))
+    return "Filter" in str(extra_info)
+
+def detect_anti_patterns(operators, rows_returned=None):
+    """
+    Flag common performance problems in a query profile.
+
+    Args:
+        operators: The flattened operators from parse_profile
+        rows_returned: The number of rows the query returned
+
+    Returns:
+        list: Human-readable warnings
+    """
+    warnings = []
+    has_limit = any(op["operator"] in ("LIMIT", "STREAMING_LIMIT", "TOP_N") for op in operators)
+
+    for op in operators:
+        scanned = op["rows_scanned"] or op["rows"]
+        if op["operator"] in SCAN_OPERATORS and not _has_filters(op["extra_info"]) and scanned >= PROFILE_FULL_SCAN_ROWS:
+            warnings.append(f"Full table scan without filters over {scanned:,} rows; add a WHERE clause if only part of the data is needed.")
+        elif op["operator"] in JOIN_OPERATORS and op["rows"] >= PROFILE_LARGE_JOIN_ROWS:
+            warnings.append(f"Large hash join producing {op['rows']:,} rows; check the join keys for duplicates.")
+        elif op["operator"] in SORT_OPERATORS and not has_limit and op["rows"] >= PROFILE_LARGE_SORT_ROWS:
+            warnings.append(f"Sorting {op['rows']:,} rows without a LIMIT.")
+        elif op["operator"] in CROSS_PRODUCT_OPERATORS:
+            warnings.append(f"{op['operator']} found; a join condition may be missing.")
+
+    if rows_returned is not None and rows_returned > MAX_QUERY_RESULTS:
+        warnings.append(f"Query returned {rows_returned:,} rows; consider aggregating or adding a LIMIT.")
+
+    return warnings
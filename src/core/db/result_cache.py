@@ -0,0 +1,207 @@
+import re
+import time
+import logging
+import threading
+
+import duckdb
+
+# Import custom modules
+from core.db.duckdb_manager import quote_identifier
+from utils.config import RESULT_CACHE_MAX_TABLES, RESULT_CACHE_MAX_ROWS
+from utils.telemetry import span, increment
+
+logger = logging.getLogger(__name__)
+
+RESULT_TABLE_PREFIX = "__result_"
+
+_RESULT_TABLE_PATTERN = re.compile(rf'\b{RESULT_TABLE_PREFIX}\d+\b', re.IGNORECASE)
+
+class ResultCache:
+    """
+    Keeps the results of recent questions as DuckDB tables, so follow-up
+    questions ("now only for Electronics") can refine a small prior result
+    instead of rescanning the base table. They are ordinary tables rather than
+    temp tables, which only the connection that created them sees, so the
+    cursors of background threads can refresh and drop them.
+
+    Each result is stored with the question and SQL that produced it. Once more
+    than RESULT_CACHE_MAX_TABLES results are cached, the least recently used one
+    is dropped.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self._lock = threading.Lock()
+        self._sequence = 0
+        self._results = {}
+
+    def add(self, question, sql_query, result):
+        """
+        Store a query result as a table.
+
+        Partial, approximate and very large results are not stored.
+
+        Args:
+            question: The natural language question
+            sql_query: The SQL query that produced the result
+            result: The result DataFrame
+
+        Returns:
+            str: The name of the result table, or None if it was not stored
+        """
+        if result.attrs.get("partial") or "approximate" in result.attrs:
+            return None
+        if result.empty or len(result) > RESULT_CACHE_MAX_ROWS:
+            return None
+
+        with self._lock:
+            self._sequence += 1
+            result_table = f"{RESULT_TABLE_PREFIX}{self._sequence}"
+
+        view_name = f"{result_table}_df"
+        try:
+            with span("result_cache_store", rows=len(result)):
+                self.connection.register(view_name, result)
+                try:
+                    self.connection.execute(
+                        f"CREATE TABLE {quote_identifier(result_table)} AS SELECT * FROM {view_name}"
+                    )
+                finally:
+                    self.connection.unregister(view_name)
+                columns = self.connection.execute(f"DESCRIBE {quote_identifier(result_table)}").fetchall()
+        except duckdb.Error as e:
+            logger.error("Failed to cache result of %r: %s", question, e)
+            return None
+
+        with self._lock:
+            self._results[result_table] = {
+                "question": question,
+                "sql": sql_query,
+                "columns": {column[0]: column[1] for column in columns},
+                "row_count": len(result),
+                "hits": 0,
+                "last_used": time.monotonic()
+            }
+            # Evict the least recently used results beyond the limit
+            stale = []
+            while len(self._results) > RESULT_CACHE_MAX_TABLES:
+                name = min(self._results, key=lambda n: self._results[n]["last_used"])
+                del self._results[name]
+                stale.append(name)
+        self._drop(stale)
+        return result_table
+
+    def referenced_tables(self, sql_query):
+        """
+        Find the cached results a query reads, and mark them as recently used.
+
+        Args:
+            sql_query: The SQL query
+
+        Returns:
+            list: The names of the cached result tables the query mentions
+        """
+        names = {name.lower() for name in _RESULT_TABLE_PATTERN.findall(sql_query)}
+        with self._lock:
+            referenced = [name for name in self._results if name in names]
+            for name in referenced:
+                self._results[name]["hits"] += 1
+                self._results[name]["last_used"] = time.monotonic()
+        if referenced:
+            increment("result_cache_hits_total")
+        return referenced
+
+    def table_names(self):
+        """
+        Get the names of the cached result tables.
+
+        Returns:
+            list: The table names
+        """
+        with self._lock:
+            return list(self._results)
+
+    def describe(self):
+        """
+        Describe the cached results for the SQL generation prompt, most recent first.
+
+        Returns:
+            list: One dict per result with its table, question, SQL, columns and row count
+        """
+        with self._lock:
+            results = sorted(self._results.items(), key=lambda item: item[1]["last_used"], reverse=True)
+            return [
+                {
+                    "table": name,
+                    "question": result["question"],
+                    "sql": result["sql"],
+                    "columns": dict(result["columns"]),
+                    "rows": result["row_count"]
+                }
+                for name, result in results
+            ]
+
+    def apply_append(self, table_name, delta_table):
+        """
+        Recompute the cached results after rows were appended to the base table,
+        so follow-up questions refine current answers.
+
+        Results are recomputed oldest first, so a result refining an earlier one
+        reads its refreshed rows. A result that can no longer be computed is dropped.
+
+        Args:
+            table_name: The base table
+            delta_table: A table holding just the appended rows; results are
+                         small, so their SQL is simply rerun
+        """
+        with self._lock:
+            results = sorted(self._results.items(), key=lambda item: int(item[0][len(RESULT_TABLE_PREFIX):]))
+        stale = []
+        # Runs on the ingestion thread, so on a cursor of its own
+        with self.connection.cursor() as cursor:
+            for name, result in results:
+                try:
+                    with span("result_cache_refresh", table=table_name):
+                        cursor.execute(
+                            f"CREATE OR REPLACE TABLE {quote_identifier(name)} AS {result['sql'].strip().rstrip(';')}"
+                        )
+                        row_count = cursor.execute(f"SELECT count(*) FROM {quote_identifier(name)}").fetchone()[0]
+                except duckdb.Error as e:
+                    logger.info("Dropping cached result %s, which could not be refreshed: %s", name, e)
+                    stale.append(name)
+                    continue
+                if row_count > RESULT_CACHE_MAX_ROWS:
+                    stale.append(name)
+                    continue
+                with self._lock:
+                    if name in self._results:
+                        self._results[name]["row_count"] = row_count
+        with self._lock:
+            for name in stale:
+                self._results.pop(name, None)
+        self._drop(stale)
+
+    def invalidate(self):
+        """
+        Drop all cached results, e.g. after the base table changed.
+        """
+        with self._lock:
+            stale = list(self._results)
+            self._results = {}
+        self._drop(stale)
+
+    def _drop(self, names):
+        """
+        Drop result tables.
+
+        Args:
+            names: The table names
+        """
+        for name in names:
+            try:
+                # On a cursor of its own, as this also runs on the ingestion thread
+                with self.connection.cursor() as cursor:
+                    cursor.execute(f"DROP TABLE IF EXISTS {quote_identifier(name)}")
+            except duckdb.Error as e:
+                # The connection may already be closed along with its tables
+                logger.debug("Could not drop cached result %s: %s", name, e)
@@ -0,0 +1,563 @@
+import re
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import duckdb
+
+# Import custom modules
+from core.db.duckdb_manager import quote_identifier
+from utils.config import ROLLUP_MIN_QUERIES, ROLLUP_MAX_TABLES, ROLLUP_MAX_ROW_RATIO, BACKGROUND_WORKERS
+from utils.telemetry import span, increment
+
+logger = logging.getLogger(__name__)
+
+# Single-table aggregate queries: SELECT ... FROM t [WHERE ...] [GROUP BY ...] [HAVING/ORDER BY/LIMIT ...]
+_QUERY_PATTERN = re.compile(
+    r'^\s*SELECT\s+(?P<select>.+?)\s+FROM\s+(?P<table>"(?:[^"]|"")+"|[A-Za-z_]\w*)'
+    r'(?:\s+WHERE\s+(?P<where>.+?))?'
+    r'(?:\s+GROUP\s+BY\s+(?P<group>.+?))?'
+    r'(?P<tail>\s+(?:HAVING|ORDER\s+BY|LIMIT)\b.*?)?\s*;?\s*$',
+    re.IGNORECASE | re.DOTALL
+)
+_UNSUPPORTED_PATTERN = re.compile(
+    r'\b(?:JOIN|UNION|INTERSECT|EXCEPT|QUALIFY|WINDOW|TABLESAMPLE|USING\s+SAMPLE)\b', re.IGNORECASE
+)
+AGGREGATE_PATTERN = re.compile(
+    r'\b(?P<func>SUM|COUNT|MIN|MAX|AVG)\s*\(\s*(?P<distinct>DISTINCT\s+)?'
+    r'(?P<arg>\*|"(?:[^"]|"")+"|[A-Za-z_]\w*)\s*\)',
+    re.IGNORECASE
+)
+_IDENTIFIER_PATTERN = re.compile(r'^(?:"(?:[^"]|"")+"|[A-Za-z_]\w*)$')
+_ALIAS_PATTERN = re.compile(r'^(?P<expr>.+?)\s+AS\s+(?P<alias>"(?:[^"]|"")+"|[A-Za-z_]\w*)$', re.IGNORECASE | re.DOTALL)
+
+# Rollup measures needed to re-aggregate each aggregate function
+_MEASURES_FOR = {
+    "sum": ("sum",),
+    "count": ("count",),
+    "min": ("min",),
+    "max": ("max",),
+    "avg": ("sum", "count")
+}
+
+# Rollups are built off the Streamlit script thread, by a pool shared by all sessions
+_executor = ThreadPoolExecutor(max_workers=BACKGROUND_WORKERS, thread_name_prefix="rollups")
+
+def _split_top_level(text):
+    """
+    Split a SQL fragment on commas that are not inside parentheses or quotes.
+
+    Args:
+        text: The SQL fragment, e.g. a SELECT list
+
+    Returns:
+        list: The stripped items
+    """
+    items, depth, quote, current = [], 0, None, []
+    for char in text:
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in ("'", '"'):
+            quote = char
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "," and depth == 0:
+            items.append("".join(current).strip())
+            current = []
+            continue
+        current.append(char)
+    items.append("".join(current).strip())
+    return items
+
+def _unquote(identifier):
+    """
+    Remove the quotes from a SQL identifier.
+
+    Args:
+        identifier: A bare or double-quoted identifier
+
+    Returns:
+        str: The identifier name
+    """
+    if identifier.startswith('"') and identifier.endswith('"'):
+        return identifier[1:-1].replace('""', '"')
+    return identifier
+
+def _canonical(expression):
+    """
+    Normalize a dimension expression so different spellings of it compare equal.
+
+    DuckDB identifiers are case-insensitive, so plain column references reduce
+    to their lower-cased name.
+
+    Args:
+        expression: A GROUP BY or SELECT expression
+
+    Returns:
+        str: The normalized expression
+    """
+    expression = expression.strip()
+    if _IDENTIFIER_PATTERN.match(expression):
+        return _unquote(expression).lower()
+    expression = re.sub(r'\s+', ' ', expression)
+    return re.sub(r'\s*([(),])\s*', r'\1', expression).lower()
+
+def strip_alias(item):
+    """
+    Split a SELECT item into its expression and its AS alias.
+
+    Args:
+        item: The SELECT item
+
+    Returns:
+        tuple: (expression, alias or None)
+    """
+    match = _ALIAS_PATTERN.match(item)
+    if match:
+        return match.group("expr").strip(), match.group("alias")
+    return item, None
+
+def parse_aggregate_query(sql_query):
+    """
+    Break a single-table aggregate query into the parts a rollup rewrite needs.
+
+    Args:
+        sql_query: The SQL query
+
+    Returns:
+        dict: {"table", "select", "where", "group", "tail", "dimensions", "measures"},
+              or None if the query is not a simple aggregate over one table
+    """
+    if len(re.findall(r'\bSELECT\b', sql_query, re.IGNORECASE)) != 1 or _UNSUPPORTED_PATTERN.search(sql_query):
+        return None
+    match = _QUERY_PATTERN.match(sql_query)
+    if not match:
+        return None
+
+    select_items = _split_top_level(match.group("select"))
+    select_exprs = [strip_alias(item)[0] for item in select_items]
+    group_items = _split_top_level(match.group("group")) if match.group("group") else []
+
+    # Resolve GROUP BY ALL and positional references to the grouped expressions
+    if len(group_items) == 1 and group_items[0].upper() == "ALL":
+        dimension_exprs = [expr for expr in select_exprs if not AGGREGATE_PATTERN.search(expr)]
+    else:
+        dimension_exprs = []
+        for item in group_items:
+            if item.isdigit():
+                if not 1 <= int(item) <= len(select_exprs):
+                    return None
+                item = select_exprs[int(item) - 1]
+            dimension_exprs.append(item)
+
+    dimensions = {_canonical(expr): expr for expr in dimension_exprs}
+    for expr in select_exprs:
+        if expr == "*" or (_canonical(expr) not in dimensions and not AGGREGATE_PATTERN.search(expr)):
+            return None
+
+    # Aggregates in HAVING and ORDER BY are answered from the rollup too
+    measures = set()
+    for aggregate in AGGREGATE_PATTERN.finditer(" ".join(select_exprs + [match.group("tail") or ""])):
+        if aggregate.group("distinct"):
+            return None
+        measures.add((aggregate.group("func").lower(), _unquote(aggregate.group("arg"))))
+    if not measures:
+        return None
+
+    return {
+        "table": _unquote(match.group("table")),
+        "select": select_items,
+        "where": match.group("where"),
+        "group": group_items,
+        "tail": match.group("tail") or "",
+        "dimensions": dimensions,
+        "measures": measures
+    }
+
+def _measure_column(func, column):
+    """
+    Name the rollup column holding a partial aggregate.
+
+    Args:
+        func: The partial aggregate (sum, count, min or max)
+        column: The aggregated column, or "*"
+
+    Returns:
+        str: The rollup column name, e.g. "sum(Sales)"
+    """
+    return f"{func}({column})"
+
+class RollupManager:
+    """
+    Materializes aggregate tables for frequently asked GROUP BY patterns and
+    answers matching queries from them.
+
+    Each executed aggregate query that no rollup can answer is recorded under its
+    (table, dimensions) pattern. Once a pattern has been seen ROLLUP_MIN_QUERIES
+    times, a rollup with those dimensions and every measure seen for the pattern
+    is built in the background. Queries grouping by a subset of a rollup's
+    dimensions are then rewritten to re-aggregate the rollup instead of scanning
+    the base table.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._sequence = 0
+        self._patterns = {}
+        self._building = set()
+        self._rejected = set()
+        self._rollups = {}
+
+    def record_query(self, sql_query):
+        """
+        Record an executed query that was answered from the base table, and start
+        building a rollup once its pattern is frequent enough.
+
+        Args:
+            sql_query: The executed SQL query
+        """
+        parsed = parse_aggregate_query(sql_query)
+        if parsed is None:
+            return
+
+        key = (parsed["table"].lower(), frozenset(parsed["dimensions"]))
+        with self._lock:
+            if key in self._rejected or key in self._building:
+                return
+            pattern = self._patterns.setdefault(key, {"count": 0, "dimensions": {}, "measures": set()})
+            pattern["count"] += 1
+            pattern["dimensions"].update(parsed["dimensions"])
+            pattern["measures"].update(parsed["measures"])
+            if pattern["count"] < ROLLUP_MIN_QUERIES:
+                return
+            del self._patterns[key]
+            self._building.add(key)
+            generation = self._generation
+
+        _executor.submit(self._build, key, parsed["table"], pattern["dimensions"], pattern["measures"], generation)
+
+    def _build(self, key, table_name, dimensions, measures, generation):
+        """
+        Materialize a rollup table (runs on the background executor).
+
+        Args:
+            key: The (table, dimensions) pattern key
+            table_name: The base table
+            dimensions: Mapping of canonical dimension to its SQL expression
+            measures: (function, column) pairs seen for the pattern
+            generation: The invalidation generation the pattern was recorded in
+        """
+        partials = {("count", "*")}
+        for func, column in measures:
+            partials.update((partial, column) for partial in _MEASURES_FOR[func])
+
+        with self._lock:
+            self._sequence += 1
+            rollup_table = f"__rollup_{self._sequence}"
+
+        dimension_columns = {
+            canonical: _unquote(expr) if _IDENTIFIER_PATTERN.match(expr) else canonical
+            for canonical, expr in dimensions.items()
+        }
+        select_items = [f"{expr} AS {quote_identifier(dimension_columns[canonical])}" for canonical, expr in dimensions.items()]
+        select_items.extend(
+            f"{func}({column if column == '*' else quote_identifier(column)}) AS {quote_identifier(_measure_column(func, column))}"
+            for func, column in sorted(partials)
+        )
+        group_by = f" GROUP BY {', '.join(dimensions.values())}" if dimensions else ""
+
+        cursor = self.connection.cursor()
+        try:
+            with span("rollup_build", table=table_name, dimensions=len(dimensions), measures=len(partials)) as attrs:
+                cursor.execute(
+                    f"CREATE TABLE {quote_identifier(rollup_table)} AS "
+                    f"SELECT {', '.join(select_items)} FROM {quote_identifier(table_name)}{group_by}"
+                )
+                row_count = cursor.execute(f"SELECT count(*) FROM {quote_identifier(rollup_table)}").fetchone()[0]
+                base_rows = cursor.execute(f"SELECT count(*) FROM {quote_identifier(table_name)}").fetchone()[0]
+                attrs["rows"] = row_count
+
+            if row_count > base_rows * ROLLUP_MAX_ROW_RATIO:
+                # Nearly as many groups as rows: re-aggregating the rollup saves nothing
+                logger.info("Discarding rollup of %s by %s: %d of %d rows", table_name, list(dimensions.values()), row_count, base_rows)
+                cursor.execute(f"DROP TABLE {quote_identifier(rollup_table)}")
+                with self._lock:
+                    if generation == self._generation:
+                        self._rejected.add(key)
+                return
+
+            with self._lock:
+                if generation != self._generation:
+                    stale = [rollup_table]
+                else:
+                    stale = [name for name, rollup in self._rollups.items() if rollup["key"] == key]
+                    self._rollups[rollup_table] = {
+                        "key": key,
+                        "table": key[0],
+                        "dimensions": set(dimensions),
+                        "expressions": dict(dimensions),
+                        "dimension_columns": dimension_columns,
+                        "measures": {(func, column.lower()): _measure_column(func, column) for func, column in partials},
+                        "row_count": row_count,
+                        "hits": 0,
+                        "last_used": time.monotonic()
+                    }
+                    for name in stale:
+                        del self._rollups[name]
+                    # Evict the least recently used rollups beyond the limit
+                    while len(self._rollups) > ROLLUP_MAX_TABLES:
+                        name = min(self._rollups, key=lambda n: self._rollups[n]["last_used"])
+                        del self._rollups[name]
+                        stale.append(name)
+            for name in stale:
+                cursor.execute(f"DROP TABLE IF EXISTS {quote_identifier(name)}")
+
+            increment("rollup_builds_total")
+            logger.info("Built rollup %s of %s by %s (%d rows)", rollup_table, table_name, list(dimensions.values()), row_count)
+        except duckdb.Error as e:
+            logger.error("Failed to build rollup of %s: %s", table_name, e)
+        finally:
+            with self._lock:
+                self._building.discard(key)
+            cursor.close()
+
+    def rewrite(self, sql_query):
+        """
+        Rewrite a query to read from a rollup, if one can answer it.
+
+        The rewrite is only used if it binds and produces the same column types as
+        the original query.
+
+        Args:
+            sql_query: The validated SQL query
+
+        Returns:
+            dict: {"sql": rewritten query, "columns": original result column names,
+                   "rollup": rollup table name}, or None to run the query unchanged
+        """
+        parsed = parse_aggregate_query(sql_query)
+        if parsed is None:
+            return None
+
+        dimensions = set(parsed["dimensions"])
+        measures = {(partial, column.lower()) for func, column in parsed["measures"] for partial in _MEASURES_FOR[func]}
+        with self._lock:
+            candidates = [
+                (name, rollup) for name, rollup in self._rollups.items()
+                if rollup["table"] == parsed["table"].lower()
+                and dimensions <= rollup["dimensions"]
+                and measures <= set(rollup["measures"])
+            ]
+        if not candidates:
+            return None
+        rollup_table, rollup = min(candidates, key=lambda candidate: candidate[1]["row_count"])
+
+        rewritten = self._rewrite_sql(parsed, rollup_table, rollup)
+        try:
+            original_relation = self.connection.sql(sql_query)
+            rewritten_relation = self.connection.sql(rewritten)
+            if original_relation.types != rewritten_relation.types:
+                return None
+            columns = original_relation.columns
+        except duckdb.Error as e:
+            # e.g. a WHERE clause on a column the rollup does not keep
+            logger.debug("Rollup rewrite rejected: %s", e)
+            return None
+
+        with self._lock:
+            if rollup_table in self._rollups:
+                self._rollups[rollup_table]["hits"] += 1
+                self._rollups[rollup_table]["last_used"] = time.monotonic()
+        increment("rollup_hits_total")
+        return {"sql": rewritten, "columns": columns, "rollup": rollup_table}
+
+    def _rewrite_sql(self, parsed, rollup_table, rollup):
+        """
+        Build the query that re-aggregates a rollup.
+
+        Args:
+            parsed: The parsed query, see parse_aggregate_query
+            rollup_table: The rollup table name
+            rollup: The rollup entry
+
+        Returns:
+            str: The rewritten SQL query
+        """
+        def rewrite_aggregate(match):
+            func = match.group("func").lower()
+            column = _unquote(match.group("arg")).lower()
+
+            def partial(name):
+                return quote_identifier(rollup["measures"][(name, column)])
+
+            if func == "count":
+                return f"CAST(sum({partial('count')}) AS BIGINT)"
+            if func == "avg":
+                return f"(sum({partial('sum')}) / NULLIF(sum({partial('count')}), 0))"
+            return f"{func}({partial(func)})"
+
+        def rewrite_dimension(expr):
+            canonical = _canonical(expr)
+            if canonical in rollup["dimension_columns"] and not _IDENTIFIER_PATTERN.match(expr.strip()):
+                return quote_identifier(rollup["dimension_columns"][canonical])
+            return expr
+
+        select_items = []
+        for item in parsed["select"]:
+            expr, alias = strip_alias(item)
+            expr = AGGREGATE_PATTERN.sub(rewrite_aggregate, rewrite_dimension(expr))
+            select_items.append(f"{expr} AS {alias}" if alias else expr)
+
+        rewritten = f"SELECT {', '.join(select_items)} FROM {quote_identifier(rollup_table)}"
+        if parsed["where"]:
+            rewritten += f" WHERE {parsed['where']}"
+        if parsed["group"]:
+            rewritten += f" GROUP BY {', '.join(rewrite_dimension(item) for item in parsed['group'])}"
+        return rewritten + AGGREGATE_PATTERN.sub(rewrite_aggregate, parsed["tail"])
+
+    def invalidate(self, table_name=None):
+        """
+        Drop the rollups of a table (or all rollups), e.g. after its data changed.
+
+        Builds still running are discarded when they finish.
+
+        Args:
+            table_name: The base table, or None for every table
+        """
+        with self._lock:
+            self._generation += 1
+            stale = [
+                name for name, rollup in self._rollups.items()
+                if table_name is None or rollup["table"] == table_name.lower()
+            ]
+            for name in stale:
+                del self._rollups[name]
+            self._patterns = {
+                key: pattern for key, pattern in self._patterns.items()
+                if table_name is not None and key[0] != table_name.lower()
+            }
+            self._rejected = {key for key in self._rejected if table_name is not None and key[0] != table_name.lower()}
+
+        for name in stale:
+            try:
+                # On a cursor of its own, as this also runs on the ingestion thread
+                with self.connection.cursor() as cursor:
+                    cursor.execute(f"DROP TABLE IF EXISTS {quote_identifier(name)}")
+            except duckdb.Error as e:
+                # The connection may already be closed along with its tables
+                logger.debug("Could not drop rollup %s: %s", name, e)
+
+    def apply_append(self, table_name, delta_table):
+        """
+        Fold rows appended to a table into its rollups, instead of rebuilding them.
+
+        The new rows are aggregated on their own and merged with each rollup:
+        counts and sums add up, minimums and maximums combine.
+
+        Args:
+            table_name: The base table
+            delta_table: A table holding just the appended rows
+        """
+        with self._lock:
+            rollups = {
+                name: dict(rollup) for name, rollup in self._rollups.items()
+                if rollup["table"] == table_name.lower()
+            }
+            generation = self._generation
+
+        for name, rollup in rollups.items():
+            dimension_items = [
+                f"{expr} AS {quote_identifier(rollup['dimension_columns'][canonical])}"
+                for canonical, expr in rollup["expressions"].items()
+            ]
+            measure_items = [
+                f"{func}({column if column == '*' else quote_identifier(column)}) AS {quote_identifier(measure)}"
+                for (func, column), measure in rollup["measures"].items()
+            ]
+            merged_items = [quote_identifier(column) for column in rollup["dimension_columns"].values()]
+            merged_items.extend(
+                f"{'sum' if func == 'count' else func}({quote_identifier(measure)}) AS {quote_identifier(measure)}"
+                for (func, _), measure in rollup["measures"].items()
+            )
+            group_by = f" GROUP BY {', '.join(rollup['expressions'].values())}" if rollup["expressions"] else ""
+            merged_group_by = f" GROUP BY {', '.join(merged_items[:len(rollup['expressions'])])}" if rollup["expressions"] else ""
+            delta_rollup = quote_identifier(f"{name}_delta")
+            merged_rollup = quote_identifier(f"{name}_merged")
+
+            cursor = self.connection.cursor()
+            try:
+                with span("rollup_merge", table=table_name, dimensions=len(rollup["expressions"])) as attrs:
+                    cursor.execute(
+                        f"CREATE OR REPLACE TABLE {delta_rollup} AS "
+                        f"SELECT {', '.join(dimension_items + measure_items)} FROM {quote_identifier(delta_table)}{group_by}"
+                    )
+                    # Typed like a rollup built from the table now, e.g. with ENUMs that gained values
+                    cursor.execute(f"CREATE OR REPLACE TABLE {merged_rollup} AS SELECT * FROM {delta_rollup} LIMIT 0")
+                    cursor.execute(
+                        f"INSERT INTO {merged_rollup} BY NAME SELECT {', '.join(merged_items)} FROM ("
+                        f"SELECT * FROM {quote_identifier(name)} UNION ALL BY NAME SELECT * FROM {delta_rollup})"
+                        f"{merged_group_by}"
+                    )
+                    cursor.execute(f"DROP TABLE {delta_rollup}")
+                    row_count = cursor.execute(f"SELECT count(*) FROM {merged_rollup}").fetchone()[0]
+                    attrs["rows"] = row_count
+
+                with self._lock:
+                    current = generation == self._generation and name in self._rollups
+                if not current:
+                    cursor.execute(f"DROP TABLE {merged_rollup}")
+                    continue
+                # Swapped in one transaction, so queries never miss the rollup
+                cursor.begin()
+                cursor.execute(f"DROP TABLE {quote_identifier(name)}")
+                cursor.execute(f"ALTER TABLE {merged_rollup} RENAME TO {quote_identifier(name)}")
+                cursor.commit()
+                with self._lock:
+                    if name in self._rollups:
+                        self._rollups[name]["row_count"] = row_count
+                increment("rollup_merges_total")
+            except duckdb.Error as e:
+                logger.error("Failed to merge appended rows into rollup %s: %s", name, e)
+                self._discard(name)
+            finally:
+                cursor.close()
+
+    def _discard(self, name):
+        """
+        Forget a rollup and drop its table.
+
+        Args:
+            name: The rollup table name
+        """
+        with self._lock:
+            self._rollups.pop(name, None)
+        try:
+            with self.connection.cursor() as cursor:
+                cursor.execute(f"DROP TABLE IF EXISTS {quote_identifier(name)}")
+        except duckdb.Error as e:
+            logger.debug("Could not drop rollup %s: %s", name, e)
+
+    def list_rollups(self):
+        """
+        Describe the rollups currently available.
+
+        Returns:
+            list: One dict per rollup with its table, dimensions, row count and hits
+        """
+        with self._lock:
+            return [
+                {
+                    "rollup": name,
+                    "table": rollup["table"],
+                    "dimensions": sorted(rollup["dimension_columns"].values()),
+                    "rows": rollup["row_count"],
+                    "hits": rollup["hits"]
+                }
+                for name, rollup in self._rollups.items()
+            ]
@@ -2,6 +2,22 @@ import pandas as pd
 import numpy as np
 from datetime import datetime
 
+# Common date patterns
+DATE_PATTERNS = [
+    # Try a few common date formats
+    "%Y-%m-%d",
+    "%d/%m/%Y",
+    "%m/%d/%Y",
+    "%Y/%m/%d",
+    "%d-%m-%Y",
+    "%m-%d-%Y",
+    
+    # With time
+    "%Y-%m-%d %H:%M:%S",
+    "%d/%m/%Y %H:%M:%S",
+    "%m/%d/%Y %H:%M:%S"
+]
+
 def infer_schema(df):
     """
     Infer the schema from a pandas DataFrame.
@@ -32,6 +48,10 @@ def infer_schema(df):
         elif pd.api.types.is_datetime64_dtype(dtype):
             schema[column] = "DATETIME"
         
+        # Already dictionary-encoded
+        elif isinstance(dtype, pd.CategoricalDtype):
+            schema[column] = "CATEGORICAL"
+        
         # For string/object types, do a deeper inspection
         elif pd.api.types.is_string_dtype(dtype) or pd.api.types.is_object_dtype(dtype):
             # Skip empty columns
@@ -74,25 +94,9 @@ def is_probable_datetime(series):
     # Sample a few non-NA values
     sample = series.dropna().sample(min(10, len(series.dropna()))).astype(str)
     
-    # Common date patterns
-    date_patterns = [
-        # Try a few common date formats
-        "%Y-%m-%d",
-        "%d/%m/%Y",
-        "%m/%d/%Y",
-        "%Y/%m/%d",
-        "%d-%m-%Y",
-        "%m-%d-%Y",
-        
-        # With time
-        "%Y-%m-%d %H:%M:%S",
-        "%d/%m/%Y %H:%M:%S",
-        "%m/%d/%Y %H:%M:%S"
-    ]
-    
     success_count = 0
     for value in sample:
-        for pattern in date_patterns:
+        for pattern in DATE_PATTERNS:
             try:
                 datetime.strptime(value, pattern)
                 success_count += 1
@@ -125,4 +129,28 @@ def is_probable_categorical(series):
     if n_unique <= 20 or (n_unique / n_total) < 0.05:
         return True
         
-    return False 
\ No newline at end of file
+    return False
+
+def encode_categoricals(df, schema):
+    """
+    Convert the columns inferred as CATEGORICAL to the pandas category dtype.
+    
+    Each distinct value is then stored once with small integer codes per row;
+    DuckDB loads category columns as ENUMs and returns them as categories again.
+    
+    Args:
+        df: The pandas DataFrame to encode
+        schema: The inferred schema (dict mapping column names to types)
+        
+    Returns:
+        pandas.DataFrame: The DataFrame with categorical columns encoded
+    """
+    encoded = df.copy(deep=False)
+    for column, col_type in schema.items():
+        if col_type != "CATEGORICAL" or isinstance(df[column].dtype, pd.CategoricalDtype):
+            continue
+        # DuckDB ENUM values must be strings; leave mixed-type columns as they are
+        if pd.api.types.infer_dtype(df[column], skipna=True) != "string":
+            continue
+        encoded[column] = df[column].astype("category")
+    return encoded
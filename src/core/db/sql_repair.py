@@ -0,0 +1,201 @@
+import re
+import difflib
+import logging
+
+import duckdb
+
+# Import custom modules
+from core.db.duckdb_manager import quote_identifier
+from core.db.query_executor import sanitize_sql
+from utils.config import SQL_REPAIR_MAX_ATTEMPTS, SQL_REPAIR_MATCH_CUTOFF, SQL_DEFAULT_LIMIT
+from utils.telemetry import span, increment
+
+logger = logging.getLogger(__name__)
+
+# String literals and double-quoted identifiers, which repairs must not rewrite inside
+_QUOTED_PATTERN = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")")
+_BACKTICK_PATTERN = re.compile(r'`([^`]+)`')
+_SIMPLE_IDENTIFIER_PATTERN = re.compile(r'^[A-Za-z_]\w*$')
+_LIMIT_PATTERN = re.compile(r'\bLIMIT\s+\d+(?:\s+OFFSET\s+\d+)?\s*;?\s*$', re.IGNORECASE)
+_SELECT_PATTERN = re.compile(r'^\s*(?:SELECT|WITH)\b', re.IGNORECASE)
+_MISSING_COLUMN_PATTERN = re.compile(r'Referenced column "?(?P<name>[^"]+?)"? not found', re.IGNORECASE)
+_MISSING_TABLE_PATTERN = re.compile(r'Table with name "?(?P<name>[^"\s]+?)"? does not exist', re.IGNORECASE)
+
+def _rewrite_unquoted(sql_query, rewrite):
+    """
+    Apply a rewrite to the parts of a query outside string literals and quoted identifiers.
+
+    Args:
+        sql_query: The SQL query
+        rewrite: A function mapping an unquoted fragment to its rewritten text
+
+    Returns:
+        str: The rewritten query
+    """
+    parts = _QUOTED_PATTERN.split(sql_query)
+    return "".join(part if i % 2 else rewrite(part) for i, part in enumerate(parts))
+
+def _replace_identifier(sql_query, old_name, new_name):
+    """
+    Replace every reference to an identifier, bare or double-quoted.
+
+    Args:
+        sql_query: The SQL query
+        old_name: The identifier to replace
+        new_name: The replacement name (quoted if it needs to be)
+
+    Returns:
+        str: The rewritten query
+    """
+    replacement = new_name if _SIMPLE_IDENTIFIER_PATTERN.match(new_name) else quote_identifier(new_name)
+    bare = re.compile(rf'(?<![\w.]){re.escape(old_name)}(?!\w)', re.IGNORECASE)
+    parts = _QUOTED_PATTERN.split(sql_query)
+    rewritten = []
+    for i, part in enumerate(parts):
+        if i % 2 == 0:
+            part = bare.sub(lambda _: replacement, part)
+        elif part == quote_identifier(old_name):
+            part = replacement
+        rewritten.append(part)
+    return "".join(rewritten)
+
+def fix_quoting(sql_query, columns):
+    """
+    Quote column names that need it and replace MySQL-style backtick quoting.
+
+    Args:
+        sql_query: The SQL query
+        columns: The column names the query may use
+
+    Returns:
+        tuple: (rewritten query, list of repair descriptions)
+    """
+    repairs = []
+
+    def replace_backticks(fragment):
+        rewritten = _BACKTICK_PATTERN.sub(lambda match: quote_identifier(match.group(1)), fragment)
+        if rewritten != fragment:
+            repairs.append("replaced backticks with double quotes")
+        return rewritten
+
+    sql_query = _rewrite_unquoted(sql_query, replace_backticks)
+
+    # Longest names first, so "Total Sales" is quoted before "Sales" could match inside it
+    for column in sorted(columns, key=len, reverse=True):
+        if _SIMPLE_IDENTIFIER_PATTERN.match(column):
+            continue
+        pattern = re.compile(rf'(?<![\w.]){re.escape(column)}(?!\w)', re.IGNORECASE)
+        rewritten = _rewrite_unquoted(sql_query, lambda fragment: pattern.sub(lambda _: quote_identifier(column), fragment))
+        if rewritten != sql_query:
+            repairs.append(f"quoted column {column}")
+            sql_query = rewritten
+    return sql_query, repairs
+
+def add_default_limit(sql_query, limit=SQL_DEFAULT_LIMIT):
+    """
+    Add the default LIMIT to a SELECT query that does not end with one.
+
+    Args:
+        sql_query: The SQL query
+        limit: The row limit to add
+
+    Returns:
+        tuple: (rewritten query, list of repair descriptions)
+    """
+    if not _SELECT_PATTERN.match(sql_query) or _LIMIT_PATTERN.search(sql_query):
+        return sql_query, []
+    return f"{sql_query.strip().rstrip(';').rstrip()} LIMIT {limit}", [f"added LIMIT {limit}"]
+
+def _closest(name, candidates):
+    """
+    Find the candidate name closest to a misspelled name.
+
+    Args:
+        name: The misspelled name
+        candidates: The valid names
+
+    Returns:
+        str: The closest candidate, or None if none is close enough
+    """
+    by_lower = {candidate.lower(): candidate for candidate in candidates}
+    if name.lower() in by_lower:
+        return by_lower[name.lower()]
+    matches = difflib.get_close_matches(name.lower(), list(by_lower), n=1, cutoff=SQL_REPAIR_MATCH_CUTOFF)
+    return by_lower[matches[0]] if matches else None
+
+def check_sql(connection, sql_query):
+    """
+    Bind and plan a query with EXPLAIN, without executing it.
+
+    The query must be a single statement that passes sanitize_sql: DuckDB
+    would run every statement of the EXPLAIN, e.g. a DROP TABLE after the SELECT.
+
+    Args:
+        connection: The DuckDB connection
+        sql_query: The SQL query
+
+    Returns:
+        str: The DuckDB error message, or None if the query is valid
+    """
+    try:
+        if len(duckdb.extract_statements(sql_query)) != 1:
+            return "Only a single SQL statement is allowed"
+        sanitize_sql(sql_query)
+        connection.execute(f"EXPLAIN {sql_query.strip().rstrip(';')}")
+        return None
+    except (duckdb.Error, ValueError) as e:
+        return str(e)
+
+def check_and_repair_sql(connection, sql_query, table_name, columns, other_tables=()):
+    """
+    Check a generated query locally and repair common mistakes without another LLM call.
+
+    Quoting is fixed and the default LIMIT added up front. The query is then
+    bound with EXPLAIN; misspelled column and table names reported by DuckDB
+    are replaced with the closest valid name, up to SQL_REPAIR_MAX_ATTEMPTS times.
+
+    Args:
+        connection: The DuckDB connection
+        sql_query: The generated SQL query
+        table_name: The table the query should read
+        columns: The column names the query may use
+        other_tables: Names of further tables the query may read, e.g. cached results
+
+    Returns:
+        dict: {"sql": the (repaired) query, "repairs": list of repair descriptions,
+               "error": the remaining DuckDB error, or None if the query binds}
+    """
+    original_query = sql_query
+    with span("sql_check") as attrs:
+        sql_query, repairs = fix_quoting(sql_query, columns)
+        sql_query, limit_repairs = add_default_limit(sql_query)
+        repairs.extend(limit_repairs)
+
+        error = check_sql(connection, sql_query)
+        for _ in range(SQL_REPAIR_MAX_ATTEMPTS):
+            if error is None:
+                break
+            column_match = _MISSING_COLUMN_PATTERN.search(error)
+            table_match = _MISSING_TABLE_PATTERN.search(error)
+            if column_match:
+                name, replacement = column_match.group("name"), _closest(column_match.group("name"), columns)
+            elif table_match:
+                name, replacement = table_match.group("name"), _closest(table_match.group("name"), [table_name, *other_tables])
+            else:
+                break
+            if replacement is None or replacement == name:
+                break
+            sql_query = _replace_identifier(sql_query, name, replacement)
+            repairs.append(f"replaced {name} with {replacement}")
+            error = check_sql(connection, sql_query)
+
+        attrs["repairs"] = len(repairs)
+        attrs["valid"] = error is None
+
+    if repairs:
+        logger.info("Repaired generated SQL locally: %s", "; ".join(repairs))
+        increment("sql_local_repairs_total")
+        # The original query would have failed and cost another LLM round trip
+        if error is None and check_sql(connection, original_query) is not None:
+            increment("llm_round_trips_saved_total")
+    return {"sql": sql_query, "repairs": repairs, "error": error}
@@ -0,0 +1,229 @@
+import duckdb
+import pandas as pd
+import numpy as np
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+
+# Import custom modules
+from core.db.duckdb_manager import quote_identifier
+from utils.config import STATS_TOP_K, STATS_CACHE_SIZE
+from utils.telemetry import span
+
+logger = logging.getLogger(__name__)
+
+# Rows of the numeric summary, in the same order as DataFrame.describe()
+DESCRIBE_INDEX = ["count", "mean", "std", "min", "25%", "50%", "75%", "max"]
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+def result_fingerprint(df):
+    """
+    Compute a fingerprint identifying the contents of a result DataFrame.
+
+    Args:
+        df: The pandas DataFrame to fingerprint
+
+    Returns:
+        str: A hex digest that changes whenever the columns, types or values change
+    """
+    hasher = hashlib.sha1()
+    hasher.update(repr((
+        [str(col) for col in df.columns],
+        [str(dtype) for dtype in df.dtypes],
+        df.shape
+    )).encode())
+    try:
+        hasher.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    except TypeError:
+        # Unhashable cell values (lists, dicts); fall back to their text form
+        hasher.update(df.to_csv(index=False).encode())
+    return hasher.hexdigest()
+
+def _cached(key, compute):
+    """
+    Return a cached value, computing and storing it on a miss.
+
+    Args:
+        key: The cache key
+        compute: A zero-argument callable producing the value
+
+    Returns:
+        The cached or freshly computed value
+    """
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    value = compute()
+
+    with _cache_lock:
+        _cache[key] = value
+        _cache.move_to_end(key)
+        while len(_cache) > STATS_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return value
+
+def _run_on_dataframe(df, sql, fetch):
+    """
+    Run a SQL statement against a DataFrame registered as `result_df`.
+
+    The throwaway connection is closed once the result is fetched.
+
+    Args:
+        df: The pandas DataFrame to query
+        sql: The SQL statement to run
+        fetch: Callable reading the result from the executed connection
+
+    Returns:
+        The fetched result
+    """
+    with duckdb.connect(database=':memory:') as connection:
+        connection.register("result_df", df)
+        return fetch(connection.execute(sql))
+
+def split_columns(df):
+    """
+    Split the columns of a DataFrame into numeric and categorical columns.
+
+    Args:
+        df: The pandas DataFrame
+
+    Returns:
+        tuple: (numeric_columns, categorical_columns)
+    """
+    numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
+    cat_cols = df.select_dtypes(exclude=[np.number]).columns.tolist()
+    return numeric_cols, cat_cols
+
+def summarize_result(df, fingerprint=None):
+    """
+    Summarize a result DataFrame in a single DuckDB pass.
+
+    Numeric columns get the same statistics as DataFrame.describe() (with
+    approximate quartiles), categorical columns get an approximate distinct count.
+
+    Args:
+        df: The pandas DataFrame with query results
+        fingerprint: Optional key identifying the result, e.g. its result store key;
+                     computed with result_fingerprint if not given
+
+    Returns:
+        dict: {"numeric": DataFrame shaped like describe() or None,
+               "distinct": dict mapping categorical column to approximate distinct count}
+    """
+    with span("statistics", kind="summary"):
+        fingerprint = fingerprint or result_fingerprint(df)
+        return _cached((fingerprint, "summary"), lambda: _compute_summary(df))
+
+def _compute_summary(df):
+    """
+    Compute the summary returned by summarize_result.
+
+    Args:
+        df: The pandas DataFrame with query results
+
+    Returns:
+        dict: The numeric summary and categorical distinct counts
+    """
+    numeric_cols, cat_cols = split_columns(df)
+
+    select_items = []
+    for col in numeric_cols:
+        quoted = quote_identifier(col)
+        select_items.extend([
+            f"count({quoted})",
+            f"avg({quoted})",
+            f"stddev_samp({quoted})",
+            f"min({quoted})",
+            f"approx_quantile({quoted}, [0.25, 0.5, 0.75])",
+            f"max({quoted})"
+        ])
+    for col in cat_cols:
+        select_items.append(f"approx_count_distinct({quote_identifier(col)})")
+
+    if not select_items:
+        return {"numeric": None, "distinct": {}}
+
+    try:
+        row = _run_on_dataframe(df, f"SELECT {', '.join(select_items)} FROM result_df", lambda result: result.fetchone())
+    except duckdb.Error as e:
+        # Fall back to pandas for results DuckDB cannot scan (e.g. mixed object columns)
+        logger.debug("Falling back to pandas statistics: %s", e)
+        return {
+            "numeric": df[numeric_cols].describe() if numeric_cols else None,
+            "distinct": {col: int(df[col].nunique()) for col in cat_cols}
+        }
+
+    numeric = None
+    if numeric_cols:
+        values = {}
+        for i, col in enumerate(numeric_cols):
+            count, mean, std, min_value, quartiles, max_value = row[i * 6:(i + 1) * 6]
+            quartiles = quartiles or [None, None, None]
+            values[col] = [count, mean, std, min_value, *quartiles, max_value]
+        numeric = pd.DataFrame(values, index=DESCRIBE_INDEX, columns=numeric_cols).astype(float)
+
+    offset = len(numeric_cols) * 6
+    distinct = {col: int(row[offset + i]) for i, col in enumerate(cat_cols)}
+
+    return {"numeric": numeric, "distinct": distinct}
+
+def top_values(df, column, k=STATS_TOP_K, fingerprint=None):
+    """
+    Get the most frequent values of a column, computed with a DuckDB GROUP BY.
+
+    Args:
+        df: The pandas DataFrame with query results
+        column: The column to count values for
+        k: The number of values to return
+        fingerprint: Optional key identifying the result, see summarize_result
+
+    Returns:
+        pandas.DataFrame: Columns [column, 'count'], most frequent first
+    """
+    with span("statistics", kind="top_values"):
+        fingerprint = fingerprint or result_fingerprint(df)
+        return _cached((fingerprint, "top_values", str(column), k), lambda: _compute_top_values(df, column, k))
+
+def _compute_top_values(df, column, k):
+    """
+    Compute the value counts returned by top_values.
+
+    Args:
+        df: The pandas DataFrame with query results
+        column: The column to count values for
+        k: The number of values to return
+
+    Returns:
+        pandas.DataFrame: Columns [column, 'count']
+    """
+    quoted = quote_identifier(column)
+    sql = f"""
+        SELECT {quoted}, count(*) AS value_count
+        FROM result_df
+        WHERE {quoted} IS NOT NULL
+        GROUP BY {quoted}
+        ORDER BY value_count DESC
+        LIMIT {int(k)}
+    """
+    try:
+        value_counts_df = _run_on_dataframe(df, sql, lambda result: result.fetchdf())
+    except duckdb.Error as e:
+        logger.debug("Falling back to pandas value counts: %s", e)
+        counts = df[column].value_counts()
+        # Categorical columns also count categories absent from the result
+        value_counts_df = counts[counts > 0].head(k).reset_index()
+
+    value_counts_df.columns = [column, 'count']
+    return value_counts_df
+
+def clear_cache():
+    """
+    Remove all cached statistics.
+    """
+    with _cache_lock:
+        _cache.clear()
@@ -0,0 +1,249 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Import custom modules
+from core.db.duckdb_manager import quote_identifier
+from core.db.query_executor import execute_query
+from core.viz.chart_generator import generate_chart
+from utils.config import SUGGESTION_COUNT, SUGGESTION_TOP_N, SUGGESTION_SAMPLE_ROWS
+from utils.telemetry import span, increment
+
+logger = logging.getLogger(__name__)
+
+def _pick_measure(schema, profile):
+    """
+    Pick the main numeric column: the first FLOAT column, else the first
+    INTEGER column that is not an identifier.
+
+    Args:
+        schema: The inferred schema
+        profile: The table profile
+
+    Returns:
+        str: The column name, or None
+    """
+    for wanted in ("FLOAT", "INTEGER"):
+        for column, col_type in schema.items():
+            if col_type != wanted:
+                continue
+            column_profile = profile["columns"].get(column, {})
+            # Nearly one distinct value per row: an ID, not a measure
+            if wanted == "INTEGER" and column_profile.get("approx_distinct", 0) >= 0.9 * profile["row_count"]:
+                continue
+            return column
+    return None
+
+def _pick_dimensions(schema, profile):
+    """
+    Pick the categorical columns to group by, fewest distinct values first.
+
+    Args:
+        schema: The inferred schema
+        profile: The table profile
+
+    Returns:
+        list: The column names
+    """
+    dimensions = [
+        column for column, col_type in schema.items()
+        if col_type == "CATEGORICAL" and profile["columns"].get(column, {}).get("approx_distinct", 0) > 1
+    ]
+    return sorted(dimensions, key=lambda column: profile["columns"][column]["approx_distinct"])
+
+def _time_grain(column_profile):
+    """
+    Pick the date_trunc grain that gives a readable trend over a date column's range.
+
+    Args:
+        column_profile: The profile of the date column
+
+    Returns:
+        str: "day", "month" or "year"
+    """
+    try:
+        days = (column_profile["max"] - column_profile["min"]).days
+    except (TypeError, AttributeError):
+        return "month"
+    if days <= 92:
+        return "day"
+    return "month" if days <= 5 * 366 else "year"
+
+def suggest_questions(table_name, schema, profile):
+    """
+    Propose likely first questions about a table, with SQL written from templates.
+
+    Args:
+        table_name: The name of the table
+        schema: The inferred schema (dict mapping column names to types)
+        profile: The table profile
+
+    Returns:
+        list: Up to SUGGESTION_COUNT dicts with "question", "sql" and "chart_type"
+    """
+    table = quote_identifier(table_name)
+    measure = _pick_measure(schema, profile)
+    dimensions = _pick_dimensions(schema, profile)
+    dates = [column for column, col_type in schema.items() if col_type == "DATETIME"]
+    suggestions = []
+
+    if measure and dimensions:
+        dimension = dimensions[0]
+        suggestions.append({
+            "question": f"What are the top {SUGGESTION_TOP_N} {dimension} by total {measure}?",
+            "sql": (
+                f"SELECT {quote_identifier(dimension)}, SUM({quote_identifier(measure)}) AS {quote_identifier(f'total_{measure}')} "
+                f"FROM {table} GROUP BY 1 ORDER BY 2 DESC LIMIT {int(SUGGESTION_TOP_N)}"
+            ),
+            "chart_type": "bar"
+        })
+
+    if measure and dates:
+        date = dates[0]
+        grain = _time_grain(profile["columns"].get(date, {}))
+        suggestions.append({
+            "question": f"How does total {measure} change by {grain} over {date}?",
+            "sql": (
+                f"SELECT date_trunc('{grain}', {quote_identifier(date)}) AS {quote_identifier(grain)}, "
+                f"SUM({quote_identifier(measure)}) AS {quote_identifier(f'total_{measure}')} "
+                f"FROM {table} WHERE {quote_identifier(date)} IS NOT NULL GROUP BY 1 ORDER BY 1"
+            ),
+            "chart_type": "line"
+        })
+
+    if measure:
+        suggestions.append({
+            "question": f"What is the distribution of {measure}?",
+            "sql": (
+                f"SELECT {quote_identifier(measure)} FROM {table} "
+                f"WHERE {quote_identifier(measure)} IS NOT NULL USING SAMPLE {int(SUGGESTION_SAMPLE_ROWS)} ROWS"
+            ),
+            "chart_type": "histogram"
+        })
+
+    if measure and len(dimensions) > 1:
+        dimension = dimensions[1]
+        suggestions.append({
+            "question": f"What is the average {measure} by {dimension}?",
+            "sql": (
+                f"SELECT {quote_identifier(dimension)}, AVG({quote_identifier(measure)}) AS {quote_identifier(f'average_{measure}')} "
+                f"FROM {table} GROUP BY 1 ORDER BY 2 DESC LIMIT {int(SUGGESTION_TOP_N)}"
+            ),
+            "chart_type": "bar"
+        })
+    elif dimensions:
+        dimension = dimensions[0]
+        suggestions.append({
+            "question": f"How many rows are there per {dimension}?",
+            "sql": (
+                f"SELECT {quote_identifier(dimension)}, COUNT(*) AS row_count "
+                f"FROM {table} GROUP BY 1 ORDER BY 2 DESC LIMIT {int(SUGGESTION_TOP_N)}"
+            ),
+            "chart_type": "pie"
+        })
+
+    return suggestions[:SUGGESTION_COUNT]
+
+class SuggestionJob:
+    """
+    Precomputes the results and charts of suggested questions in the background,
+    so a suggestion opens instantly when clicked.
+
+    The work is speculative: cancel() stops it, interrupting the running query,
+    as soon as the user asks a question of their own. Suggestions finished by
+    then stay available.
+    """
+
+    def __init__(self, connection, table_name, suggestions):
+        self.connection = connection
+        self.table_name = table_name
+        self.suggestions = suggestions
+        self._lock = threading.Lock()
+        self._ready = []
+        self._cancelled = threading.Event()
+        self._cursor = None
+        self.future = None
+
+    def _run(self):
+        """
+        Compute each suggestion in turn (runs on the background executor).
+        """
+        cursor = self.connection.cursor()
+        with self._lock:
+            self._cursor = cursor
+        try:
+            for suggestion in self.suggestions:
+                if self._cancelled.is_set():
+                    return
+                try:
+                    with span("suggestion_prefetch", chart_type=suggestion["chart_type"]):
+                        results = execute_query(cursor, suggestion["sql"], self.table_name)
+                        figure = generate_chart(results, suggestion["chart_type"], suggestion["question"])
+                except Exception as e:
+                    if not self._cancelled.is_set():
+                        logger.warning("Could not precompute suggestion %r: %s", suggestion["question"], e)
+                    continue
+                if results.empty:
+                    continue
+                results.attrs["figure"] = (suggestion["chart_type"], figure)
+                # Kept if the result is spilled and the figure dropped, see result_store
+                results.attrs["chart_type"] = suggestion["chart_type"]
+                with self._lock:
+                    self._ready.append({**suggestion, "results": results})
+                increment("suggestions_prefetched_total")
+        finally:
+            with self._lock:
+                self._cursor = None
+            cursor.close()
+
+    def ready(self):
+        """
+        Get the suggestions whose results are precomputed.
+
+        Returns:
+            list: Dicts with "question", "sql", "chart_type" and "results"
+        """
+        with self._lock:
+            return list(self._ready)
+
+    def done(self):
+        """
+        Check whether the job has stopped (finished or cancelled).
+
+        Returns:
+            bool: True if no more suggestions will become ready
+        """
+        return self.future is not None and self.future.done()
+
+    def cancel(self):
+        """
+        Stop the speculative work, interrupting the query that is running.
+        """
+        if self._cancelled.is_set():
+            return
+        self._cancelled.set()
+        with self._lock:
+            if self._cursor is not None:
+                self._cursor.interrupt()
+        increment("suggestion_jobs_cancelled_total")
+
+def start_suggestions(connection, table_name, schema, profile):
+    """
+    Start precomputing suggested questions for a freshly profiled table.
+
+    Args:
+        connection: The DuckDB connection holding the table
+        table_name: The name of the table
+        schema: The inferred schema (dict mapping column names to types)
+        profile: The table profile
+
+    Returns:
+        SuggestionJob: The job handle
+    """
+    job = SuggestionJob(connection, table_name, suggest_questions(table_name, schema, profile))
+    # Each job gets its own worker, computing its suggestions one at a time off the
+    # Streamlit script thread, so it never queues behind another session's job
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="suggestions")
+    job.future = executor.submit(job._run)
+    executor.shutdown(wait=False)
+    return job
@@ -0,0 +1,255 @@
+import logging
+import re
+
+import numpy as np
+import pandas as pd
+
+# Import custom modules
+from core.db.schema_inference import DATE_PATTERNS
+from utils.config import COERCE_SAMPLE_SIZE, COERCE_MAX_PARSE_FAILURES, COERCE_DOWNCAST_FLOATS, COERCE_FLOAT_RTOL
+
+logger = logging.getLogger(__name__)
+
+# Numbers written with thousands separators and an optional currency symbol, e.g. "$1,234.50"
+NUMBER_PATTERN = r'[-+]?[$€£]?\s*(?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d+)?'
+NUMBER_NOISE_PATTERN = r'[,$€£\s]'
+# Numbers written with a leading zero, e.g. zip codes and account numbers, which are codes rather than quantities
+LEADING_ZERO_PATTERN = r'[-+]?0\d'
+# Column names of codes and identifiers, which are kept as text even when they look like numbers
+IDENTIFIER_NAME_PATTERN = r'(?:^|[^a-z])(?:id|ids|code|codes|zip|zipcode|postcode|postal|sku|account|phone)(?:$|[^a-z])'
+
+BOOLEAN_VALUES = {
+    "true": True, "false": False,
+    "yes": True, "no": False,
+    "y": True, "n": False,
+    "t": True, "f": False
+}
+
+def _detect_date_format(values):
+    """
+    Find the date format that parses a sample of text values.
+
+    Args:
+        values: The non-null values of a text column
+
+    Returns:
+        str: The best matching format from DATE_PATTERNS, or None
+    """
+    sample = values.sample(min(COERCE_SAMPLE_SIZE, len(values)), random_state=0).astype(str).str.strip()
+    best_format, best_rate = None, 0.0
+    for pattern in DATE_PATTERNS:
+        rate = pd.to_datetime(sample, format=pattern, errors="coerce").notna().mean()
+        if rate > best_rate:
+            best_format, best_rate = pattern, rate
+    return best_format if best_rate >= 1 - COERCE_MAX_PARSE_FAILURES else None
+
+def _is_number_text(values):
+    """
+    Check whether every value of a text column is a number with optional separators.
+
+    Args:
+        values: The non-null values of a text column
+
+    Returns:
+        bool: True if all values parse as numbers
+    """
+    text = values.astype(str).str.strip()
+    # Reject on a sample first so text columns are not scanned in full
+    sample = text.sample(min(COERCE_SAMPLE_SIZE, len(text)), random_state=0)
+    if sample.str.match(LEADING_ZERO_PATTERN).any():
+        return False  # Converting would drop the leading zeros
+    return bool(sample.str.fullmatch(NUMBER_PATTERN).all() and text.str.fullmatch(NUMBER_PATTERN).all())
+
+def _is_boolean_text(values):
+    """
+    Check whether a text column only holds boolean-like words (yes/no, true/false, ...).
+
+    Args:
+        values: The non-null values of a text column
+
+    Returns:
+        bool: True if all values map to a boolean
+    """
+    distinct = values.unique()
+    if len(distinct) > len(BOOLEAN_VALUES):
+        return False
+    return all(str(value).strip().lower() in BOOLEAN_VALUES for value in distinct)
+
+def plan_coercions(df, schema):
+    """
+    Decide which columns to convert to native types at ingest.
+
+    Args:
+        df: The pandas DataFrame as parsed from the file
+        schema: The inferred schema (dict mapping column names to types)
+
+    Returns:
+        dict: {column: {"kind": "datetime" | "number" | "boolean" | "narrow", ...}};
+              datetime entries also carry the detected "formats" (one at first)
+    """
+    plan = {}
+    for column, col_type in schema.items():
+        dtype = df[column].dtype
+        if pd.api.types.is_bool_dtype(dtype):
+            continue
+        if pd.api.types.is_integer_dtype(dtype) or pd.api.types.is_float_dtype(dtype):
+            plan[column] = {"kind": "narrow"}
+            continue
+        if not (pd.api.types.is_string_dtype(dtype) or pd.api.types.is_object_dtype(dtype)):
+            continue
+
+        values = df[column].dropna()
+        if values.empty:
+            continue
+        if col_type == "DATETIME":
+            date_format = _detect_date_format(values)
+            if date_format:
+                plan[column] = {"kind": "datetime", "formats": [date_format]}
+        elif _is_boolean_text(values):
+            plan[column] = {"kind": "boolean"}
+        # Categories and identifiers stay text even when their values look like numbers
+        elif col_type == "TEXT" and not re.search(IDENTIFIER_NAME_PATTERN, str(column).lower()) and _is_number_text(values):
+            plan[column] = {"kind": "number"}
+    return plan
+
+def narrow_numeric(series):
+    """
+    Store a numeric column in the narrowest dtype that holds its values.
+
+    Integers go down to int8/int16/int32. Floats become float32 when
+    COERCE_DOWNCAST_FLOATS is set and every value survives the conversion
+    within COERCE_FLOAT_RTOL.
+
+    Args:
+        series: A numeric pandas Series
+
+    Returns:
+        pandas.Series: The narrowed Series
+    """
+    if pd.api.types.is_integer_dtype(series.dtype):
+        return pd.to_numeric(series, downcast="integer")
+    if COERCE_DOWNCAST_FLOATS and series.dtype == np.float64:
+        with np.errstate(over="ignore"):
+            narrowed = series.astype(np.float32)
+        if np.allclose(narrowed.to_numpy(dtype=np.float64), series.to_numpy(), rtol=COERCE_FLOAT_RTOL, atol=0, equal_nan=True):
+            return narrowed
+    return series
+
+def apply_coercions(df, schema, plan, max_failures=COERCE_MAX_PARSE_FAILURES):
+    """
+    Convert columns as planned by plan_coercions.
+
+    Conversions that would turn more than max_failures of a column's values
+    into nulls are skipped.
+
+    Args:
+        df: The pandas DataFrame as parsed from the file
+        schema: The inferred schema
+        plan: The plan returned by plan_coercions
+        max_failures: The fraction of unparseable values tolerated per column
+
+    Returns:
+        tuple: (coerced DataFrame, updated schema, list of converted columns)
+    """
+    coerced = df.copy(deep=False)
+    schema = dict(schema)
+    converted = []
+    for column, step in plan.items():
+        series = df[column]
+        if step["kind"] == "narrow":
+            coerced[column] = narrow_numeric(series)
+            continue
+
+        result, new_type = convert_column(series, step)
+        failures = (result.isna().sum() - series.isna().sum()) / max(series.notna().sum(), 1)
+        if failures > max_failures:
+            logger.warning("Not converting %s to %s: %.1f%% of values failed to parse", column, new_type, failures * 100)
+            continue
+        coerced[column] = result
+        schema[column] = new_type
+        converted.append(column)
+    return coerced, schema, converted
+
+def convert_column(series, step):
+    """
+    Convert a text column as planned by plan_coercions; values that do not parse become nulls.
+
+    Args:
+        series: The text column
+        step: Its "datetime", "boolean" or "number" plan entry
+
+    Returns:
+        tuple: (converted Series, inferred type of the result)
+    """
+    if step["kind"] == "datetime":
+        text = series.astype("string").str.strip()
+        result = pd.to_datetime(text, format=step["formats"][0], errors="coerce")
+        for date_format in step["formats"][1:]:
+            missing = result.isna() & text.notna()
+            if not missing.any():
+                break
+            result = result.where(~missing, pd.to_datetime(text.where(missing), format=date_format, errors="coerce"))
+        return result, "DATETIME"
+    if step["kind"] == "boolean":
+        result = series.astype("string").str.strip().str.lower().map(BOOLEAN_VALUES)
+        result = result.astype("boolean") if result.isna().any() else result.astype(bool)
+        return result, "BOOLEAN"
+    cleaned = series.astype("string").str.replace(NUMBER_NOISE_PATTERN, "", regex=True)
+    result = pd.to_numeric(cleaned.astype(object), errors="coerce")
+    if result.notna().any() and (result.dropna() % 1 == 0).all() and not result.isna().any():
+        result = result.astype(np.int64)
+    result = narrow_numeric(result)
+    return result, "INTEGER" if pd.api.types.is_integer_dtype(result.dtype) else "FLOAT"
+
+def coerce_chunk(df, plan):
+    """
+    Convert a later chunk of a file the way its first chunk was converted.
+
+    Dates that switch to another format part-way through the file are parsed
+    with the new format too, which is added to the step (the plan is updated
+    in place). Columns whose values no longer fit their conversion, i.e. more
+    than COERCE_MAX_PARSE_FAILURES of them fail to parse, are left as text.
+
+    Args:
+        df: The chunk as parsed from the file
+        plan: The text conversions applied to the first chunk ({column: step})
+
+    Returns:
+        tuple: (coerced DataFrame, {column: values loaded as nulls because they did not parse},
+                list of columns left as text)
+    """
+    coerced = df.copy(deep=False)
+    lost = {}
+    drifted = []
+    for column, step in plan.items():
+        series = df[column]
+        result, _ = convert_column(series, step)
+        failed = result.isna() & series.notna()
+        if failed.any() and step["kind"] == "datetime":
+            date_format = _detect_date_format(series[failed])
+            if date_format and date_format not in step["formats"]:
+                logger.info("Dates in %s switch to the format %s", column, date_format)
+                step["formats"].append(date_format)
+                result, _ = convert_column(series, step)
+                failed = result.isna() & series.notna()
+        if failed.sum() > COERCE_MAX_PARSE_FAILURES * max(series.notna().sum(), 1):
+            drifted.append(column)
+            continue
+        if failed.any():
+            lost[column] = int(failed.sum())
+        coerced[column] = result
+    return coerced, lost, drifted
+
+def coerce_types(df, schema):
+    """
+    Materialize the inferred types once at ingest: parse detected dates, numbers
+    written as text and boolean-like text, and narrow numeric widths.
+
+    Args:
+        df: The pandas DataFrame as parsed from the file
+        schema: The inferred schema (dict mapping column names to types)
+
+    Returns:
+        tuple: (coerced DataFrame, updated schema, list of converted columns)
+    """
+    return apply_coercions(df, schema, plan_coercions(df, schema))
@@ -0,0 +1,299 @@
+import re
+import bisect
+import difflib
+import logging
+
+# Import custom modules
+from core.db.duckdb_manager import quote_identifier
+from utils.config import VALUE_INDEX_MAX_VALUES, VALUE_INDEX_FUZZY_CUTOFF
+from utils.telemetry import increment
+
+logger = logging.getLogger(__name__)
+
+# Question words that never name a stored value
+STOPWORDS = {
+    "the", "and", "for", "with", "what", "which", "show", "list", "give", "from", "that", "this",
+    "are", "was", "were", "how", "many", "much", "per", "by", "in", "of", "on", "to", "a", "an",
+    "is", "me", "all", "each", "total", "average", "sum", "count", "top", "only", "now", "just"
+}
+
+# column = 'literal', column <> 'literal', column != 'literal'
+_COMPARISON_PATTERN = re.compile(
+    r"(?P<column>\"(?:[^\"]|\"\")+\"|[A-Za-z_]\w*)\s*(?P<op>=|<>|!=)\s*'(?P<literal>(?:[^']|'')*)'"
+)
+# column [NOT] IN ('a', 'b', ...)
+_IN_LIST_PATTERN = re.compile(
+    r"(?P<column>\"(?:[^\"]|\"\")+\"|[A-Za-z_]\w*)\s+(?P<op>(?:NOT\s+)?IN)\s*\((?P<items>\s*'(?:[^']|'')*'(?:\s*,\s*'(?:[^']|'')*')*\s*)\)",
+    re.IGNORECASE
+)
+_LITERAL_PATTERN = re.compile(r"'((?:[^']|'')*)'")
+
+def normalize_value(text):
+    """
+    Normalize text for value lookup: lower case, words separated by single spaces.
+
+    Args:
+        text: The text to normalize
+
+    Returns:
+        str: The normalized text
+    """
+    return " ".join(re.findall(r'[a-z0-9]+', str(text).lower()))
+
+def _singular_forms(term):
+    """
+    Guess the singular forms of a (possibly plural) term.
+
+    Args:
+        term: A normalized term
+
+    Returns:
+        list: Candidate singular forms, e.g. ["laptop"] for "laptops"
+    """
+    forms = []
+    if term.endswith("ies") and len(term) > 4:
+        forms.append(term[:-3] + "y")
+    if term.endswith("es") and len(term) > 3:
+        forms.append(term[:-2])
+    if term.endswith("s") and len(term) > 2:
+        forms.append(term[:-1])
+    return forms
+
+def _trigrams(term):
+    """
+    Split a term into the character trigrams used for fuzzy lookup.
+
+    Args:
+        term: A normalized term
+
+    Returns:
+        set: The trigrams of the padded term
+    """
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class ValueIndex:
+    """
+    In-memory inverted index of the distinct values of categorical columns.
+
+    Question terms such as "north" or "laptops" are resolved to the values as
+    stored ('North', 'Laptop') by case-insensitive, plural, prefix and fuzzy
+    lookup, so the generated SQL filters on literals that exist.
+    """
+
+    def __init__(self, column_values):
+        """
+        Args:
+            column_values: {column: list of distinct values as text}
+        """
+        self.columns = {column: set(values) for column, values in column_values.items()}
+        self._entries = {}
+        self._trigram_index = {}
+        for column, values in column_values.items():
+            for value in values:
+                key = normalize_value(value)
+                if not key:
+                    continue
+                self._entries.setdefault(key, []).append((column, value))
+        for key in self._entries:
+            for trigram in _trigrams(key):
+                self._trigram_index.setdefault(trigram, set()).add(key)
+        # Whole values and each of their words, sorted for prefix search
+        self._prefixes = sorted({(word, key) for key in self._entries for word in [key, *key.split(" ")]})
+
+    def __len__(self):
+        return len(self._entries)
+
+    def lookup(self, term, column=None, limit=5):
+        """
+        Find the stored values matching a term.
+
+        Exact (case-insensitive) and singular matches are preferred, then values
+        or value words starting with the term, then values spelled similarly.
+
+        Args:
+            term: The text to look up
+            column: Optional column to restrict the lookup to
+            limit: The maximum number of matches
+
+        Returns:
+            list: {"column", "value", "match": "exact" | "prefix" | "fuzzy"} dicts, best first
+        """
+        key = normalize_value(term)
+        if not key:
+            return []
+
+        def entries(keys, match):
+            found = []
+            for found_key in keys:
+                for entry_column, value in self._entries.get(found_key, []):
+                    if column is None or entry_column == column:
+                        found.append({"column": entry_column, "value": value, "match": match})
+            return found[:limit]
+
+        exact = entries([key, *_singular_forms(key)], "exact")
+        if exact:
+            return exact
+
+        if len(key) >= 3:
+            start = bisect.bisect_left(self._prefixes, (key, ""))
+            prefixed = []
+            for word, found_key in self._prefixes[start:]:
+                if not word.startswith(key):
+                    break
+                if found_key not in prefixed:
+                    prefixed.append(found_key)
+            prefix = entries(sorted(prefixed, key=len), "prefix")
+            if prefix:
+                return prefix
+
+        # Candidates share trigrams with the term; the closest spellings win
+        shared = {}
+        for trigram in _trigrams(key):
+            for candidate in self._trigram_index.get(trigram, ()):
+                shared[candidate] = shared.get(candidate, 0) + 1
+        candidates = sorted(shared, key=shared.get, reverse=True)[:50]
+        scored = [
+            (difflib.SequenceMatcher(None, key, candidate).ratio(), candidate)
+            for candidate in candidates
+        ]
+        close = [candidate for ratio, candidate in sorted(scored, reverse=True) if ratio >= VALUE_INDEX_FUZZY_CUTOFF]
+        return entries(close, "fuzzy")
+
+    def resolve_question(self, nl_query):
+        """
+        Find the stored values a question refers to.
+
+        Phrases of up to three words are looked up, longest first, so "home
+        office" resolves before "office".
+
+        Args:
+            nl_query: The natural language question
+
+        Returns:
+            list: {"term", "column", "value", "match"} dicts, in question order
+        """
+        words = normalize_value(nl_query).split(" ")
+        column_names = {normalize_value(column) for column in self.columns}
+        resolved = []
+        used = set()
+        for size in (3, 2, 1):
+            for start in range(len(words) - size + 1):
+                positions = set(range(start, start + size))
+                if positions & used:
+                    continue
+                phrase = " ".join(words[start:start + size])
+                if size == 1 and (len(phrase) < 3 or phrase in STOPWORDS):
+                    continue
+                if phrase in column_names:
+                    continue
+                matches = self.lookup(phrase, limit=1)
+                # Multi-word phrases only resolve to whole values, not to prefixes or typos
+                if matches and (size == 1 or matches[0]["match"] == "exact"):
+                    used |= positions
+                    resolved.append({"term": phrase, "position": start, **matches[0]})
+        resolved.sort(key=lambda match: match.pop("position"))
+        return resolved
+
+    def repair_literals(self, sql_query):
+        """
+        Replace filter literals that are not stored values of their column with
+        the closest stored value, e.g. "Region" = 'north' -> "Region" = 'North'.
+
+        Args:
+            sql_query: The SQL query
+
+        Returns:
+            tuple: (repaired query, list of repair descriptions)
+        """
+        repairs = []
+        by_lower = {column.lower(): column for column in self.columns}
+
+        def resolve_column(identifier):
+            if identifier.startswith('"'):
+                identifier = identifier[1:-1].replace('""', '"')
+            return by_lower.get(identifier.lower())
+
+        def repair(column, literal):
+            text = literal.replace("''", "'")
+            if text in self.columns[column]:
+                return literal
+            matches = self.lookup(text, column=column, limit=1)
+            if not matches:
+                return literal
+            repairs.append(f"{column}: '{text}' -> '{matches[0]['value']}'")
+            return matches[0]["value"].replace("'", "''")
+
+        def repair_comparison(match):
+            column = resolve_column(match.group("column"))
+            if column is None:
+                return match.group(0)
+            literal = repair(column, match.group("literal"))
+            return f"{match.group('column')} {match.group('op')} '{literal}'"
+
+        def repair_in_list(match):
+            column = resolve_column(match.group("column"))
+            if column is None:
+                return match.group(0)
+            items = _LITERAL_PATTERN.sub(lambda item: f"'{repair(column, item.group(1))}'", match.group("items"))
+            return f"{match.group('column')} {match.group('op')} ({items})"
+
+        sql_query = _COMPARISON_PATTERN.sub(repair_comparison, sql_query)
+        sql_query = _IN_LIST_PATTERN.sub(repair_in_list, sql_query)
+        if repairs:
+            increment("filter_literal_repairs_total", len(repairs))
+        return sql_query, repairs
+
+def merge_value_indexes(index, other):
+    """
+    Combine the value indexes of a table and of rows appended to it.
+
+    A column stays indexed only if both indexes have it and the combined
+    values stay within VALUE_INDEX_MAX_VALUES.
+
+    Args:
+        index: The table's ValueIndex
+        other: The ValueIndex of the appended rows
+
+    Returns:
+        ValueIndex: The combined index
+    """
+    column_values = {}
+    for column, values in index.columns.items():
+        if column not in other.columns:
+            continue
+        merged = values | other.columns[column]
+        if len(merged) > VALUE_INDEX_MAX_VALUES:
+            logger.info("No longer indexing values of %s: more than %d distinct values", column, VALUE_INDEX_MAX_VALUES)
+            continue
+        column_values[column] = sorted(merged)
+    return ValueIndex(column_values)
+
+def build_value_index(connection, table_name, schema):
+    """
+    Index the distinct values of a table's CATEGORICAL columns.
+
+    Columns with more than VALUE_INDEX_MAX_VALUES distinct values are skipped.
+
+    Args:
+        connection: The DuckDB connection
+        table_name: The name of the table
+        schema: The inferred schema (dict mapping column names to types)
+
+    Returns:
+        ValueIndex: The index
+    """
+    column_values = {}
+    for column, col_type in schema.items():
+        if col_type != "CATEGORICAL":
+            continue
+        quoted = quote_identifier(column)
+        rows = connection.execute(
+            f"SELECT DISTINCT CAST({quoted} AS VARCHAR) FROM {quote_identifier(table_name)} "
+            f"WHERE {quoted} IS NOT NULL LIMIT {int(VALUE_INDEX_MAX_VALUES) + 1}"
+        ).fetchall()
+        if len(rows) > VALUE_INDEX_MAX_VALUES:
+            logger.info("Not indexing values of %s: more than %d distinct values", column, VALUE_INDEX_MAX_VALUES)
+            continue
+        column_values[column] = [row[0] for row in rows]
+    return ValueIndex(column_values)
@@ -0,0 +1,126 @@
+import re
+import logging
+
+# Import custom modules
+from utils.config import OPENAI_MODEL, OPENAI_FAST_MODEL, ROUTER_SIMPLE_MAX_SCORE, ROUTER_WIDE_SCHEMA_COLUMNS
+from utils.telemetry import increment
+
+logger = logging.getLogger(__name__)
+
+# Phrases that usually need joins, subqueries or set operations
+_COMBINING_PATTERN = re.compile(
+    r'\b(?:compare|comparison|versus|vs\.?|ratio|share of|percentage of|percent of|proportion|'
+    r'relative to|contribution|difference between|correlat\w*|both|except|excluding|not in|'
+    r'more than (?:the )?average|above (?:the )?average|below (?:the )?average)\b',
+    re.IGNORECASE
+)
+# Phrases that usually need window functions or date arithmetic
+_WINDOW_PATTERN = re.compile(
+    r'\b(?:running|cumulative|rolling|moving average|rank\w*|top \d+ (?:per|in each|for each|by each)|'
+    r'(?:month|year|week|quarter|day) over (?:month|year|week|quarter|day)|\w+-over-\w+|'
+    r'growth|change from|previous|prior|trend|since|last \d+ (?:days|weeks|months|years)|'
+    r'year to date|ytd|percentile|median|first|latest|streak)\b',
+    re.IGNORECASE
+)
+# Phrases of simple lookups and single aggregates
+_SIMPLE_PATTERN = re.compile(
+    r'^\s*(?:what is|what are|show|list|how many|count|total|sum|average|avg|max|min|top \d+)\b',
+    re.IGNORECASE
+)
+
+def _mentioned_columns(nl_query, schema):
+    """
+    Find the schema columns a question mentions by name.
+
+    Underscores in column names match spaces in the question, so "unit_price"
+    is found in "average unit price".
+
+    Args:
+        nl_query: The natural language question
+        schema: The table schema (dict mapping column names to types)
+
+    Returns:
+        list: The mentioned column names
+    """
+    question = " " + re.sub(r'[^a-z0-9]+', ' ', nl_query.lower()) + " "
+    mentioned = []
+    for column in schema:
+        name = re.sub(r'[^a-z0-9]+', ' ', str(column).lower()).strip()
+        if name and f" {name} " in question:
+            mentioned.append(column)
+    return mentioned
+
+def score_question(nl_query, schema):
+    """
+    Score how hard a question is to translate to SQL, without calling a model.
+
+    Args:
+        nl_query: The natural language question
+        schema: The table schema (dict mapping column names to types)
+
+    Returns:
+        dict: {"score": complexity score (higher is harder), "columns": mentioned columns,
+               "reasons": list of what added to the score}
+    """
+    columns = _mentioned_columns(nl_query, schema)
+    score = 0
+    reasons = []
+
+    combining = _COMBINING_PATTERN.findall(nl_query)
+    if combining:
+        score += 2 * len(combining)
+        reasons.append(f"combines results ({', '.join(combining)})")
+
+    windows = _WINDOW_PATTERN.findall(nl_query)
+    if windows:
+        score += 2 * len(windows)
+        reasons.append(f"window or time logic ({', '.join(windows)})")
+
+    if len(columns) > 2:
+        score += len(columns) - 2
+        reasons.append(f"{len(columns)} columns")
+
+    if len(schema) > ROUTER_WIDE_SCHEMA_COLUMNS:
+        score += 1
+        reasons.append(f"wide schema ({len(schema)} columns)")
+
+    if len(nl_query.split()) > 25:
+        score += 1
+        reasons.append("long question")
+
+    if not _SIMPLE_PATTERN.match(nl_query):
+        score += 1
+        reasons.append("not a plain lookup or aggregate")
+
+    return {"score": score, "columns": columns, "reasons": reasons}
+
+def choose_model(nl_query, schema):
+    """
+    Pick the model to generate SQL for a question.
+
+    Simple questions go to OPENAI_FAST_MODEL. Questions scoring above
+    ROUTER_SIMPLE_MAX_SCORE, and questions naming no column of the schema
+    (where the fast model has to guess), go to OPENAI_MODEL.
+
+    Args:
+        nl_query: The natural language question
+        schema: The table schema (dict mapping column names to types)
+
+    Returns:
+        dict: {"model": the model name, "score", "columns", "reasons"}, see score_question
+    """
+    scored = score_question(nl_query, schema)
+    if not OPENAI_FAST_MODEL or OPENAI_FAST_MODEL == OPENAI_MODEL:
+        model = OPENAI_MODEL
+    elif scored["score"] > ROUTER_SIMPLE_MAX_SCORE:
+        model = OPENAI_MODEL
+    elif not scored["columns"]:
+        # Low confidence: nothing in the question pins down the columns
+        model = OPENAI_MODEL
+        scored["reasons"].append("no column named")
+    else:
+        model = OPENAI_FAST_MODEL
+
+    increment("model_routes_total", model=model)
+    logger.debug("Routing question to %s (score %d: %s)", model, scored["score"], "; ".join(scored["reasons"]))
+    return {"model": model, **scored}
@@ -1,31 +1,151 @@
-import os
-import openai
-from dotenv import load_dotenv
+import time
 import json
+from contextlib import nullcontext
 
-# Load environment variables
-load_dotenv()
+# Import custom modules
+from core.db.profiler import describe_column
+from core.db.sql_repair import check_and_repair_sql
+from core.nlp.model_router import choose_model
+from utils.config import OPENAI_API_KEY, OPENAI_MODEL
+from utils.telemetry import span, increment, observe
 
-# Set OpenAI API key from environment
-openai.api_key = os.getenv("OPENAI_API_KEY")
+# The OpenAI client, imported on the first completion: importing it is a large
+# share of the app's start-up time and it is not needed to render the first page
+_openai = None
 
-def generate_sql_from_nl_query(nl_query, table_name, schema):
+# Optional replacement for the OpenAI API, e.g. a deterministic local stub for benchmarks
+_completion_backend = None
+
+def set_completion_backend(backend):
     """
-    Convert a natural language query to SQL using OpenAI's API.
+    Route chat completions to a different backend instead of the OpenAI API.
+    
+    Args:
+        backend: A callable taking (messages, **params) and returning the response text,
+                 or None to use the OpenAI API again
+    """
+    global _completion_backend
+    _completion_backend = backend
+
+def _get_openai():
+    """
+    Import and configure the OpenAI client on first use.
+    
+    Returns:
+        module: The configured openai module
+    """
+    global _openai
+    if _openai is None:
+        import openai
+        openai.api_key = OPENAI_API_KEY
+        _openai = openai
+    return _openai
+
+def create_chat_completion(messages, **params):
+    """
+    Run a chat completion and return the text of the first choice.
+    
+    Args:
+        messages: The chat messages
+        **params: Completion parameters (model, temperature, max_tokens, ...)
+        
+    Returns:
+        str: The response text
+    """
+    model = params.get("model")
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        with span("llm_call", model=model) as llm_span:
+            if _completion_backend is not None:
+                response_text = _completion_backend(messages, **params)
+                outcome = "ok"
+                return response_text
+            
+            response = _get_openai().ChatCompletion.create(messages=messages, **params)
+            
+            # Record token usage for the span and the per-model token counters
+            usage = getattr(response, "usage", None)
+            if usage is not None:
+                llm_span["prompt_tokens"] = usage.prompt_tokens
+                llm_span["completion_tokens"] = usage.completion_tokens
+                increment("llm_tokens_total", usage.prompt_tokens, model=model, kind="prompt")
+                increment("llm_tokens_total", usage.completion_tokens, model=model, kind="completion")
+            
+            outcome = "ok"
+            return response.choices[0].message['content']
+    finally:
+        # Per-model latency and call counts, for weighing cost against latency
+        observe("llm_call_duration_seconds", time.perf_counter() - start, model=model)
+        increment("llm_calls_total", model=model, outcome=outcome)
+
+def describe_prior_results(prior_results):
+    """
+    Describe the cached results of recent questions for the system prompt.
+    
+    Args:
+        prior_results: The list returned by ResultCache.describe()
+        
+    Returns:
+        str: The prompt section, or "" if there are no prior results
+    """
+    if not prior_results:
+        return ""
+    results_info = "\n".join(
+        f'- `{result["table"]}` ({result["rows"]:,} rows), the answer to "{result["question"]}"'
+        f' (SQL: {" ".join(result["sql"].split())}); columns: '
+        + ", ".join(f"{column} ({col_type})" for column, col_type in result["columns"].items())
+        for result in prior_results
+    )
+    return f"""
+    Results of recent questions are stored as tables, most recent first:
+    {results_info}
+    If the question refines one of these results (e.g. "now only for X", "sort that by Y",
+    "just the top 3"), query that result table instead of the main table. Otherwise query the main table.
+    """
+
+def describe_value_matches(value_matches):
+    """
+    Describe the stored values a question refers to, for the system prompt.
+    
+    Args:
+        value_matches: The list returned by ValueIndex.resolve_question()
+        
+    Returns:
+        str: The prompt section, or "" if there are no matches
+    """
+    if not value_matches:
+        return ""
+    matches_info = "\n".join(
+        f'- "{match["term"]}" is {match["column"]} = \'{match["value"]}\''
+        for match in value_matches
+    )
+    return f"""
+    Words in the question that name stored values; filter on these exact values:
+    {matches_info}
+    """
+
+def build_system_message(table_name, schema, profile=None, prior_results=None, value_matches=None):
+    """
+    Build the system prompt describing the table and the SQL generation rules.
     
     Args:
-        nl_query: The natural language query from the user
         table_name: The name of the table to query
         schema: The schema of the table (dict mapping column names to types)
+        profile: Optional whole-table profile used to describe column values
+        prior_results: Optional descriptions of cached recent results (ResultCache.describe())
+        value_matches: Optional stored values named in the question (ValueIndex.resolve_question())
         
     Returns:
-        str: The generated SQL query
+        str: The system message
     """
-    if not openai.api_key:
-        raise ValueError("OpenAI API key not found. Please set OPENAI_API_KEY environment variable.")
-    
-    # Construct schema information for the prompt
-    schema_info = "\n".join([f"- {col_name} ({col_type})" for col_name, col_type in schema.items()])
+    # Construct schema information for the prompt, describing column values when profiled
+    profiled_columns = profile["columns"] if profile else {}
+    schema_info = "\n".join([
+        f"- {col_name} ({col_type})"
+        + (f": {describe_column(profiled_columns[col_name])}" if col_name in profiled_columns else "")
+        for col_name, col_type in schema.items()
+    ])
     
     # Build system message with context
     system_message = f"""
@@ -45,22 +165,78 @@ def generate_sql_from_nl_query(nl_query, table_name, schema):
     6. Make educated guesses about what columns to use based on the query and schema.
     7. Always limit results to at most 1000 rows by default with LIMIT 1000.
     8. If the question asks for a specific number of results (e.g. "top 5"), use LIMIT appropriately.
+    """ + describe_value_matches(value_matches) + describe_prior_results(prior_results)
+    
+    return system_message
+
+def generate_sql_from_nl_query(nl_query, table_name, schema, profile=None, prior_results=None, model=OPENAI_MODEL):
+    """
+    Convert a natural language query to SQL using OpenAI's API.
+    
+    Args:
+        nl_query: The natural language query from the user
+        table_name: The name of the table to query
+        schema: The schema of the table (dict mapping column names to types)
+        profile: Optional whole-table profile used to describe column values
+        prior_results: Optional descriptions of cached recent results the SQL may
+                       query instead of the table (ResultCache.describe())
+        model: The model to generate the SQL with
+        
+    Returns:
+        str: The generated SQL query
+    """
+    if not OPENAI_API_KEY and _completion_backend is None:
+        raise ValueError("OpenAI API key not found. Please set OPENAI_API_KEY environment variable.")
+    
+    with span("prompt_build"):
+        system_message = _question_system_message(nl_query, table_name, schema, profile, prior_results)
+    
+    return _complete_sql([
+        {"role": "system", "content": system_message},
+        {"role": "user", "content": nl_query}
+    ], model)
+
+def _question_system_message(nl_query, table_name, schema, profile=None, prior_results=None):
+    """
+    Build the system prompt for a question, resolving the values it names to
+    how they are stored when the profile has a value index.
+    
+    Args:
+        nl_query: The natural language query from the user
+        table_name: The name of the table to query
+        schema: The schema of the table (dict mapping column names to types)
+        profile: Optional whole-table profile
+        prior_results: Optional descriptions of cached recent results
+        
+    Returns:
+        str: The system message
     """
+    value_index = profile.get("value_index") if profile else None
+    value_matches = value_index.resolve_question(nl_query) if value_index else None
+    return build_system_message(table_name, schema, profile, prior_results, value_matches)
+
+def _complete_sql(messages, model):
+    """
+    Ask the LLM for a SQL query and extract it from the response.
     
+    Args:
+        messages: The chat messages
+        model: The model to ask
+        
+    Returns:
+        str: The SQL query
+    """
     try:
         # Create a chat completion
-        response = openai.ChatCompletion.create(
-            model="gpt-4o",  # Use gpt-4o
-            messages=[
-                {"role": "system", "content": system_message},
-                {"role": "user", "content": nl_query}
-            ],
+        response_text = create_chat_completion(
+            model=model,
+            messages=messages,
             temperature=0.1,  # Low temperature for more deterministic output
             max_tokens=300    # Limit response length
         )
         
         # Extract the SQL query from the response
-        sql_query = response.choices[0].message['content'].strip()
+        sql_query = response_text.strip()
         
         # If the response includes backticks, extract just the SQL part
         if "```sql" in sql_query:
@@ -73,6 +249,76 @@ def generate_sql_from_nl_query(nl_query, table_name, schema):
     except Exception as e:
         raise Exception(f"Error generating SQL from natural language: {str(e)}")
 
+def generate_checked_sql(nl_query, connection, table_name, schema, profile=None, prior_results=None, lock=None):
+    """
+    Generate SQL for a question and check it against the database before it runs.
+    
+    Simple questions are answered by the fast model (see choose_model). The
+    generated query is bound locally with EXPLAIN and common mistakes are
+    repaired offline (see check_and_repair_sql). Only if that fails is the LLM
+    asked once more, with the DuckDB error; this retry always uses OPENAI_MODEL,
+    and the corrected query is checked again.
+    
+    Args:
+        nl_query: The natural language query from the user
+        connection: The DuckDB connection the query will run on
+        table_name: The name of the table to query
+        schema: The schema of the table (dict mapping column names to types)
+        profile: Optional whole-table profile used to describe column values
+        prior_results: Optional descriptions of cached recent results (ResultCache.describe())
+        lock: Optional lock guarding the connection, held while a query is
+              checked but not while the LLM is called
+        
+    Returns:
+        str: The checked SQL query
+    """
+    prior_results = prior_results or []
+    lock = lock or nullcontext()
+    columns = list(schema) + [column for result in prior_results for column in result["columns"]]
+    other_tables = [result["table"] for result in prior_results]
+    
+    route = choose_model(nl_query, schema)
+    sql_query = generate_sql_from_nl_query(nl_query, table_name, schema, profile, prior_results, route["model"])
+    with lock:
+        checked = check_and_repair_sql(connection, sql_query, table_name, columns, other_tables)
+    _record_generation(route["model"], checked)
+    if checked["error"] is None:
+        return checked["sql"]
+    
+    # One bounded retry that shows the LLM what went wrong, escalated to the main model
+    increment("sql_llm_retries_total", model=OPENAI_MODEL)
+    with span("prompt_build", retry=True):
+        system_message = _question_system_message(nl_query, table_name, schema, profile, prior_results)
+    sql_query = _complete_sql([
+        {"role": "system", "content": system_message},
+        {"role": "user", "content": nl_query},
+        {"role": "assistant", "content": checked["sql"]},
+        {"role": "user", "content": f"That query fails in DuckDB with this error:\n{checked['error']}\nReturn a corrected query."}
+    ], OPENAI_MODEL)
+    with lock:
+        checked = check_and_repair_sql(connection, sql_query, table_name, columns, other_tables)
+    _record_generation(OPENAI_MODEL, checked)
+    if checked["error"] is not None:
+        increment("sql_check_failures_total")
+        raise ValueError(f"Generated SQL is invalid: {checked['error']}")
+    return checked["sql"]
+
+def _record_generation(model, checked):
+    """
+    Count a generated query by model and by whether it needed repairs or failed,
+    giving the per-model success rate.
+    
+    Args:
+        model: The model that generated the query
+        checked: The result of check_and_repair_sql
+    """
+    if checked["error"] is not None:
+        outcome = "invalid"
+    elif checked["repairs"]:
+        outcome = "repaired"
+    else:
+        outcome = "valid"
+    increment("sql_generations_total", model=model, outcome=outcome)
 
 def extract_query_intent(nl_query):
     """
@@ -86,8 +332,8 @@ def extract_query_intent(nl_query):
     """
     try:
         # Create a chat completion
-        response = openai.ChatCompletion.create(
-            model="gpt-4o", # Use gpt-4o
+        response_text = create_chat_completion(
+            model=OPENAI_MODEL,
             messages=[
                 {"role": "system", "content": """
                 You need to extract the query intent from a natural language question about data.
@@ -107,7 +353,7 @@ def extract_query_intent(nl_query):
         )
         
         # Extract the JSON response
-        intent = json.loads(response.choices[0].message['content'])
+        intent = json.loads(response_text)
         return intent
         
     except Exception as e:
@@ -1,5 +1,3 @@
-import plotly.express as px
-import plotly.graph_objects as go
 import pandas as pd
 import numpy as np
 
@@ -15,6 +13,10 @@ def generate_chart(df, chart_type, query=None):
     Returns:
         plotly.graph_objects.Figure: The generated chart
     """
+    # Plotly is imported on the first chart rather than at start-up
+    import plotly.express as px
+    import plotly.graph_objects as go
+    
     # Handle empty data
     if df.empty:
         # Return an empty figure with a message
@@ -122,7 +124,8 @@ def generate_chart(df, chart_type, query=None):
                     index=categorical_cols[0],
                     columns=categorical_cols[1],
                     values=numeric_cols[0],
-                    aggfunc='mean'
+                    aggfunc='mean',
+                    observed=True  # Group on the categories present, not every category
                 )
                 
                 # Create heatmap
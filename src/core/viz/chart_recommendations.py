@@ -1,120 +1,169 @@
 import pandas as pd
-import numpy as np
 import re
 
-def recommend_chart_type(df, query=None):
+# Import custom modules
+from core.db.query_executor import get_result_metadata
+
+# Chart types in tie-breaking order
+CHART_TYPES = ["bar", "line", "scatter", "pie", "histogram", "box", "heatmap"]
+
+# Explicit chart type mentions in the query
+CHART_MENTIONS = {
+    "bar": ["bar chart", "bar graph", "barchart", "column chart"],
+    "line": ["line chart", "line graph", "linechart", "trend", "over time", "time series"],
+    "scatter": ["scatter plot", "scatterplot", "scatter chart", "relationship", "correlation"],
+    "pie": ["pie chart", "piechart", "donut chart", "proportion"],
+    "histogram": ["histogram", "distribution"],
+    "box": ["box plot", "boxplot", "box and whisker", "whisker", "quartile"],
+    "heatmap": ["heatmap", "heat map", "correlation matrix"]
+}
+
+# Column names that suggest a time axis
+TIME_INDICATORS = ["date", "time", "year", "month", "day", "created", "updated", "timestamp"]
+
+# One pattern for all keywords; longer keywords come first so "correlation matrix" wins over "correlation"
+_KEYWORD_TO_CHART = {keyword: chart for chart, keywords in CHART_MENTIONS.items() for keyword in keywords}
+_KEYWORD_PATTERN = re.compile("|".join(
+    re.escape(keyword) for keyword in sorted(_KEYWORD_TO_CHART, key=len, reverse=True)
+))
+
+# Scores for the ranking; an explicit mention in the query outranks any data-based rule
+MENTION_SCORE = 3.0
+TIME_SERIES_SCORE = 1.5
+MONOTONIC_TIME_BONUS = 0.3
+PROPORTION_SCORE = 1.2
+TWO_COLUMN_BAR_SCORE = 1.0
+SCATTER_SCORE = 0.8
+HISTOGRAM_SCORE = 0.7
+HEATMAP_SCORE = 0.6
+DEFAULT_BAR_SCORE = 0.1
+
+def recommend_chart_type(df, query=None, profile=None):
     """
     Recommend the best chart type based on the data and query.
-    
+
     Args:
         df: The pandas DataFrame with query results
         query: The natural language query that generated the results
-        
+        profile: Optional whole-table profile, used for column types instead of rescanning
+
     Returns:
         str: The recommended chart type
     """
-    # Default chart type
-    default_chart = "bar"
-    
     # Empty dataframe check
     if df is None or df.empty or df.shape[1] == 0:
-        return default_chart
-        
-    # Use the query to infer intent if available
+        return "bar"
+
+    return rank_chart_types(get_result_metadata(df), query, profile)[0][0]
+
+def rank_chart_types(metadata, query=None, profile=None):
+    """
+    Score every chart type for a result, using only its precomputed metadata.
+
+    Args:
+        metadata: The result metadata from the query executor
+        query: The natural language query that generated the results
+        profile: Optional whole-table profile
+
+    Returns:
+        list: (chart_type, score) tuples, best first
+    """
+    scores = dict.fromkeys(CHART_TYPES, 0.0)
+    scores["bar"] = DEFAULT_BAR_SCORE
+
+    # Explicit chart type mentions in the query
     if query:
-        # Check for explicit chart type mentions
-        chart_mentions = {
-            "bar": ["bar chart", "bar graph", "barchart", "column chart"],
-            "line": ["line chart", "line graph", "linechart", "trend", "over time", "time series"],
-            "scatter": ["scatter plot", "scatterplot", "scatter chart", "relationship", "correlation"],
-            "pie": ["pie chart", "piechart", "donut chart", "proportion"],
-            "histogram": ["histogram", "distribution"],
-            "box": ["box plot", "boxplot", "box and whisker", "whisker", "quartile"],
-            "heatmap": ["heatmap", "heat map", "correlation matrix"]
-        }
-        
-        # Check for mentions
-        query_lower = query.lower()
-        for chart_type, keywords in chart_mentions.items():
-            if any(keyword in query_lower for keyword in keywords):
-                return chart_type
-    
-    # Data-based recommendation (if no explicit mention in query)
-    
-    # Get numeric and non-numeric columns
-    numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
-    categorical_cols = df.select_dtypes(exclude=[np.number]).columns.tolist()
-    
-    num_columns = df.shape[1]
-    
-    # Small number of columns with numeric and categorical data
-    if 1 <= len(categorical_cols) <= 2 and 1 <= len(numeric_cols) <= 3:
-        # For just 2 columns with 1 categorical and 1 numeric, use a bar chart
-        if num_columns == 2 and len(categorical_cols) == 1 and len(numeric_cols) == 1:
-            return "bar"
-            
-    # Time series detection
-    datetime_cols = [col for col in df.columns if is_datetime_like(df[col])]
-    if datetime_cols and len(numeric_cols) >= 1:
-        return "line"
-    
-    # For two numeric columns, suggest scatter plot
+        for chart_type in {_KEYWORD_TO_CHART[match.group(0)] for match in _KEYWORD_PATTERN.finditer(query.lower())}:
+            scores[chart_type] += MENTION_SCORE
+
+    columns = metadata["columns"]
+    numeric_cols = [col for col, info in columns.items() if info["role"] == "numeric"]
+    categorical_cols = [col for col, info in columns.items() if info["role"] != "numeric"]
+    profiled_columns = profile["columns"] if profile else {}
+    time_cols = [
+        col for col, info in columns.items()
+        if is_time_column(col, info["role"]) or profiled_columns.get(col, {}).get("type") == "DATETIME"
+    ]
+
+    # One category and one measure
+    if len(columns) == 2 and len(categorical_cols) == 1 and len(numeric_cols) == 1:
+        scores["bar"] += TWO_COLUMN_BAR_SCORE
+
+    # Time series
+    if time_cols and numeric_cols:
+        scores["line"] += TIME_SERIES_SCORE
+        if any(columns[col]["monotonic"] for col in time_cols):
+            scores["line"] += MONOTONIC_TIME_BONUS
+
+    # Two measures
     if len(numeric_cols) == 2 and len(categorical_cols) <= 1:
-        return "scatter"
-    
-    # If single numeric column, suggest histogram
+        scores["scatter"] += SCATTER_SCORE
+
+    # A single measure
     if len(numeric_cols) == 1 and len(categorical_cols) == 0:
-        return "histogram"
-    
-    # For many categorical columns and one numeric, suggest a heatmap
-    if len(categorical_cols) >= 2 and len(numeric_cols) == 1:
-        # Check if the data is suitable for a heatmap (not too sparse)
-        if df.shape[0] <= 50:  # Not too many rows
-            return "heatmap"
-    
-    # For proportion data (percentages adding to ~100), suggest pie chart
-    if len(numeric_cols) == 1 and len(categorical_cols) == 1:
-        if is_proportion_data(df, numeric_cols[0]):
-            return "pie"
-    
-    # Default to bar chart for most other cases
-    return default_chart
+        scores["histogram"] += HISTOGRAM_SCORE
+
+    # Two or more categories and one measure, if not too sparse
+    if len(categorical_cols) >= 2 and len(numeric_cols) == 1 and metadata["row_count"] <= 50:
+        scores["heatmap"] += HEATMAP_SCORE
+
+    # Proportion data (percentages adding to ~100)
+    if len(numeric_cols) == 1 and len(categorical_cols) == 1 and is_proportion_total(columns[numeric_cols[0]]["sum"]):
+        scores["pie"] += PROPORTION_SCORE
+
+    return sorted(scores.items(), key=lambda item: (-item[1], CHART_TYPES.index(item[0])))
+
+def is_time_column(name, role):
+    """
+    Check if a column holds or names a time axis.
+
+    Args:
+        name: The column name
+        role: The column role from the result metadata
+
+    Returns:
+        bool: True if the column is datetime-like
+    """
+    if role == "datetime":
+        return True
+    return bool(name) and any(indicator in str(name).lower() for indicator in TIME_INDICATORS)
 
 def is_datetime_like(series):
     """
     Check if a series contains datetime-like data.
-    
+
     Args:
         series: The pandas Series to check
-        
+
     Returns:
         bool: True if the series contains datetime-like data
     """
-    # Check actual datetime dtype
-    if pd.api.types.is_datetime64_dtype(series.dtype):
-        return True
-    
-    # Check if series name suggests time
-    if series.name:
-        time_indicators = ["date", "time", "year", "month", "day", "created", "updated", "timestamp"]
-        if any(indicator in str(series.name).lower() for indicator in time_indicators):
-            return True
-    
-    return False
+    role = "datetime" if pd.api.types.is_datetime64_dtype(series.dtype) else None
+    return is_time_column(series.name, role)
+
+def is_proportion_total(total):
+    """
+    Check if a column total looks like proportion data (summing to ~100%).
+
+    Args:
+        total: The sum of the numeric column
+
+    Returns:
+        bool: True if the total is close to 100 (percentage) or 1 (proportion)
+    """
+    if total is None:
+        return False
+    return (0.95 <= total <= 1.05) or (95 <= total <= 105)
 
 def is_proportion_data(df, numeric_col):
     """
     Check if a numeric column represents proportion data (summing to ~100%).
-    
+
     Args:
         df: The DataFrame containing the data
         numeric_col: The name of the numeric column to check
-        
+
     Returns:
         bool: True if the column likely represents proportion data
     """
-    # Sum should be close to 100 or 1
-    total = df[numeric_col].sum()
-    
-    # Check if sum is close to 100 (percentage) or 1 (proportion)
-    return (0.95 <= total <= 1.05) or (95 <= total <= 105) 
\ No newline at end of file
+    return is_proportion_total(get_result_metadata(df)["columns"][numeric_col]["sum"])
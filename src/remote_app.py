@@ -0,0 +1,217 @@
+import os
+import logging
+from urllib.error import URLError
+import streamlit as st
+import pandas as pd
+
+# Import custom modules first
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from backend.client import BackendClient, BackendError, FINISHED_STATES
+from components.results_display import approximate_notice, table_profile_display
+from utils.config import LOG_LEVEL, BACKEND_URL, MAX_FILE_SIZE_MB, INGEST_POLL_SECONDS
+
+# A thin frontend: uploads, questions, charts and statistics are handled by the
+# backend service (src/backend/server.py), which several frontends can share
+logging.basicConfig(level=LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logger = logging.getLogger(__name__)
+
+AVAILABLE_CHARTS = ["bar", "line", "scatter", "pie", "histogram", "heatmap", "box"]
+
+st.set_page_config(page_title="AI Data Analyst", page_icon="📊", layout="wide", initial_sidebar_state="expanded")
+st.title("AI-Powered Data Analysis Agent")
+st.caption(f"Connected to the analysis backend at {BACKEND_URL}")
+
+client = BackendClient(BACKEND_URL)
+
+# Session state initialization: the session only holds ids and the last downloaded result
+for key in ("remote_upload", "remote_dataset", "remote_job", "remote_results"):
+    if key not in st.session_state:
+        st.session_state[key] = None
+
+@st.fragment(run_every=INGEST_POLL_SECONDS)
+def wait_component(describe, label):
+    """
+    Refresh on its own while the backend works, rerunning the app once it is done.
+
+    Args:
+        describe: Zero-argument callable returning the dataset or job description
+        label: Callable turning the description into the progress text
+    """
+    state = describe()
+    if state["status"] not in ("loading", "queued", "running"):
+        st.rerun()
+    st.caption(label(state))
+
+def drop_dataset():
+    """
+    Drop this session's dataset from the backend and forget it.
+    """
+    if st.session_state.remote_dataset is not None:
+        try:
+            client.drop_dataset(st.session_state.remote_dataset)
+        except BackendError as e:
+            # Already gone, e.g. after a backend restart
+            logger.debug("Could not drop dataset %s: %s", st.session_state.remote_dataset, e)
+    st.session_state.remote_upload = None
+    st.session_state.remote_dataset = None
+    st.session_state.remote_job = None
+    st.session_state.remote_results = None
+
+def upload_component():
+    """
+    Sidebar component sending an upload to the backend, replacing the previous dataset.
+
+    Returns:
+        dict: The dataset description, or None while nothing is loaded
+    """
+    st.sidebar.header("1. Upload Data")
+    uploaded_file = st.sidebar.file_uploader(
+        "Upload your CSV or Excel file", type=["csv", "xlsx", "xls"],
+        help=f"Max size: {MAX_FILE_SIZE_MB}MB. The file is loaded by the analysis backend."
+    )
+    if uploaded_file is None:
+        drop_dataset()
+        return None
+
+    if uploaded_file.name.lower().endswith(".csv"):
+        options = {"delimiter": st.sidebar.selectbox("Select CSV delimiter", options=[",", ";", "\t", "|"], index=0)}
+    else:
+        options = {"sheet_name": st.sidebar.text_input("Sheet (name or number)", value="0")}
+
+    upload = (uploaded_file.name, uploaded_file.size, tuple(options.items()))
+    if st.session_state.remote_upload != upload:
+        drop_dataset()
+        dataset = client.upload(uploaded_file, uploaded_file.name, **options)
+        st.session_state.remote_upload = upload
+        st.session_state.remote_dataset = dataset["dataset"]
+
+    dataset = client.dataset(st.session_state.remote_dataset)
+    if dataset["status"] == "loading":
+        with st.sidebar:
+            wait_component(
+                lambda: client.dataset(dataset["dataset"]),
+                lambda state: f"Processing {state['file_name']}: {state['progress']['stage']} "
+                              f"({state['progress']['rows_loaded']:,} rows loaded)"
+            )
+        return None
+    if dataset["status"] == "failed":
+        st.sidebar.error(f"Error processing file: {dataset['error']}")
+        return None
+
+    st.sidebar.success(f"Loaded '{dataset['file_name']}' as {dataset['table_name']}")
+    with st.sidebar.expander("Inferred Schema", expanded=False):
+        schema_df = pd.DataFrame(dataset["schema"].items(), columns=['Column', 'Inferred Type'])
+        st.dataframe(schema_df, use_container_width=True, hide_index=True)
+    return dataset
+
+def question_component(dataset):
+    """
+    Component sending a question to the backend and following its job.
+
+    Args:
+        dataset: The dataset description
+
+    Returns:
+        dict: The finished job description, or None
+    """
+    st.header("2. Ask Questions")
+    question = st.text_area(
+        "Ask a question about your data in plain English",
+        placeholder="Example: What is the average of sales by region?"
+    )
+    approximate = st.checkbox(
+        "Approximate answers (fast, estimated from a sample)", value=False,
+        help="Estimate sums, counts and averages from a random sample of the table, with 95% confidence margins"
+    )
+    if st.button("Run Query") and question:
+        previous = st.session_state.remote_job
+        if previous is not None and previous["status"] not in FINISHED_STATES:
+            client.cancel(previous["job"])
+        st.session_state.remote_job = client.submit(dataset["dataset"], question=question, approximate=approximate)
+        st.session_state.remote_results = None
+
+    job = st.session_state.remote_job
+    if job is None:
+        return None
+    if job["status"] not in FINISHED_STATES:
+        job = st.session_state.remote_job = client.job(job["job"])
+    if job["status"] not in FINISHED_STATES:
+        if st.button("Stop", help="Cancel the question"):
+            client.cancel(job["job"])
+            st.rerun()
+        wait_component(lambda: client.job(job["job"]), lambda state: f"Answering '{state['question']}' ({state['status']})...")
+        return None
+    if job["status"] != "done":
+        st.error(f"Error processing query: {job['error']}")
+        return None
+    return job
+
+def results_component(job):
+    """
+    Component showing a job's result with the chart and statistics built by the backend.
+
+    Args:
+        job: The finished job description
+    """
+    # Downloaded once per job, not on every rerun
+    if st.session_state.remote_results is None or st.session_state.remote_results["job"] != job["job"]:
+        st.session_state.remote_results = {"job": job["job"], "df": client.result(job)}
+    results = st.session_state.remote_results["df"]
+
+    with st.expander("Generated SQL Query", expanded=False):
+        st.code(job["sql"], language="sql")
+    st.info(f"Query executed in {job['seconds']:.2f} seconds, returning {len(results)} rows")
+    if "rollup" in results.attrs:
+        st.caption(f"Answered from precomputed rollup `{results.attrs['rollup']}`")
+    if "approximate" in results.attrs:
+        approximate_notice(results)
+    if results.empty:
+        st.info("No rows matched the question")
+        return
+
+    tab1, tab2, tab3 = st.tabs(["Data Table", "Visualization", "Statistics"])
+    with tab1:
+        st.dataframe(results, use_container_width=True)
+        st.download_button("Download Results as CSV", results.to_csv(index=False), "query_results.csv", "text/csv")
+    with tab2:
+        selected_chart = st.selectbox("Select visualization type", options=["recommended", *AVAILABLE_CHARTS])
+        try:
+            with st.spinner("Generating visualization..."):
+                chart_type, figure = client.chart(job["job"], None if selected_chart == "recommended" else selected_chart)
+            st.caption(f"Chart type: {chart_type}")
+            st.plotly_chart(figure, use_container_width=True)
+        except BackendError as e:
+            st.error(f"Error generating visualization: {e}")
+    with tab3:
+        summary = client.statistics(job["job"])
+        if summary["numeric"] is not None:
+            st.subheader("Numeric Columns")
+            st.dataframe(summary["numeric"], use_container_width=True)
+        if summary["distinct"]:
+            st.subheader("Categorical Columns")
+            for col, n_distinct in summary["distinct"].items():
+                with st.expander(f"{col} - Value Counts (~{n_distinct} distinct)"):
+                    if st.checkbox("Show value counts", key=f"value_counts_{job['job']}_{col}"):
+                        st.dataframe(client.statistics(job["job"], col)["top_values"], use_container_width=True)
+
+try:
+    dataset = upload_component()
+    if dataset is None:
+        st.info("☝️ Please upload a data file using the sidebar to begin analysis")
+    else:
+        if dataset["profile"] is not None:
+            with st.sidebar.expander("Table Profile"):
+                table_profile_display(dataset["profile"])
+        job = question_component(dataset)
+        if job is not None:
+            st.divider()
+            st.header("3. Analysis Results")
+            results_component(job)
+except URLError as e:
+    st.error(f"The analysis backend at {BACKEND_URL} is not reachable ({e.reason}). Start it with `python src/backend/server.py`.")
+except BackendError as e:
+    if e.status == 404:
+        # The backend restarted or dropped the dataset; start over
+        drop_dataset()
+    st.error(f"Backend error: {e}")
@@ -1,20 +1,108 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+# Root of the project, so default paths do not depend on the working directory
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 # OpenAI API configuration
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o")  # Default to gpt-4o if not specified
+OPENAI_FAST_MODEL = os.getenv("OPENAI_FAST_MODEL", "gpt-4o-mini")  # Model for simple questions; empty always uses OPENAI_MODEL
+
+# Model routing settings
+ROUTER_SIMPLE_MAX_SCORE = 1  # Questions with a higher complexity score go to OPENAI_MODEL
+ROUTER_WIDE_SCHEMA_COLUMNS = 50  # Tables with more columns than this add to the complexity score
 
 # File upload settings
-MAX_FILE_SIZE_MB = int(os.getenv("MAX_FILE_SIZE_MB", "100"))  # Default 100MB
-SUPPORTED_FILE_TYPES = ["csv", "xlsx", "xls"]  # Default supported file types
+MAX_FILE_SIZE_MB = int(os.getenv("MAX_FILE_SIZE_MB", "2000"))  # Default 2GB; larger-than-memory data spills to disk
+SUPPORTED_FILE_TYPES = ["csv", "xlsx", "xls", "zip"]  # Default supported file types
+UPLOAD_SPOOL_CHUNK_BYTES = 8 * 1024 * 1024  # Uploads are copied to their temp file this many bytes at a time
+
+# Ingest type coercion settings
+COERCE_SAMPLE_SIZE = 1000  # Values sampled per column when detecting date formats and numbers written as text
+COERCE_MAX_PARSE_FAILURES = 0.01  # Columns are left as text if more values than this fraction fail to parse
+COERCE_DOWNCAST_FLOATS = os.getenv("COERCE_DOWNCAST_FLOATS", "true").lower() == "true"  # Store float columns as float32
+COERCE_FLOAT_RTOL = 1e-6  # Largest relative error accepted when storing a float column as float32
+INGEST_CHUNK_ROWS = 100000  # CSV rows parsed and loaded per chunk by the background ingestion worker
+INGEST_POLL_SECONDS = 0.5  # How often the upload progress bar refreshes
+INGEST_SCHEMA_SAMPLE_ROWS = 10000  # Rows sampled to infer the schema of combined multi-file uploads
+BACKGROUND_WORKERS = int(os.getenv("BACKGROUND_WORKERS", "4"))  # Uploads, profiles, rollups and samples (each) built at once across all sessions
 
 # Database settings
 DB_IN_MEMORY = True  # Using in-memory DuckDB
+DB_MEMORY_LIMIT = os.getenv("DB_MEMORY_LIMIT", "2GB")  # Memory limit of each session's DuckDB connection
+DB_THREADS = int(os.getenv("DB_THREADS", "0"))  # Threads per DuckDB connection; 0 uses all cores
+DB_TEMP_DIRECTORY = os.getenv("DB_TEMP_DIRECTORY", os.path.join(tempfile.gettempdir(), "ai_data_agent_spill"))  # Spill files, one subdirectory per session
+DB_MAX_TEMP_DIRECTORY_SIZE = os.getenv("DB_MAX_TEMP_DIRECTORY_SIZE", "20GB")  # Disk space each session may spill to
+SESSION_STORE_MEMORY_MB = int(os.getenv("SESSION_STORE_MEMORY_MB", "512"))  # Result DataFrames kept in memory across all sessions; older ones spill to disk
+SESSION_STORE_IDLE_SECONDS = 600  # Results unused for this long are spilled even under the budget
+SESSION_STORE_EXPIRE_SECONDS = 24 * 3600  # Results of sessions idle for this long are deleted
+SESSION_STORE_SWEEP_SECONDS = 60  # How often idle and expired results are looked for when no session stores or loads one
+SESSION_STORE_DIRECTORY = os.getenv("SESSION_STORE_DIRECTORY", os.path.join(tempfile.gettempdir(), "ai_data_agent_results"))  # Spilled results, one subdirectory per session
+SESSION_STORE_COMPRESSION = "zstd"  # Compression of spilled Arrow files ("zstd" or "lz4")
+ADMIN_VIEW = os.getenv("ADMIN_VIEW", "false").lower() == "true"  # Show the per-session memory view in the sidebar
 MAX_QUERY_RESULTS = 10000  # Maximum number of rows to return from a query
+STREAM_BATCH_ROWS = 50000  # Rows per Arrow record batch when streaming results
+STREAM_PREVIEW_ROWS = 100  # Rows shown while a streamed query is still running
+
+# Query profiling thresholds for anti-pattern warnings
+PROFILE_FULL_SCAN_ROWS = 100000  # Unfiltered scans over this many rows are flagged
+PROFILE_LARGE_JOIN_ROWS = 1000000  # Hash joins producing this many rows are flagged
+PROFILE_LARGE_SORT_ROWS = 100000  # Sorts without LIMIT over this many rows are flagged
+
+# Materialized rollup settings
+ROLLUP_MIN_QUERIES = 3  # Times a GROUP BY pattern must be queried before a rollup is built for it
+ROLLUP_MAX_TABLES = 8  # Rollups kept per session; the least recently used is dropped first
+ROLLUP_MAX_ROW_RATIO = 0.5  # Rollups with more rows than this fraction of the base table are discarded
+
+# Generated SQL check settings
+SQL_DEFAULT_LIMIT = 1000  # LIMIT added to generated queries without one (rule 7 of the prompt)
+SQL_REPAIR_MAX_ATTEMPTS = 3  # Misspelled names fixed locally per query before asking the LLM again
+SQL_REPAIR_MATCH_CUTOFF = 0.75  # Minimum similarity (0-1) for replacing a misspelled column or table name
+
+# Suggested question settings
+SUGGESTION_COUNT = 4  # Suggested questions precomputed after a table is loaded
+SUGGESTION_TOP_N = 10  # Rows of the "top categories" suggestions
+SUGGESTION_SAMPLE_ROWS = 10000  # Rows sampled for the distribution suggestion
+SUGGESTION_POLL_SECONDS = 1.0  # How often the suggestions refresh while they are computed
+
+# Follow-up query settings
+RESULT_CACHE_MAX_TABLES = 5  # Recent results kept as tables for follow-up questions; the least recently used is dropped first
+RESULT_CACHE_MAX_ROWS = 1000000  # Larger results are not kept
+
+# Approximate query settings
+APPROX_MIN_TABLE_ROWS = 1000000  # Tables with fewer rows are always queried exactly
+APPROX_SAMPLE_ROWS = 100000  # Size of the reservoir sample kept per large table
+APPROX_SAMPLE_SEED = 42  # Seed of the reservoir sample, so estimates are reproducible
+APPROX_CONFIDENCE_Z = 1.96  # z-score of the reported confidence margins (95%)
+APPROX_MIN_SAMPLE_ROWS = 30  # Estimates drawing on fewer sampled rows (in any group) are computed exactly instead
+
+# Statistics settings
+STATS_TOP_K = 50  # Number of most frequent values shown per categorical column
+STATS_CACHE_SIZE = 32  # Number of result summaries kept in the statistics cache
+PROFILE_TOP_K = 10  # Number of most frequent values stored per column in the table profile
+PROFILE_HISTOGRAM_BINS = 10  # Number of equi-depth histogram bins per numeric column
+VALUE_INDEX_MAX_VALUES = 100000  # Categorical columns with more distinct values are not indexed for value lookup
+VALUE_INDEX_FUZZY_CUTOFF = 0.8  # Minimum similarity (0-1) for resolving a misspelled value
+
+# Logging and instrumentation settings
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+TRACE_LOG_PATH = os.getenv("TRACE_LOG_PATH", os.path.join(PROJECT_ROOT, "logs", "traces.jsonl"))  # Empty disables the trace log
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9464"))  # 0 disables the /metrics endpoint
+
+# Query backend service settings
+BACKEND_HOST = os.getenv("BACKEND_HOST", "127.0.0.1")  # Interface the backend service binds
+BACKEND_PORT = int(os.getenv("BACKEND_PORT", "8765"))  # Port of the backend service
+BACKEND_WORKERS = int(os.getenv("BACKEND_WORKERS", str(os.cpu_count() or 4)))  # Queries, LLM calls, charts and statistics run at once
+BACKEND_URL = os.getenv("BACKEND_URL", "http://127.0.0.1:8765")  # Where clients reach the backend service
+BACKEND_JOB_TTL_SECONDS = 3600  # Finished jobs (and their results) are forgotten after this long
+BACKEND_MAX_WAIT_SECONDS = 30  # Longest a GET /jobs/<id>?wait= request is held open
+BACKEND_CLIENT_TIMEOUT_SECONDS = 600  # How long a client waits for a job before giving up
 
 # Application settings
 APP_NAME = "AI Data Analysis Agent"
@@ -1,8 +1,15 @@
 import os
+import logging
+import shutil
 import pandas as pd
 import tempfile
 from pathlib import Path
 
+# Import custom modules
+from utils.config import UPLOAD_SPOOL_CHUNK_BYTES
+
+logger = logging.getLogger(__name__)
+
 def get_file_extension(filename):
     """
     Get the extension of a file.
@@ -19,6 +26,10 @@ def save_uploaded_file(uploaded_file):
     """
     Save an uploaded file to a temporary location.
     
+    The upload is copied in chunks of UPLOAD_SPOOL_CHUNK_BYTES straight from
+    its buffer, so no second in-memory copy of the whole file is made. The
+    caller removes the file with clean_up_file.
+    
     Args:
         uploaded_file: The uploaded file from streamlit
         
@@ -28,12 +39,72 @@ def save_uploaded_file(uploaded_file):
     # Create a temporary file with the same extension
     extension = get_file_extension(uploaded_file.name)
     with tempfile.NamedTemporaryFile(delete=False, suffix=extension) as tmp_file:
-        # Write the file to the temporary file
-        tmp_file.write(uploaded_file.getvalue())
         tmp_path = tmp_file.name
+        try:
+            # Copy from the start of the buffer, wherever earlier readers left it
+            uploaded_file.seek(0)
+            shutil.copyfileobj(uploaded_file, tmp_file, UPLOAD_SPOOL_CHUNK_BYTES)
+        except Exception:
+            tmp_file.close()
+            clean_up_file(tmp_path)
+            raise
+        finally:
+            uploaded_file.seek(0)
     
     return tmp_path
 
+def save_stream(stream, filename, size):
+    """
+    Save a stream of known length (e.g. an HTTP request body) to a temporary location.
+    
+    Args:
+        stream: The readable stream
+        filename: The original file name, whose extension the saved file keeps
+        size: The number of bytes to read
+        
+    Returns:
+        str: The path to the saved file
+        
+    Raises:
+        ValueError: If the stream ends early
+    """
+    extension = get_file_extension(filename)
+    with tempfile.NamedTemporaryFile(delete=False, suffix=extension) as tmp_file:
+        tmp_path = tmp_file.name
+        try:
+            remaining = size
+            while remaining > 0:
+                chunk = stream.read(min(remaining, UPLOAD_SPOOL_CHUNK_BYTES))
+                if not chunk:
+                    raise ValueError(f"Upload ended after {size - remaining} of {size} bytes")
+                tmp_file.write(chunk)
+                remaining -= len(chunk)
+        except Exception:
+            tmp_file.close()
+            clean_up_file(tmp_path)
+            raise
+    
+    return tmp_path
+
+def read_data_file(file_path, delimiter=",", sheet_name=0):
+    """
+    Read a CSV or Excel file from disk into a DataFrame.
+    
+    Args:
+        file_path: The path to the file
+        delimiter: The CSV delimiter
+        sheet_name: The Excel sheet to read (name or index)
+        
+    Returns:
+        pandas.DataFrame: The parsed data
+    """
+    extension = get_file_extension(file_path)
+    if extension == '.csv':
+        return pd.read_csv(file_path, sep=delimiter)
+    elif extension in ['.xlsx', '.xls']:
+        return pd.read_excel(file_path, sheet_name=sheet_name)
+    raise ValueError(f"Unsupported file type: {extension}")
+
 def clean_up_file(file_path):
     """
     Remove a temporary file.
@@ -46,7 +117,7 @@ def clean_up_file(file_path):
             os.unlink(file_path)
     except Exception as e:
         # Log the error but don't raise
-        print(f"Error removing temporary file {file_path}: {str(e)}")
+        logger.error("Error removing temporary file %s: %s", file_path, e)
 
 def get_supported_file_types():
     """
@@ -55,7 +126,7 @@ def get_supported_file_types():
     Returns:
         list: List of supported file extensions
     """
-    return ["csv", "xlsx", "xls"]
+    return ["csv", "xlsx", "xls", "zip"]
 
 def validate_file_size(file, max_size_mb=100):
     """
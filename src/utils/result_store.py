@@ -0,0 +1,354 @@
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+# Import custom modules
+from utils.config import (
+    SESSION_STORE_MEMORY_MB, SESSION_STORE_IDLE_SECONDS, SESSION_STORE_EXPIRE_SECONDS,
+    SESSION_STORE_DIRECTORY, SESSION_STORE_COMPRESSION, SESSION_STORE_SWEEP_SECONDS
+)
+from utils.telemetry import span, increment
+
+logger = logging.getLogger(__name__)
+
+# DataFrame attributes dropped when a result is spilled, as they cannot be
+# serialized and hold memory; readers rebuild them on demand
+_TRANSIENT_ATTRS = ("figure",)
+
+class StoredResult:
+    """
+    Handle of a result DataFrame kept in the ResultStore.
+
+    Sessions keep the handle in st.session_state instead of the DataFrame;
+    get() returns the DataFrame, reloading it from disk if it was spilled.
+    """
+
+    def __init__(self, store, session_id, name, key):
+        self._store = store
+        self.session_id = session_id
+        self.name = name
+        self.key = key
+
+    def get(self):
+        """
+        Get the result DataFrame.
+
+        Returns:
+            pandas.DataFrame: The result, or None if it expired
+        """
+        return self._store.load(self.key)
+
+    def available(self):
+        """
+        Check whether the result is still stored, without loading it.
+
+        Returns:
+            bool: False once the result was replaced or expired
+        """
+        return self._store.contains(self.key)
+
+    def release(self):
+        """
+        Delete the result from the store, e.g. once nobody will ask for it again.
+        """
+        self._store._delete([self.key])
+
+class ResultStore:
+    """
+    Process-wide store of the result DataFrames of all sessions.
+
+    Results stay in memory while they are used. When the results in memory
+    exceed the byte budget, the least recently used ones are spilled to
+    compressed Arrow IPC files; results idle for SESSION_STORE_IDLE_SECONDS are
+    spilled regardless. Spilled results are reloaded through a memory map on
+    their next access. Results of sessions idle for SESSION_STORE_EXPIRE_SECONDS
+    are deleted. Besides on every put and load, the budget is checked by a
+    background thread every sweep_seconds, so idle results are spilled (and
+    expired ones deleted) even when no session is active.
+    """
+
+    def __init__(self, memory_budget_bytes, directory, idle_seconds, expire_seconds, compression, sweep_seconds):
+        self.memory_budget_bytes = memory_budget_bytes
+        self.directory = directory
+        self.idle_seconds = idle_seconds
+        self.expire_seconds = expire_seconds
+        self.compression = compression
+        self.sweep_seconds = sweep_seconds
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._sessions = {}
+        self._sweeper = None
+
+    def put(self, session_id, name, df):
+        """
+        Store a session's result under a name, replacing the result stored under it before.
+
+        Args:
+            session_id: The Streamlit session id
+            name: The result name, e.g. "last_query_results"
+            df: The result DataFrame
+
+        Returns:
+            StoredResult: The handle to keep in the session state
+        """
+        key = uuid.uuid4().hex
+        now = time.monotonic()
+        with self._lock:
+            previous = self._sessions.setdefault(session_id, {}).get(name)
+            self._sessions[session_id][name] = key
+            self._entries[key] = {
+                "session_id": session_id,
+                "name": name,
+                "df": df,
+                "attrs": dict(df.attrs),
+                "memory_bytes": int(df.memory_usage(deep=True).sum()),
+                "path": None,
+                "disk_bytes": 0,
+                "spillable": True,
+                "last_used": now
+            }
+        if previous is not None:
+            self._delete([previous])
+        self._enforce_budget()
+        self._start_sweeper()
+        return StoredResult(self, session_id, name, key)
+
+    def _start_sweeper(self):
+        """
+        Start the thread checking the budget periodically, on the first put.
+        """
+        with self._lock:
+            if self._sweeper is not None or not self.sweep_seconds:
+                return
+            self._sweeper = threading.Thread(target=self._sweep, name="result-store-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def _sweep(self):
+        """
+        Check the budget every sweep_seconds (runs on the sweeper thread).
+        """
+        while True:
+            time.sleep(self.sweep_seconds)
+            try:
+                self._enforce_budget()
+            except Exception as e:
+                logger.error("Result store sweep failed: %s", e)
+
+    def contains(self, key):
+        """
+        Check whether a result is stored.
+
+        Args:
+            key: The key of the result
+
+        Returns:
+            bool: True if the result is in memory or on disk
+        """
+        with self._lock:
+            return key in self._entries
+
+    def load(self, key):
+        """
+        Get a stored result, reloading it from its spill file if needed.
+
+        Args:
+            key: The key of the result
+
+        Returns:
+            pandas.DataFrame: The result, or None if it expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            entry["last_used"] = time.monotonic()
+            df = entry["df"]
+            path = entry["path"]
+        if df is not None:
+            self._enforce_budget()
+            return df
+
+        try:
+            with span("result_reload") as attrs:
+                with pa.memory_map(path, "r") as source:
+                    table = ipc.open_file(source).read_all()
+                df = table.to_pandas()
+                attrs["rows"] = len(df)
+        except (OSError, pa.ArrowException) as e:
+            logger.error("Could not reload spilled result %s: %s", path, e)
+            self._delete([key])
+            return None
+        df.attrs.update(entry["attrs"])
+        increment("result_store_reloads_total")
+
+        with self._lock:
+            if key not in self._entries:
+                return df
+            # The spill file is kept, so spilling it again costs nothing
+            entry["df"] = df
+            entry["memory_bytes"] = int(df.memory_usage(deep=True).sum())
+        self._enforce_budget(keep=key)
+        return df
+
+    def _spill(self, key):
+        """
+        Move a result out of memory, writing its spill file if it has none yet.
+
+        Args:
+            key: The key of the result
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry["df"] is None:
+                return
+            df = entry["df"]
+            path = entry["path"]
+
+        if path is None:
+            session_directory = os.path.join(self.directory, entry["session_id"])
+            os.makedirs(session_directory, exist_ok=True)
+            path = os.path.join(session_directory, f"{key}.arrow")
+            try:
+                with span("result_spill", rows=len(df)) as attrs:
+                    # Attributes stay in memory with the entry; some (figures) cannot be serialized
+                    plain = df.copy(deep=False)
+                    plain.attrs = {}
+                    table = pa.Table.from_pandas(plain, preserve_index=False)
+                    options = ipc.IpcWriteOptions(compression=self.compression)
+                    with pa.OSFile(path, "wb") as sink, ipc.new_file(sink, table.schema, options=options) as writer:
+                        writer.write_table(table)
+                    attrs["bytes"] = os.path.getsize(path)
+            except (OSError, pa.ArrowException, ValueError, TypeError) as e:
+                # e.g. object columns Arrow cannot convert: keep the result in memory
+                logger.warning("Could not spill result %s: %s", key, e)
+                with self._lock:
+                    entry["spillable"] = False
+                return
+            increment("result_store_spills_total")
+
+        with self._lock:
+            if key not in self._entries:
+                os.remove(path)
+                return
+            entry["df"] = None
+            entry["attrs"] = {name: value for name, value in entry["attrs"].items() if name not in _TRANSIENT_ATTRS}
+            entry["path"] = path
+            entry["disk_bytes"] = os.path.getsize(path)
+
+    def _enforce_budget(self, keep=None):
+        """
+        Spill idle results and, beyond the memory budget, the least recently used
+        ones; delete the results of expired sessions.
+
+        Args:
+            keep: Optional key of a result to keep in memory, e.g. one just reloaded
+        """
+        now = time.monotonic()
+        with self._lock:
+            last_used = {}
+            for entry in self._entries.values():
+                last_used[entry["session_id"]] = max(last_used.get(entry["session_id"], 0), entry["last_used"])
+            expired = [
+                key for key, entry in self._entries.items()
+                if now - last_used[entry["session_id"]] > self.expire_seconds
+            ]
+            in_memory = sorted(
+                (entry["last_used"], key, entry["memory_bytes"])
+                for key, entry in self._entries.items()
+                if entry["df"] is not None and entry["spillable"] and key != keep and key not in expired
+            )
+            total = sum(entry["memory_bytes"] for entry in self._entries.values() if entry["df"] is not None)
+            to_spill = []
+            for used, key, memory_bytes in in_memory:
+                if total <= self.memory_budget_bytes and now - used <= self.idle_seconds:
+                    continue
+                to_spill.append(key)
+                total -= memory_bytes
+
+        if expired:
+            self._delete(expired)
+        for key in to_spill:
+            self._spill(key)
+
+    def _delete(self, keys):
+        """
+        Forget results and remove their spill files.
+
+        Args:
+            keys: The keys of the results
+        """
+        paths = []
+        with self._lock:
+            for key in keys:
+                entry = self._entries.pop(key, None)
+                if entry is None:
+                    continue
+                names = self._sessions.get(entry["session_id"], {})
+                if names.get(entry["name"]) == key:
+                    del names[entry["name"]]
+                if not names:
+                    self._sessions.pop(entry["session_id"], None)
+                if entry["path"]:
+                    paths.append(entry["path"])
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.debug("Could not remove spilled result %s: %s", path, e)
+
+    def release_session(self, session_id):
+        """
+        Delete all stored results of a session.
+
+        Args:
+            session_id: The Streamlit session id
+        """
+        with self._lock:
+            keys = [key for key, entry in self._entries.items() if entry["session_id"] == session_id]
+        self._delete(keys)
+        shutil.rmtree(os.path.join(self.directory, session_id), ignore_errors=True)
+
+    def usage(self):
+        """
+        Describe the memory and disk used by each session's results.
+
+        Returns:
+            list: One dict per session with its results in memory and on disk,
+                  their bytes and the seconds since the session last used one
+        """
+        now = time.monotonic()
+        sessions = {}
+        with self._lock:
+            for entry in self._entries.values():
+                session = sessions.setdefault(entry["session_id"], {
+                    "session": entry["session_id"],
+                    "results_in_memory": 0,
+                    "memory_bytes": 0,
+                    "results_on_disk": 0,
+                    "disk_bytes": 0,
+                    "idle_seconds": float("inf")
+                })
+                if entry["df"] is not None:
+                    session["results_in_memory"] += 1
+                    session["memory_bytes"] += entry["memory_bytes"]
+                else:
+                    session["results_on_disk"] += 1
+                session["disk_bytes"] += entry["disk_bytes"]
+                session["idle_seconds"] = min(session["idle_seconds"], now - entry["last_used"])
+        return sorted(sessions.values(), key=lambda session: session["memory_bytes"], reverse=True)
+
+# Shared by every session of this process, so the budget is global
+result_store = ResultStore(
+    SESSION_STORE_MEMORY_MB * 1024 * 1024,
+    SESSION_STORE_DIRECTORY,
+    SESSION_STORE_IDLE_SECONDS,
+    SESSION_STORE_EXPIRE_SECONDS,
+    SESSION_STORE_COMPRESSION,
+    SESSION_STORE_SWEEP_SECONDS
+)
@@ -0,0 +1,321 @@
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Import custom modules
+from utils.config import TRACE_LOG_PATH, METRICS_HOST, METRICS_PORT
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the latency histogram buckets
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, float("inf"))
+
+_current_trace = ContextVar("current_trace", default=None)
+_export_lock = threading.Lock()
+_metrics_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_metrics_server = None
+
+class Trace:
+    """
+    The spans recorded while answering one query, for the timing waterfall and trace log.
+    """
+
+    def __init__(self, name, **attributes):
+        self.trace_id = uuid.uuid4().hex
+        self.name = name
+        self.attributes = attributes
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.duration = None
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add_span(self, name, start, duration, attributes):
+        """
+        Record a finished span.
+
+        Args:
+            name: The span name (pipeline stage)
+            start: The span start, from time.perf_counter()
+            duration: The span duration in seconds
+            attributes: Extra span attributes (row counts, token counts, ...)
+        """
+        with self._lock:
+            self.spans.append({
+                "name": name,
+                "offset": start - self.start,
+                "duration": duration,
+                "attributes": attributes
+            })
+
+    def to_dict(self):
+        """
+        Convert the trace to a JSON-serializable dict.
+
+        Returns:
+            dict: The trace and its spans
+        """
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration": self.duration,
+            "attributes": self.attributes,
+            "spans": list(self.spans)
+        }
+
+def start_trace(name, **attributes):
+    """
+    Start a trace and make it current, so spans recorded in this context attach to it.
+
+    Args:
+        name: The trace name
+        **attributes: Trace attributes, e.g. the user's question
+
+    Returns:
+        Trace: The new trace
+    """
+    trace = Trace(name, **attributes)
+    _current_trace.set(trace)
+    return trace
+
+def get_current_trace():
+    """
+    Get the trace spans are currently attached to.
+
+    Returns:
+        Trace: The current trace, or None
+    """
+    return _current_trace.get()
+
+def finish_trace(trace):
+    """
+    Finish a trace, append it to the trace log and stop attaching spans to it.
+
+    Args:
+        trace: The trace to finish
+    """
+    if trace.duration is not None:
+        return
+    trace.duration = time.perf_counter() - trace.start
+    if _current_trace.get() is trace:
+        _current_trace.set(None)
+
+    increment("traces_total", trace=trace.name)
+    observe("trace_duration_seconds", trace.duration, trace=trace.name)
+    export_trace(trace)
+
+def export_trace(trace):
+    """
+    Append a trace to the JSON-lines trace log.
+
+    Args:
+        trace: The finished trace
+    """
+    if not TRACE_LOG_PATH:
+        return
+    try:
+        line = json.dumps(trace.to_dict(), default=str)
+        with _export_lock:
+            os.makedirs(os.path.dirname(os.path.abspath(TRACE_LOG_PATH)), exist_ok=True)
+            with open(TRACE_LOG_PATH, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+    except OSError as e:
+        logger.error("Could not write trace log %s: %s", TRACE_LOG_PATH, e)
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Time a pipeline stage.
+
+    The duration is recorded in the stage latency histogram and, if a trace is
+    current, as a span of that trace. Code inside the block can add attributes
+    to the yielded dict (e.g. row or token counts).
+
+    Args:
+        name: The stage name
+        **attributes: Initial span attributes
+
+    Yields:
+        dict: The span attributes
+    """
+    trace = _current_trace.get()
+    start = time.perf_counter()
+    try:
+        yield attributes
+    except Exception as e:
+        attributes["error"] = str(e)
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        observe("pipeline_stage_duration_seconds", duration, stage=name)
+        if "error" in attributes:
+            increment("pipeline_stage_errors_total", stage=name)
+        if trace is not None:
+            trace.add_span(name, start, duration, attributes)
+
+def _metric_key(name, labels):
+    """
+    Build the registry key of a metric.
+
+    Args:
+        name: The metric name
+        labels: The metric labels
+
+    Returns:
+        tuple: (name, sorted label pairs)
+    """
+    return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+def increment(name, value=1, **labels):
+    """
+    Increase a counter metric.
+
+    Args:
+        name: The metric name
+        value: The amount to add
+        **labels: The metric labels
+    """
+    key = _metric_key(name, labels)
+    with _metrics_lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def observe(name, value, **labels):
+    """
+    Record an observation in a histogram metric.
+
+    Args:
+        name: The metric name
+        value: The observed value
+        **labels: The metric labels
+    """
+    key = _metric_key(name, labels)
+    with _metrics_lock:
+        histogram = _histograms.setdefault(key, {"buckets": [0] * len(DURATION_BUCKETS), "sum": 0.0, "count": 0})
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if value <= bound:
+                histogram["buckets"][i] += 1
+        histogram["sum"] += value
+        histogram["count"] += 1
+
+def get_counter(name, **labels):
+    """
+    Get the current value of a counter metric.
+
+    Args:
+        name: The metric name
+        **labels: The metric labels
+
+    Returns:
+        float: The counter value (0 if never incremented)
+    """
+    with _metrics_lock:
+        return _counters.get(_metric_key(name, labels), 0)
+
+def _format_labels(labels, extra=()):
+    """
+    Format metric labels for the Prometheus text format.
+
+    Args:
+        labels: (key, value) pairs of the metric
+        extra: Additional (key, value) pairs, e.g. the histogram bucket bound
+
+    Returns:
+        str: The label block, e.g. '{stage="sql_execute"}', or "" without labels
+    """
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = [
+        (key, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in pairs
+    ]
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+def render_prometheus():
+    """
+    Render all metrics in the Prometheus text exposition format.
+
+    Returns:
+        str: The metrics text
+    """
+    lines = []
+    with _metrics_lock:
+        counters = sorted(_counters.items())
+        histograms = sorted((key, {**h, "buckets": list(h["buckets"])}) for key, h in _histograms.items())
+
+    typed = set()
+    for (name, labels), value in counters:
+        if name not in typed:
+            lines.append(f"# TYPE {name} counter")
+            typed.add(name)
+        lines.append(f"{name}{_format_labels(labels)} {value}")
+
+    for (name, labels), histogram in histograms:
+        if name not in typed:
+            lines.append(f"# TYPE {name} histogram")
+            typed.add(name)
+        for bound, count in zip(DURATION_BUCKETS, histogram["buckets"]):
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', le)])} {count}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {histogram['sum']}")
+        lines.append(f"{name}_count{_format_labels(labels)} {histogram['count']}")
+
+    return "\n".join(lines) + "\n"
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """
+    Serves render_prometheus() at /metrics.
+    """
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes are frequent; keep them out of the application log
+        pass
+
+def start_metrics_server(host=METRICS_HOST, port=METRICS_PORT):
+    """
+    Serve the metrics at http://host:port/metrics from a background thread.
+
+    Safe to call on every Streamlit rerun; the server is only started once per process.
+
+    Args:
+        host: The interface to bind
+        port: The port to listen on (0 disables the endpoint)
+
+    Returns:
+        bool: True if the endpoint is running
+    """
+    global _metrics_server
+    with _metrics_lock:
+        if _metrics_server is not None:
+            return True
+        if not port:
+            return False
+        try:
+            _metrics_server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        except OSError as e:
+            logger.warning("Metrics endpoint not started on %s:%s: %s", host, port, e)
+            return False
+
+    threading.Thread(target=_metrics_server.serve_forever, name="metrics-server", daemon=True).start()
+    logger.info("Serving metrics on http://%s:%s/metrics", host, port)
+    return True
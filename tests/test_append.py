@@ -0,0 +1,50 @@
+import pandas as pd
+
+from core.db.ingestion import start_ingestion
+from core.db.duckdb_manager import close_connection
+
+def _load(tmp_path, name, df, append_to=None):
+    path = tmp_path / name
+    df.to_csv(path, index=False)
+    job = start_ingestion(str(path), name, append_to=append_to, delimiter=",")
+    connection, table_name, schema, profile_job = job.result()
+    return job, connection, table_name, schema, profile_job.result()
+
+def _column_type(connection, table_name, column):
+    return dict(connection.execute(f"SELECT column_name, data_type FROM information_schema.columns WHERE table_name = '{table_name}'").fetchall())[column]
+
+def test_append_reencodes_enums_and_skips_loaded_keys(tmp_path):
+    base = pd.DataFrame({
+        "order_id": range(100),
+        "region": ["North", "South"] * 50,
+        "sales": [float(i) for i in range(100)]
+    })
+    _, connection, table_name, schema, profile = _load(tmp_path, "orders.csv", base)
+    try:
+        assert _column_type(connection, table_name, "region").startswith("ENUM")
+
+        # Ten orders are already loaded, one new order appears twice and "West" is a new region
+        extract = pd.DataFrame({
+            "order_id": list(range(90, 120)) + [119],
+            "region": ["West"] * 31,
+            "sales": [1.0] * 31
+        })
+        append_to = {
+            "connection": connection, "table_name": table_name, "schema": schema, "profile": profile,
+            "key_column": "order_id", "derived": ()
+        }
+        job, connection, table_name, schema, profile = _load(tmp_path, "orders_new.csv", extract, append_to)
+
+        assert job.appended["rows_added"] == 20
+        assert job.appended["rows_skipped"] == 11
+        assert "region" in job.appended["reencoded"]
+        region_type = _column_type(connection, table_name, "region")
+        assert region_type.startswith("ENUM") and "West" in region_type
+        counts = dict(connection.execute(f"SELECT region, count(*) FROM {table_name} GROUP BY 1").fetchall())
+        assert counts == {"North": 50, "South": 50, "West": 20}
+        assert connection.execute(f"SELECT count(DISTINCT order_id), count(*) FROM {table_name}").fetchone() == (120, 120)
+        # Rows already loaded keep their values
+        assert connection.execute(f"SELECT sales FROM {table_name} WHERE order_id = 95").fetchone()[0] == 95.0
+        assert profile["row_count"] == 120
+    finally:
+        close_connection(connection)
@@ -0,0 +1,55 @@
+import duckdb
+import pandas as pd
+import pytest
+
+from core.db import approximate
+from core.db.approximate import SampleManager
+from core.db.query_executor import execute_query
+
+TABLE_ROWS = 20000
+
+@pytest.fixture
+def sampled_table(monkeypatch):
+    monkeypatch.setattr(approximate, "APPROX_MIN_TABLE_ROWS", 1000)
+    monkeypatch.setattr(approximate, "APPROX_SAMPLE_ROWS", 2000)
+    connection = duckdb.connect()
+    # 5 "rare" rows, which a 10% sample is unlikely to hold 30 of
+    connection.execute(f"""
+        CREATE TABLE sales AS
+        SELECT i AS id, CASE WHEN i % 4000 = 0 THEN 'rare' WHEN i % 2 = 0 THEN 'even' ELSE 'odd' END AS category,
+               (i % 100)::DOUBLE AS amount
+        FROM range({TABLE_ROWS}) t(i)
+    """)
+    sampler = SampleManager(connection)
+    sampler.start("sales").result()
+    assert sampler.has_sample("sales")
+    yield connection, sampler
+    connection.close()
+
+def _exact(connection, sql):
+    return connection.execute(sql).fetchdf()
+
+def test_common_group_is_estimated_with_margins(sampled_table):
+    connection, sampler = sampled_table
+    sql = "SELECT category, sum(amount) AS total FROM sales WHERE category <> 'rare' GROUP BY category"
+    result = execute_query(connection, sql, "sales", sampler=sampler)
+    estimate = result.attrs["approximate"]
+    assert estimate["margins"]["total"]
+    assert all(margin > 0 for margin in estimate["margins"]["total"])
+    assert approximate.SAMPLED_ROWS_COLUMN not in result.columns
+
+@pytest.mark.parametrize("category", ["rare", "missing"])
+def test_sparse_or_empty_filter_is_answered_exactly(sampled_table, category):
+    connection, sampler = sampled_table
+    sql = f"SELECT sum(amount) AS total, count(*) AS n FROM sales WHERE category = '{category}'"
+    result = execute_query(connection, sql, "sales", sampler=sampler)
+    # Never a zero-width "0 ± 0" estimate from a sample without (enough) matching rows
+    assert "approximate" not in result.attrs
+    pd.testing.assert_frame_equal(result.reset_index(drop=True), _exact(connection, sql), check_dtype=False)
+
+def test_estimate_without_matching_sampled_rows_is_unreliable(sampled_table):
+    connection, sampler = sampled_table
+    approximation = sampler.rewrite("SELECT sum(amount) AS total FROM sales WHERE category = 'missing'")
+    estimate = approximate.split_margins(connection.execute(approximation["sql"]).fetchdf(), approximation)
+    assert estimate["min_sampled_rows"] == 0
+    assert not approximate.reliable(estimate)
@@ -0,0 +1,86 @@
+import os
+
+import pandas as pd
+import pytest
+
+from core.db import ingestion
+from core.db.duckdb_manager import close_connection, get_table_info
+from core.db.ingestion import start_ingestion
+
+CHUNK_ROWS = 200
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(ingestion, "INGEST_CHUNK_ROWS", CHUNK_ROWS)
+
+def _ingest(tmp_path, df):
+    path = tmp_path / "upload.csv"
+    df.to_csv(path, index=False)
+    job = start_ingestion(str(path), "upload.csv", delimiter=",")
+    connection, table_name, schema, profile_job = job.result()
+    profile_job.result()
+    return job, connection, table_name, schema
+
+def _column_types(connection, table_name):
+    return {column["name"]: column["type"] for column in get_table_info(connection, table_name)["columns"]}
+
+def test_date_format_switch_after_first_chunk(tmp_path):
+    dates = pd.date_range("2024-01-01", periods=3 * CHUNK_ROWS, freq="h")
+    text = [
+        date.strftime("%Y-%m-%d %H:%M:%S") if i < 2 * CHUNK_ROWS else date.strftime("%d/%m/%Y %H:%M:%S")
+        for i, date in enumerate(dates)
+    ]
+    job, connection, table_name, schema = _ingest(tmp_path, pd.DataFrame({"when": text, "n": range(len(text))}))
+    try:
+        assert schema["when"] == "DATETIME"
+        assert _column_types(connection, table_name)["when"].startswith("TIMESTAMP")
+        loaded = connection.execute(f'SELECT "when" FROM {table_name} ORDER BY n').fetchdf()["when"]
+        assert loaded.notna().all()
+        assert (loaded == dates).all()
+        assert not job.unparsed
+    finally:
+        close_connection(connection)
+    assert not os.path.exists(tmp_path / "upload.csv")
+
+def test_numeric_column_turning_to_text_is_widened(tmp_path):
+    amounts = [str(i) for i in range(2 * CHUNK_ROWS)] + ["unknown"] * CHUNK_ROWS
+    job, connection, table_name, schema = _ingest(tmp_path, pd.DataFrame({"amount": amounts}))
+    try:
+        assert schema["amount"] == "TEXT"
+        assert _column_types(connection, table_name)["amount"] == "VARCHAR"
+        values = connection.execute(f"SELECT amount FROM {table_name}").fetchdf()["amount"]
+        # Nothing is lost: the numbers of the first chunks and the later text both survive
+        assert values.notna().all()
+        assert (values == "unknown").sum() == CHUNK_ROWS
+        assert set(values[values != "unknown"].astype(int)) == set(range(2 * CHUNK_ROWS))
+    finally:
+        close_connection(connection)
+
+def test_integer_column_turning_fractional_is_widened_to_double(tmp_path):
+    values = list(range(2 * CHUNK_ROWS)) + [i + 0.5 for i in range(CHUNK_ROWS)]
+    job, connection, table_name, schema = _ingest(tmp_path, pd.DataFrame({"value": values}))
+    try:
+        total = connection.execute(f"SELECT sum(value) FROM {table_name}").fetchone()[0]
+        assert total == pytest.approx(sum(values))
+        assert _column_types(connection, table_name)["value"] in ("DOUBLE", "FLOAT")
+    finally:
+        close_connection(connection)
+
+def test_numeric_columns_are_narrowed_after_the_last_chunk(tmp_path):
+    rows = 3 * CHUNK_ROWS
+    df = pd.DataFrame({
+        "small": range(rows),
+        "big": [2 ** 40 + i for i in range(rows)],
+        "price": [i / 4 for i in range(rows)],
+        "huge": [1e300 * (i + 1) for i in range(rows)]
+    })
+    job, connection, table_name, schema = _ingest(tmp_path, df)
+    try:
+        types = _column_types(connection, table_name)
+        assert types["small"] == "INTEGER"
+        assert types["big"] == "BIGINT"
+        assert types["price"] == "FLOAT"
+        # Out of float32 range
+        assert types["huge"] == "DOUBLE"
+    finally:
+        close_connection(connection)
@@ -0,0 +1,29 @@
+import duckdb
+import pytest
+
+from core.db.query_executor import execute_query
+
+@pytest.fixture
+def connection():
+    connection = duckdb.connect()
+    connection.execute("CREATE TABLE sales AS SELECT i AS id, i % 7 AS store FROM range(200000) t(i)")
+    yield connection
+    connection.close()
+
+def test_profile_reports_rows_and_anti_patterns(connection):
+    result = execute_query(connection, "SELECT * FROM sales ORDER BY store", "sales", profile=True)
+    profile = result.attrs["query_profile"]
+    assert profile["rows_returned"] == 200000
+    assert profile["rows_scanned"] >= 200000
+    assert profile["operators"]
+    assert any("without a LIMIT" in warning for warning in profile["warnings"])
+    assert any("Full table scan" in warning for warning in profile["warnings"])
+
+def test_selective_aggregate_has_no_warnings(connection):
+    result = execute_query(
+        connection, "SELECT store, count(*) AS n FROM sales WHERE store = 3 GROUP BY store", "sales", profile=True
+    )
+    assert result.attrs["query_profile"]["warnings"] == []
+
+def test_profiling_is_off_by_default(connection):
+    assert "query_profile" not in execute_query(connection, "SELECT count(*) FROM sales", "sales").attrs
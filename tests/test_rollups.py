@@ -0,0 +1,53 @@
+import time
+
+import duckdb
+import pytest
+
+from core.db.query_executor import execute_query
+from core.db.rollups import RollupManager
+from utils.config import ROLLUP_MIN_QUERIES
+
+@pytest.fixture
+def connection():
+    connection = duckdb.connect()
+    connection.execute("""
+        CREATE TABLE sales AS
+        SELECT i AS id, ['North', 'South', 'East'][i % 3 + 1] AS region,
+               ['Laptops', 'Phones'][i % 2 + 1] AS category, (i % 50)::DOUBLE AS amount
+        FROM range(3000) t(i)
+    """)
+    yield connection
+    connection.close()
+
+def _wait_for_rollup(rollups):
+    deadline = time.monotonic() + 10
+    while not rollups.list_rollups():
+        assert time.monotonic() < deadline, "rollup was not built"
+        time.sleep(0.05)
+
+def test_frequent_pattern_is_answered_from_its_rollup(connection):
+    rollups = RollupManager(connection)
+    pattern = (
+        "SELECT region, category, sum(amount) AS total, avg(amount) AS mean, count(*) AS n "
+        "FROM sales GROUP BY region, category"
+    )
+    for _ in range(ROLLUP_MIN_QUERIES):
+        execute_query(connection, pattern, "sales", rollups=rollups)
+    _wait_for_rollup(rollups)
+
+    # A coarser grouping re-aggregates the rollup, with the same answer as the base table
+    query = "SELECT region, sum(amount) AS total, avg(amount) AS mean, count(*) AS n FROM sales GROUP BY region ORDER BY region"
+    result = execute_query(connection, query, "sales", rollups=rollups)
+    assert result.attrs["rollup"] == rollups.list_rollups()[0]["rollup"]
+    assert [tuple(row) for row in result.values.tolist()] == connection.execute(query).fetchall()
+
+def test_invalidated_rollup_is_no_longer_used(connection):
+    rollups = RollupManager(connection)
+    pattern = "SELECT region, sum(amount) AS total FROM sales GROUP BY region"
+    for _ in range(ROLLUP_MIN_QUERIES):
+        execute_query(connection, pattern, "sales", rollups=rollups)
+    _wait_for_rollup(rollups)
+
+    rollups.invalidate("sales")
+    assert rollups.list_rollups() == []
+    assert execute_query(connection, pattern, "sales", rollups=rollups).attrs.get("rollup") is None
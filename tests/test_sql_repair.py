@@ -0,0 +1,68 @@
+import duckdb
+import pytest
+
+from core.db.sql_repair import fix_quoting, add_default_limit, check_and_repair_sql
+
+COLUMNS = ["Order Date", "Sales", "Total Sales", "Region"]
+
+@pytest.fixture
+def connection():
+    connection = duckdb.connect()
+    connection.execute(
+        'CREATE TABLE orders ("Order Date" DATE, "Sales" DOUBLE, "Total Sales" DOUBLE, "Region" VARCHAR)'
+    )
+    yield connection
+    connection.close()
+
+def test_columns_with_spaces_are_quoted():
+    sql, repairs = fix_quoting("SELECT Order Date, sum(Total Sales) FROM orders GROUP BY Order Date", COLUMNS)
+    assert sql == 'SELECT "Order Date", sum("Total Sales") FROM orders GROUP BY "Order Date"'
+    assert repairs == ["quoted column Total Sales", "quoted column Order Date"]
+
+def test_quoting_leaves_literals_and_quoted_names_alone():
+    query = """SELECT "Total Sales" FROM orders WHERE Region = 'Order Date'"""
+    assert fix_quoting(query, COLUMNS) == (query, [])
+
+def test_backticks_become_double_quotes():
+    sql, repairs = fix_quoting("SELECT `Region`, `Total Sales` FROM orders", COLUMNS)
+    assert sql == 'SELECT "Region", "Total Sales" FROM orders'
+    assert repairs == ["replaced backticks with double quotes"]
+
+@pytest.mark.parametrize("query", [
+    "SELECT * FROM orders LIMIT 10",
+    "SELECT * FROM orders limit 10 offset 20;",
+    "SELECT * FROM orders LIMIT 5\n"
+])
+def test_existing_limit_is_kept(query):
+    assert add_default_limit(query, 1000) == (query, [])
+
+def test_default_limit_is_added_after_a_trailing_semicolon():
+    assert add_default_limit("SELECT * FROM orders;  ", 1000) == ("SELECT * FROM orders LIMIT 1000", ["added LIMIT 1000"])
+
+def test_limit_inside_a_subquery_does_not_count():
+    sql, _ = add_default_limit("SELECT * FROM (SELECT * FROM orders LIMIT 5) t ORDER BY 1", 1000)
+    assert sql.endswith("ORDER BY 1 LIMIT 1000")
+
+def test_statements_other_than_select_get_no_limit():
+    assert add_default_limit("DESCRIBE orders", 1000) == ("DESCRIBE orders", [])
+
+def test_misspelled_column_and_table_are_repaired(connection):
+    checked = check_and_repair_sql(connection, "SELECT Regoin, sum(Sales) FROM ordrs GROUP BY Regoin", "orders", COLUMNS)
+    assert checked["error"] is None
+    assert checked["sql"] == "SELECT Region, sum(Sales) FROM orders GROUP BY Region LIMIT 1000"
+    assert "replaced Regoin with Region" in checked["repairs"]
+    assert "replaced ordrs with orders" in checked["repairs"]
+
+def test_unrepairable_query_reports_the_error(connection):
+    checked = check_and_repair_sql(connection, "SELECT profit FROM orders", "orders", COLUMNS)
+    assert checked["error"] is not None
+
+@pytest.mark.parametrize("query", [
+    "SELECT Region FROM orders; DROP TABLE orders; SELECT 1 LIMIT 1",
+    "DROP TABLE orders",
+    "DELETE FROM orders"
+])
+def test_statements_beyond_a_single_select_are_rejected_without_running(connection, query):
+    checked = check_and_repair_sql(connection, query, "orders", COLUMNS)
+    assert checked["error"] is not None
+    assert connection.execute("SELECT count(*) FROM orders").fetchone() == (0,)
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+
+from core.db.type_coercion import coerce_types, plan_coercions, coerce_chunk
+
+def test_text_columns_are_converted_to_native_types():
+    df = pd.DataFrame({
+        "price": ["$1,234.50", "$2.00"],
+        "active": ["yes", "no"],
+        "ordered": ["2024-01-31", "2024-02-01"],
+        "quantity": [1, 2],
+        "note": ["a", "b"]
+    })
+    schema = {"price": "TEXT", "active": "TEXT", "ordered": "DATETIME", "quantity": "INTEGER", "note": "TEXT"}
+    coerced, schema, converted = coerce_types(df, schema)
+
+    assert converted == ["price", "active", "ordered"]
+    assert coerced["price"].tolist() == [1234.5, 2.0]
+    assert coerced["active"].tolist() == [True, False]
+    assert coerced["ordered"].tolist() == [pd.Timestamp("2024-01-31"), pd.Timestamp("2024-02-01")]
+    assert coerced["quantity"].dtype == np.int8
+    assert coerced["note"].tolist() == ["a", "b"]
+    assert schema == {"price": "FLOAT", "active": "BOOLEAN", "ordered": "DATETIME", "quantity": "INTEGER", "note": "TEXT"}
+
+def test_column_with_too_many_unparseable_values_stays_text():
+    df = pd.DataFrame({"ordered": ["2024-01-31"] * 50 + ["not a date"] * 50})
+    coerced, _, converted = coerce_types(df, {"ordered": "DATETIME"})
+    assert converted == []
+    assert coerced["ordered"].tolist() == df["ordered"].tolist()
+
+def test_later_chunk_reports_lost_and_drifted_columns():
+    first = pd.DataFrame({"amount": [str(i) for i in range(1000)], "units": [str(i) for i in range(1000)]})
+    plan = plan_coercions(first, {"amount": "TEXT", "units": "TEXT"})
+
+    later = pd.DataFrame({
+        "amount": [str(i) for i in range(999)] + ["n/a"],
+        "units": ["X1"] * 500 + [str(i) for i in range(500)]
+    })
+    coerced, lost, drifted = coerce_chunk(later, plan)
+    assert lost == {"amount": 1}
+    assert drifted == ["units"]
+    assert coerced["units"].tolist() == later["units"].tolist()
+
+def test_codes_that_look_like_numbers_stay_text():
+    df = pd.DataFrame({
+        "zip": ["02134", "00501", "10001"],
+        "shipping": ["02134", "00501", "10001"],
+        "customer_code": ["1001", "1002", "1003"],
+        "size": ["10", "20", "10"]
+    })
+    schema = {"zip": "TEXT", "shipping": "TEXT", "customer_code": "TEXT", "size": "CATEGORICAL"}
+    coerced, new_schema, converted = coerce_types(df, schema)
+
+    # Leading zeros, an identifier name and a category all keep the column as written
+    assert converted == []
+    assert new_schema == schema
+    for column in df.columns:
+        assert coerced[column].tolist() == df[column].tolist()
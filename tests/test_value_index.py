@@ -0,0 +1,32 @@
+import duckdb
+import pytest
+
+from core.db.value_index import build_value_index
+
+SCHEMA = {"id": "INTEGER", "region": "CATEGORICAL", "category": "CATEGORICAL"}
+
+@pytest.fixture
+def value_index():
+    connection = duckdb.connect()
+    connection.execute("""
+        CREATE TABLE sales AS
+        SELECT i AS id, ['North', 'South', 'East'][i % 3 + 1] AS region, ['Laptops', 'Phones'][i % 2 + 1] AS category
+        FROM range(300) t(i)
+    """)
+    yield build_value_index(connection, "sales", SCHEMA)
+    connection.close()
+
+def test_question_terms_resolve_to_stored_values(value_index):
+    matches = {(match["column"], match["value"]) for match in value_index.resolve_question("sales of laptops in the north region")}
+    assert matches == {("category", "Laptops"), ("region", "North")}
+
+def test_filter_literals_are_repaired(value_index):
+    sql, repairs = value_index.repair_literals(
+        "SELECT * FROM sales WHERE region = 'north' AND category IN ('laptop', 'Phones')"
+    )
+    assert sql == "SELECT * FROM sales WHERE region = 'North' AND category IN ('Laptops', 'Phones')"
+    assert repairs == ["region: 'north' -> 'North'", "category: 'laptop' -> 'Laptops'"]
+
+def test_unknown_values_are_left_alone(value_index):
+    query = "SELECT * FROM sales WHERE region = 'Atlantis'"
+    assert value_index.repair_literals(query) == (query, [])